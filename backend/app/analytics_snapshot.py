@@ -0,0 +1,344 @@
+"""Columnar snapshot of committees for the dashboard aggregations.
+
+The stats views group committees by owner, section, municipality, type and
+administrative unit. Instead of re-running those GROUP BYs on the OLTP tables,
+a snapshot job reads committees once (plus the member count per committee) and
+writes one `.npy` file per column: integer codes into small dictionaries kept in
+`meta.json`. Readers memory-map the columns and aggregate with `np.bincount`.
+
+Snapshots live in `<ANALYTICS_DIR>/snap-*` directories; `CURRENT` names the
+active one and is swapped atomically, so workers on the same host share the
+files. A snapshot records the database watermark it was built from (the
+committee/member counters, which change on every insert and delete, plus the
+highest committee, member, user and unit ids) and is rebuilt on read once the
+watermark moves, at most every `ANALYTICS_MIN_REBUILD_SECONDS`. The watermark
+comes from the database, so it survives restarts and is the same for every
+worker. Renaming a user is the one change it does not see; the owner names
+catch up on the next committee, member, user or unit write.
+
+A read that finds the watermark moved rebuilds synchronously, unless the
+snapshot is younger than `ANALYTICS_MIN_REBUILD_SECONDS`: then it answers from
+the previous snapshot, marks the request with `served_stale()` so callers do not
+cache what they computed from it, and starts a background rebuild right away
+(one at a time per worker). A write is therefore reflected once the rebuild in
+flight when it landed, plus the one it triggered, have finished: at most two
+snapshot builds (`scripts/build_analytics_snapshot.py` prints how long one
+takes), not the whole interval.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from . import dashboard_counters, models
+from .config import settings
+
+COLUMNS = ("id", "owner", "section", "type", "unit", "members")
+KEEP_SNAPSHOTS = 2
+
+
+class Snapshot:
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        # None for snapshots written before the watermark existed: never fresh
+        self.watermark: Optional[Dict[str, int]] = meta.get("watermark")
+        self.built_at: float = meta["built_at"]
+        # [email, user_id, user_name]
+        self.owners: List[list] = meta["owners"]
+        # [section_number, seccion_id, municipio_id, nombre_municipio]; ids are None outside the catalog
+        self.sections: List[list] = meta["sections"]
+        self.types: List[str] = meta["types"]
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r") for name in COLUMNS
+        }
+
+    def __len__(self) -> int:
+        return int(self.columns["id"].shape[0])
+
+    def rows_in(self, unit_ids: Iterable[int], section_codes: Iterable[str]) -> np.ndarray:
+        """Boolean row mask for committees linked to one of the units or sections."""
+        section_codes = set(section_codes)
+        wanted_sections = [i for i, section in enumerate(self.sections) if section[0] in section_codes]
+        mask = np.isin(self.columns["unit"], np.fromiter(unit_ids, dtype=np.int64))
+        if wanted_sections:
+            mask |= np.isin(self.columns["section"], np.asarray(wanted_sections, dtype=np.int32))
+        return mask
+
+    def _group(
+        self, codes: np.ndarray, size: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Committees and members per code; negative codes (NULL) and rows outside `rows` are skipped."""
+        valid = codes >= 0
+        if rows is not None:
+            valid &= rows
+        committees = np.bincount(codes[valid], minlength=size)
+        members = np.bincount(codes[valid], weights=self.columns["members"][valid], minlength=size)
+        return committees, members.astype(np.int64)
+
+    @staticmethod
+    def _ranked(totals: np.ndarray) -> Iterable[int]:
+        # Highest total first, like ORDER BY COUNT(*) DESC
+        order = np.argsort(-totals, kind="stable")
+        return (int(i) for i in order if totals[i] > 0)
+
+    def by_owner(self, rows: Optional[np.ndarray] = None) -> List[Tuple[str, Optional[int], Optional[str], int]]:
+        totals, _ = self._group(self.columns["owner"], len(self.owners), rows)
+        return [(*self.owners[i], int(totals[i])) for i in self._ranked(totals)]
+
+    def by_section(self, rows: Optional[np.ndarray] = None) -> List[Tuple[str, Optional[str], int]]:
+        totals, _ = self._group(self.columns["section"], len(self.sections), rows)
+        return [(self.sections[i][0], self.sections[i][3], int(totals[i])) for i in self._ranked(totals)]
+
+    def by_municipality(self, rows: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        totals, _ = self._group(self.columns["section"], len(self.sections), rows)
+        per_name: Dict[str, int] = defaultdict(int)
+        for i in np.nonzero(totals)[0]:
+            name = self.sections[i][3]
+            if name is not None:
+                per_name[name] += int(totals[i])
+        return sorted(per_name.items(), key=lambda item: -item[1])
+
+    def by_type(self, rows: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        totals, _ = self._group(self.columns["type"], len(self.types), rows)
+        return [(self.types[i], int(totals[i])) for i in self._ranked(totals)]
+
+    def by_catalog_section(
+        self, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, Optional[int], Optional[str], int, int]]:
+        """(seccion_id, municipio_id, nombre_municipio, committees, members) for catalog sections."""
+        committees, members = self._group(self.columns["section"], len(self.sections), rows)
+        per_section: Dict[int, list] = {}
+        for i in np.nonzero(committees)[0]:
+            code, seccion_id, municipio_id, nombre = self.sections[i]
+            if seccion_id is None:
+                continue
+            row = per_section.setdefault(seccion_id, [seccion_id, municipio_id, nombre, 0, 0])
+            row[3] += int(committees[i])
+            row[4] += int(members[i])
+        return [tuple(row) for row in per_section.values()]
+
+    def by_unit(self, section_units: Dict[str, int], rows: Optional[np.ndarray] = None) -> Dict[int, Tuple[int, int]]:
+        """
+        (committees, members) per administrative unit. Committees not yet linked
+        to a unit are credited to the SECTION unit whose code matches.
+        """
+        units = self.columns["unit"]
+        linked = units >= 0
+        selected = linked if rows is None else linked & rows
+        stats: Dict[int, Tuple[int, int]] = {}
+        if selected.any():
+            unit_ids, inverse = np.unique(units[selected], return_inverse=True)
+            committees = np.bincount(inverse)
+            members = np.bincount(inverse, weights=self.columns["members"][selected])
+            for unit_id, c, m in zip(unit_ids.tolist(), committees.tolist(), members.tolist()):
+                stats[unit_id] = (int(c), int(m))
+
+        unlinked_sections = np.where(linked, -1, self.columns["section"])
+        committees, members = self._group(unlinked_sections, len(self.sections), rows)
+        for i in np.nonzero(committees)[0]:
+            unit_id = section_units.get(self.sections[i][0])
+            if unit_id:
+                c, m = stats.get(unit_id, (0, 0))
+                stats[unit_id] = (c + int(committees[i]), m + int(members[i]))
+        return stats
+
+
+def _codes(values: List[Optional[str]], skip_empty: bool = False) -> Tuple[np.ndarray, List[str]]:
+    index: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for row, value in enumerate(values):
+        if value is None or (skip_empty and value == ""):
+            codes[row] = -1
+            continue
+        codes[row] = index.setdefault(value, len(index))
+    return codes, list(index)
+
+
+def data_watermark(session: Session) -> Dict[str, int]:
+    """Two counter reads and four MAX(id) index lookups, in one round trip each."""
+    counters = dashboard_counters.read_counters(session)
+    max_ids = session.exec(
+        select(
+            select(func.max(models.Committee.id)).scalar_subquery(),
+            select(func.max(models.CommitteeMember.id)).scalar_subquery(),
+            select(func.max(models.User.id)).scalar_subquery(),
+            select(func.max(models.AdministrativeUnit.id)).scalar_subquery(),
+        )
+    ).one()
+    committee_id, member_id, user_id, unit_id = (int(value or 0) for value in max_ids)
+    return {
+        "committees": int(counters[dashboard_counters.COMMITTEES]),
+        "members": int(counters[dashboard_counters.MEMBERS]),
+        "max_committee_id": committee_id,
+        "max_member_id": member_id,
+        "max_user_id": user_id,
+        "max_unit_id": unit_id,
+    }
+
+
+def build_snapshot(session: Session, directory: Path, watermark: Dict[str, int]) -> Path:
+    """Read committees once and write the column files; returns the new snapshot path."""
+    rows = session.exec(
+        select(
+            models.Committee.id,
+            models.Committee.owner_id,
+            models.Committee.section_number,
+            models.Committee.type,
+            models.Committee.administrative_unit_id,
+        ).order_by(models.Committee.id)
+    ).all()
+    member_counts = dict(
+        session.exec(
+            select(models.CommitteeMember.committee_id, func.count(models.CommitteeMember.id))
+            .group_by(models.CommitteeMember.committee_id)
+        ).all()
+    )
+    users = {row.email: (row.id, row.name) for row in session.exec(select(models.User.email, models.User.id, models.User.name)).all()}
+    catalog = {
+        str(row.id): (row.id, row.municipio, row.nombre_municipio)
+        for row in session.exec(select(models.Seccion.id, models.Seccion.municipio, models.Seccion.nombre_municipio)).all()
+    }
+
+    owner_codes, owners = _codes([row.owner_id for row in rows])
+    section_codes, sections = _codes([row.section_number for row in rows], skip_empty=True)
+    type_codes, types = _codes([row.type for row in rows])
+    columns = {
+        "id": np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+        "owner": owner_codes,
+        "section": section_codes,
+        "type": type_codes,
+        "unit": np.fromiter(
+            (row.administrative_unit_id if row.administrative_unit_id is not None else -1 for row in rows),
+            dtype=np.int64,
+            count=len(rows),
+        ),
+        "members": np.fromiter((member_counts.get(row.id, 0) for row in rows), dtype=np.int32, count=len(rows)),
+    }
+    meta = {
+        "watermark": watermark,
+        "built_at": time.time(),
+        "owners": [[email, *users.get(email, (None, None))] for email in owners],
+        "sections": [[code, *catalog.get(code, (None, None, None))] for code in sections],
+        "types": types,
+    }
+
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"snap-{time.time_ns()}-{os.getpid()}"
+    target.mkdir()
+    for name, values in columns.items():
+        np.save(target / f"{name}.npy", values)
+    (target / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    pointer = directory / f"CURRENT.{os.getpid()}.tmp"
+    pointer.write_text(target.name, encoding="utf-8")
+    os.replace(pointer, directory / "CURRENT")
+    _prune(directory, keep=target.name)
+    return target
+
+
+def _prune(directory: Path, keep: str) -> None:
+    snapshots = sorted((p for p in directory.glob("snap-*") if p.is_dir()), key=lambda p: p.name)
+    for path in snapshots[:-KEEP_SNAPSHOTS]:
+        if path.name != keep:
+            # Open memory maps keep working on POSIX after unlink
+            shutil.rmtree(path, ignore_errors=True)
+
+
+_served_stale: ContextVar[bool] = ContextVar("analytics_served_stale", default=False)
+
+
+def served_stale() -> bool:
+    """True once `current()` handed this context a snapshot older than the data."""
+    return _served_stale.get()
+
+
+def reset_served_stale() -> None:
+    _served_stale.set(False)
+
+
+class AnalyticsSnapshots:
+    def __init__(self, directory: str, min_rebuild_seconds: float = 10.0):
+        self.directory = Path(directory)
+        self.min_rebuild_seconds = min_rebuild_seconds
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._building = False  # a background rebuild is running
+
+    def _load_current(self) -> Optional[Snapshot]:
+        try:
+            name = (self.directory / "CURRENT").read_text(encoding="utf-8").strip()
+            if self._snapshot is not None and self._snapshot.path.name == name:
+                return self._snapshot
+            return Snapshot(self.directory / name)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def rebuild(self, session: Session) -> Snapshot:
+        with self._lock:
+            self._snapshot = Snapshot(build_snapshot(session, self.directory, data_watermark(session)))
+            return self._snapshot
+
+    def current(self, session: Session) -> Snapshot:
+        watermark = data_watermark(session)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.watermark == watermark:
+            return snapshot
+        with self._lock:
+            # Another worker (or thread) may already have written a fresh one
+            snapshot = self._load_current() or self._snapshot
+            if snapshot is not None and snapshot.watermark == watermark:
+                self._snapshot = snapshot
+                return snapshot
+            if snapshot is None or time.time() - snapshot.built_at >= self.min_rebuild_seconds:
+                try:
+                    snapshot = Snapshot(build_snapshot(session, self.directory, watermark))
+                except OSError:
+                    if snapshot is None:
+                        raise
+                    logging.exception("analytics snapshot rebuild failed; serving %s", snapshot.path.name)
+                    _served_stale.set(True)
+            else:
+                # Rebuilt too recently: answer from the previous one, which must not be cached,
+                # and catch up in the background instead of waiting out the interval
+                _served_stale.set(True)
+                self._start_background_rebuild(session.get_bind())
+            self._snapshot = snapshot
+            return snapshot
+
+    def _start_background_rebuild(self, bind) -> None:
+        """Caller holds `_lock`. Builds from the same engine the reader used, so a replica
+        read compares against a replica watermark."""
+        if self._building:
+            return
+        self._building = True
+        threading.Thread(
+            target=self._background_rebuild, args=(bind,), name="analytics-snapshot", daemon=True
+        ).start()
+
+    def _background_rebuild(self, bind) -> None:
+        try:
+            # Built outside `_lock`: readers keep getting the previous snapshot meanwhile
+            with Session(bind) as session:
+                snapshot = Snapshot(build_snapshot(session, self.directory, data_watermark(session)))
+            with self._lock:
+                if self._snapshot is None or snapshot.built_at > self._snapshot.built_at:
+                    self._snapshot = snapshot
+        except Exception:
+            logging.exception("background analytics snapshot rebuild failed")
+        finally:
+            with self._lock:
+                self._building = False
+
+
+analytics_snapshots = AnalyticsSnapshots(settings.analytics_dir, settings.analytics_min_rebuild_seconds)
@@ -0,0 +1,112 @@
+"""Sliding-window duplicate and shared-device detection for attendance check-ins.
+
+The in-memory index answers "did this account already check in during the
+window?" and "how many accounts used this device during the window?" in O(1)
+amortized time. Expired entries are evicted from a time-ordered deque on every
+call. A hit answers without touching the database. The memory only knows this
+worker's check-ins since it started, so a miss falls back to an index seek: on
+(provider_user_id, created_at) for an account this worker hasn't seen, on
+(device_id, created_at) for a device it hasn't seen. Restarts and other workers
+don't let duplicates or shared devices through; a device this worker already
+knows is only counted from memory, so accounts other workers added to it in
+the same window are missed until it reaches this worker's limit.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Deque, Dict, Optional, Tuple
+
+from sqlalchemy import distinct, func
+from sqlmodel import Session, select
+
+from . import models
+from .config import settings
+
+REASON_DUPLICATE = "duplicate"
+REASON_SHARED_DEVICE = "shared_device"
+
+
+@dataclass
+class Verdict:
+    duplicate_of: Optional[int] = None
+    device_accounts: int = 0  # distinct accounts on the device, including this one
+    shared_device: bool = False
+
+
+class AttendanceGuard:
+    def __init__(self, window_seconds: float, device_max_accounts: int):
+        self.window_seconds = window_seconds
+        self.device_max_accounts = device_max_accounts
+        self._lock = threading.Lock()
+        self._user_last: Dict[str, Tuple[float, int]] = {}
+        self._device_users: Dict[str, Dict[str, float]] = {}
+        self._events: Deque[Tuple[float, str, str]] = deque()
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._events and self._events[0][0] < cutoff:
+            ts, user_id, device_id = self._events.popleft()
+            last = self._user_last.get(user_id)
+            if last is not None and last[0] <= ts:
+                del self._user_last[user_id]
+            users = self._device_users.get(device_id)
+            if users is not None:
+                if users.get(user_id, now) <= ts:
+                    del users[user_id]
+                if not users:
+                    del self._device_users[device_id]
+
+    def check(self, session: Session, provider_user_id: str, device_id: str) -> Verdict:
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            last = self._user_last.get(provider_user_id)
+            users = self._device_users.get(device_id)
+            device_known = users is not None
+            users = users or {}
+            accounts = len(users) + (0 if provider_user_id in users else 1)
+        verdict = Verdict(
+            duplicate_of=last[1] if last is not None else None,
+            device_accounts=accounts,
+            shared_device=accounts > self.device_max_accounts,
+        )
+        # Both answered from memory: no round trip at all
+        if device_known and last is not None:
+            return verdict
+        since = models.get_mexico_city_time() - timedelta(seconds=self.window_seconds)
+        if not device_known:
+            other_accounts = session.exec(
+                select(func.count(distinct(models.Attendance.provider_user_id))).where(
+                    models.Attendance.device_id == device_id,
+                    models.Attendance.created_at >= since,
+                    models.Attendance.provider_user_id != provider_user_id,
+                )
+            ).one()
+            verdict.device_accounts = max(verdict.device_accounts, int(other_accounts or 0) + 1)
+            verdict.shared_device = verdict.device_accounts > self.device_max_accounts
+        if last is None:
+            verdict.duplicate_of = session.exec(
+                select(models.Attendance.id)
+                .where(
+                    models.Attendance.provider_user_id == provider_user_id,
+                    models.Attendance.created_at >= since,
+                )
+                .order_by(models.Attendance.created_at.desc())
+                .limit(1)
+            ).first()
+        return verdict
+
+    def record(self, provider_user_id: str, device_id: str, attendance_id: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._user_last[provider_user_id] = (now, attendance_id)
+            self._device_users.setdefault(device_id, {})[provider_user_id] = now
+            self._events.append((now, provider_user_id, device_id))
+
+
+attendance_guard = AttendanceGuard(
+    window_seconds=settings.attendance_window_seconds,
+    device_max_accounts=settings.attendance_device_max_accounts,
+)
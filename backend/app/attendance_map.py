@@ -0,0 +1,186 @@
+"""Grid clustering of geolocated attendance for the dashboard map.
+
+Points are kept in memory as Web Mercator coordinates normalized to [0, 1).
+For each zoom level the map is split into a grid of `CELLS_PER_TILE` x
+`CELLS_PER_TILE` cells per 256px tile (quadkey cells a few levels below the
+tile) and points are aggregated per cell with NumPy. Per-zoom aggregates are
+computed once and then merged with newly synced check-ins, so a query costs
+O(cells) instead of O(points).
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from . import models
+
+CELLS_PER_TILE_BITS = 3  # 8x8 cells per tile, ~32px clusters
+MAX_ZOOM = 20
+MAX_LATITUDE = 85.05112878
+FULL_RELOAD_SECONDS = 600.0
+# Snap tolerance (in cells) for bbox edges that fall on a cell border, e.g. tile edges
+_EDGE_EPSILON = 1e-6
+
+
+def _project(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lat = np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE)
+    x = (lon + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return np.clip(x, 0.0, 1.0 - 1e-12), np.clip(y, 0.0, 1.0 - 1e-12)
+
+
+def _grid_size(zoom: int) -> int:
+    return 1 << (zoom + CELLS_PER_TILE_BITS)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) of an XYZ tile."""
+    n = 1 << zoom
+
+    def lat_of(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat_of(y + 1), x / n * 360.0 - 180.0, lat_of(y), (x + 1) / n * 360.0 - 180.0
+
+
+@dataclass
+class _ZoomAggregate:
+    keys: np.ndarray
+    counts: np.ndarray
+    sum_lat: np.ndarray
+    sum_lon: np.ndarray
+    covered: int  # number of points already folded in
+
+
+@dataclass
+class Cluster:
+    latitude: float
+    longitude: float
+    count: int
+
+
+class AttendanceMapIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lat = np.empty(0, dtype=np.float64)
+        self._lon = np.empty(0, dtype=np.float64)
+        self._x = np.empty(0, dtype=np.float64)
+        self._y = np.empty(0, dtype=np.float64)
+        self._last_id = 0
+        self._loaded_at = time.monotonic()
+        self._aggregates: Dict[int, _ZoomAggregate] = {}
+
+    @property
+    def size(self) -> int:
+        return int(self._lat.shape[0])
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def append(self, ids: List[int], lats: List[float], lons: List[float]) -> None:
+        if not ids:
+            return
+        lat = np.asarray(lats, dtype=np.float64)
+        lon = np.asarray(lons, dtype=np.float64)
+        x, y = _project(lat, lon)
+        self._lat = np.concatenate([self._lat, lat])
+        self._lon = np.concatenate([self._lon, lon])
+        self._x = np.concatenate([self._x, x])
+        self._y = np.concatenate([self._y, y])
+        self._last_id = max(self._last_id, max(ids))
+
+    def sync(self, session: Session) -> None:
+        """Pull check-ins newer than the last seen id (one indexed range query)."""
+        with self._lock:
+            if time.monotonic() - self._loaded_at > FULL_RELOAD_SECONDS:
+                # Picks up rows committed out of id order by concurrent writers
+                self._reset()
+            rows = session.exec(
+                select(models.Attendance.id, models.Attendance.latitude, models.Attendance.longitude)
+                .where(
+                    models.Attendance.id > self._last_id,
+                    models.Attendance.latitude.is_not(None),
+                    models.Attendance.longitude.is_not(None),
+                )
+                .order_by(models.Attendance.id)
+            ).all()
+            self.append(
+                [row.id for row in rows],
+                [float(row.latitude) for row in rows],
+                [float(row.longitude) for row in rows],
+            )
+
+    def _cell_keys(self, zoom: int, start: int) -> np.ndarray:
+        size = _grid_size(zoom)
+        cx = (self._x[start:] * size).astype(np.int64)
+        cy = (self._y[start:] * size).astype(np.int64)
+        return cy * size + cx
+
+    def _aggregate(self, zoom: int) -> _ZoomAggregate:
+        agg = self._aggregates.get(zoom)
+        if agg is not None and agg.covered == self.size:
+            return agg
+        start = agg.covered if agg is not None else 0
+        new_keys = self._cell_keys(zoom, start)
+        if agg is not None:
+            keys = np.concatenate([agg.keys, new_keys])
+            counts = np.concatenate([agg.counts, np.ones(new_keys.shape[0], dtype=np.int64)])
+            sum_lat = np.concatenate([agg.sum_lat, self._lat[start:]])
+            sum_lon = np.concatenate([agg.sum_lon, self._lon[start:]])
+        else:
+            keys = new_keys
+            counts = np.ones(new_keys.shape[0], dtype=np.int64)
+            sum_lat = self._lat
+            sum_lon = self._lon
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        agg = _ZoomAggregate(
+            keys=unique_keys,
+            counts=np.bincount(inverse, weights=counts, minlength=unique_keys.shape[0]).astype(np.int64),
+            sum_lat=np.bincount(inverse, weights=sum_lat, minlength=unique_keys.shape[0]),
+            sum_lon=np.bincount(inverse, weights=sum_lon, minlength=unique_keys.shape[0]),
+            covered=self.size,
+        )
+        self._aggregates[zoom] = agg
+        return agg
+
+    def clusters(
+        self,
+        zoom: int,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+    ) -> List[Cluster]:
+        zoom = max(0, min(zoom, MAX_ZOOM))
+        with self._lock:
+            agg = self._aggregate(zoom)
+        keys, counts, sum_lat, sum_lon = agg.keys, agg.counts, agg.sum_lat, agg.sum_lon
+        if bbox is not None and keys.shape[0]:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            size = _grid_size(zoom)
+            x0, y1 = _project(np.array([min_lat]), np.array([min_lng]))
+            x1, y0 = _project(np.array([max_lat]), np.array([max_lng]))
+            cy, cx = np.divmod(keys, size)
+            # Half-open cell ranges [start, stop): adjacent tiles never share a cell
+            mask = (
+                (cx >= math.floor(x0[0] * size + _EDGE_EPSILON))
+                & (cx < math.ceil(x1[0] * size - _EDGE_EPSILON))
+                & (cy >= math.floor(y0[0] * size + _EDGE_EPSILON))
+                & (cy < math.ceil(y1[0] * size - _EDGE_EPSILON))
+            )
+            counts, sum_lat, sum_lon = counts[mask], sum_lat[mask], sum_lon[mask]
+        lat = sum_lat / counts
+        lon = sum_lon / counts
+        return [
+            Cluster(latitude=float(a), longitude=float(b), count=int(c))
+            for a, b, c in zip(lat.tolist(), lon.tolist(), counts.tolist())
+        ]
+
+
+attendance_map_index = AttendanceMapIndex()
@@ -1,18 +1,21 @@
+import logging
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-import msal
-import requests
 import jwt
 from datetime import datetime, timedelta, timezone
 from sqlmodel import Session, insert, select
 from .config import settings
+from .cache import data_versions
 from .database import get_session
 from .dependencies import get_current_user
+from .rate_limit import login_concurrency, login_rate_limit
 from . import models, schemas
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+logger = logging.getLogger(__name__)
+
+# Per-IP token bucket, then a cap on simultaneous logins (each one may wait on Google/Microsoft)
+_login_limits = [Depends(login_rate_limit.by_client_ip), Depends(login_concurrency)]
 
 # Lista de usuarios estáticos para autenticación con usuario y contraseña
 # Formato: username -> (password, email, name)
@@ -46,13 +49,16 @@ def create_jwt(user: models.User) -> str:
     return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
-@router.post("/google", response_model=schemas.TokenResponse)
+@router.post("/google", response_model=schemas.TokenResponse, dependencies=_login_limits)
 def google_login(data: GoogleAuthIn, session: Session = Depends(get_session)):
+    # google-auth (and requests with it) load on first use, not at worker start
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token
+
     try:
-        print("Settings google client id:", settings.google_client_id)
         idinfo = id_token.verify_oauth2_token(data.id_token, google_requests.Request(), settings.google_client_id)
     except Exception as e:  # broad, but we convert to 401
-        print(f"Error verificando token de Google: {e}")
+        logger.warning("Token de Google inválido: %s", e)
         raise HTTPException(status_code=401, detail=f"Token de Google inválido: {e}")
 
     email = idinfo.get("email")
@@ -74,6 +80,7 @@ def google_login(data: GoogleAuthIn, session: Session = Depends(get_session)):
         user = models.User(email=email, name=name, picture_url=picture)
         session.add(user)
         session.commit()
+        data_versions.bump("users")
         session.refresh(user)
 
     user_assignment = session.exec(
@@ -89,6 +96,7 @@ def google_login(data: GoogleAuthIn, session: Session = Depends(get_session)):
         )
         session.add(user_assignment)
         session.commit()
+        data_versions.bump("assignments")
         session.refresh(user_assignment)
     else:
         session.refresh(user_assignment)
@@ -97,7 +105,7 @@ def google_login(data: GoogleAuthIn, session: Session = Depends(get_session)):
     return schemas.TokenResponse(access_token=token, user=user)  # type: ignore[arg-type]
 
 
-@router.post("/login", response_model=schemas.TokenResponse)
+@router.post("/login", response_model=schemas.TokenResponse, dependencies=_login_limits)
 def username_password_login(data: UsernamePasswordAuthIn, session: Session = Depends(get_session)):
     """
     Endpoint para autenticación tradicional con usuario y contraseña.
@@ -125,6 +133,7 @@ def username_password_login(data: UsernamePasswordAuthIn, session: Session = Dep
         user = models.User(email=email, name=name, picture_url=None)
         session.add(user)
         session.commit()
+        data_versions.bump("users")
         session.refresh(user)
     
     # Crear o verificar asignación de usuario
@@ -142,6 +151,7 @@ def username_password_login(data: UsernamePasswordAuthIn, session: Session = Dep
         )
         session.add(user_assignment)
         session.commit()
+        data_versions.bump("assignments")
         session.refresh(user_assignment)
     else:
         session.refresh(user_assignment)
@@ -150,12 +160,14 @@ def username_password_login(data: UsernamePasswordAuthIn, session: Session = Dep
     return schemas.TokenResponse(access_token=token, user=user)  # type: ignore[arg-type]
 
 
-@router.post("/microsoft", response_model=schemas.TokenResponse)
+@router.post("/microsoft", response_model=schemas.TokenResponse, dependencies=_login_limits)
 def microsoft_login(data: MicrosoftAuthIn, session: Session = Depends(get_session)):
     """
     Endpoint para autenticación con Microsoft (Hotmail/Outlook).
     El frontend debe enviar el access_token obtenido del flujo OAuth de Microsoft.
     """
+    import requests
+
     try:
         # Verificar el token con Microsoft Graph API
         headers = {"Authorization": f"Bearer {data.access_token}"}
@@ -188,6 +200,7 @@ def microsoft_login(data: MicrosoftAuthIn, session: Session = Depends(get_sessio
             user = models.User(email=email, name=name, picture_url=None)
             session.add(user)
             session.commit()
+            data_versions.bump("users")
             session.refresh(user)
         
         # Crear o verificar asignación de usuario
@@ -205,6 +218,7 @@ def microsoft_login(data: MicrosoftAuthIn, session: Session = Depends(get_sessio
             )
             session.add(user_assignment)
             session.commit()
+            data_versions.bump("assignments")
             session.refresh(user_assignment)
         else:
             session.refresh(user_assignment)
@@ -213,10 +227,10 @@ def microsoft_login(data: MicrosoftAuthIn, session: Session = Depends(get_sessio
         return schemas.TokenResponse(access_token=token, user=user)  # type: ignore[arg-type]
         
     except requests.RequestException as e:
-        print(f"Error verificando token de Microsoft: {e}")
+        logger.warning("Error verificando token de Microsoft: %s", e)
         raise HTTPException(status_code=401, detail=f"Error al verificar token de Microsoft: {e}")
     except Exception as e:
-        print(f"Error en autenticación Microsoft: {e}")
+        logger.exception("Error en autenticación Microsoft")
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
 
 
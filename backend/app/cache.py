@@ -0,0 +1,272 @@
+"""Caching helpers shared by the routers.
+
+`TTLCache` is a thread-safe LRU with a per-entry time to live. `data_versions`
+holds one counter per data set ("committees", ...) that write endpoints bump,
+so cache keys that embed the version are invalidated on the next write.
+
+`ResponseCache` sits on top of a backend (in-process LRU or any Redis-compatible
+client) and serves stale entries while a single background recomputation runs.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from .config import settings
+
+named_caches: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 30.0, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if name:
+            # Named caches report their hit ratio on /metrics
+            named_caches[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DataVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+
+    def get(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        self._listeners.append(listener)
+
+    def bump(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+        for name in names:
+            for listener in list(self._listeners):
+                try:
+                    listener(name)
+                except Exception:
+                    logging.exception("data version listener failed for %s", name)
+
+
+data_versions = DataVersions()
+
+
+class MemoryBackend:
+    """Per-process LRU; versions come straight from `data_versions`."""
+
+    def __init__(self, maxsize: int = 512):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._cache.set(key, value, ttl_seconds)
+
+    def get_version(self, name: str) -> int:
+        return data_versions.get(name)
+
+    def bump_version(self, name: str) -> None:
+        # data_versions was already bumped by the writer
+        pass
+
+
+class RedisBackend:
+    """
+    Shared backend for multi-worker deployments. `client` is anything with the
+    redis-py `get`/`set(ex=)`/`incr` API, so a local stand-in (fakeredis, a
+    dict-backed fake in scripts) can replace a real server.
+    """
+
+    def __init__(self, client, prefix: str = "r21:cache:"):
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self._prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._client.set(self._prefix + key, pickle.dumps(value), ex=max(int(ttl_seconds), 1))
+
+    def get_version(self, name: str) -> int:
+        raw = self._client.get(f"{self._prefix}v:{name}")
+        return int(raw) if raw is not None else 0
+
+    def bump_version(self, name: str) -> None:
+        self._client.incr(f"{self._prefix}v:{name}")
+
+
+class Uncached:
+    """
+    Returned by a `compute` whose result must reach the caller but not the
+    cache, e.g. it was built from data known to lag behind the current version.
+    """
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Versioned response cache with stale-while-revalidate and single-flight.
+
+    Entries are fresh for `ttl_seconds` and may be served stale for another
+    `stale_seconds` while one background thread recomputes them. On a miss only
+    the first caller computes; concurrent callers for the same key wait for it.
+    A compute that returns `Uncached(value)` answers without storing the value.
+    """
+
+    def __init__(self, backend, ttl_seconds: float = 30.0, stale_seconds: float = 300.0):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        data_versions.subscribe(self.backend.bump_version)
+
+    def key_for(self, name: str, depends_on: Iterable[str] = (), params: Iterable[Any] = ()) -> str:
+        versions = ",".join(f"{dep}={self.backend.get_version(dep)}" for dep in depends_on)
+        extra = ",".join(str(p) for p in params)
+        return f"{name}|{versions}|{extra}"
+
+    def get_or_compute(
+        self,
+        name: str,
+        compute: Callable[[], Any],
+        depends_on: Iterable[str] = (),
+        params: Iterable[Any] = (),
+    ) -> Any:
+        key = self.key_for(name, depends_on, params)
+        entry = self.backend.get(key)
+        if entry is not None:
+            fresh_until, value = entry
+            if time.time() < fresh_until:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._revalidate(key, compute)
+            return value
+        self.misses += 1
+        return self._compute(key, compute)
+
+    def _store(self, key: str, value: Any) -> None:
+        self.backend.set(key, (time.time() + self.ttl_seconds, value), self.ttl_seconds + self.stale_seconds)
+
+    def _compute_and_store(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = compute()
+        if isinstance(value, Uncached):
+            return value.value
+        self._store(key, value)
+        return value
+
+    def _compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = self._compute_and_store(key, compute)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _revalidate(self, key: str, compute: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._inflight:
+                return
+            flight = self._inflight[key] = _Flight()
+
+        def run():
+            try:
+                flight.value = self._compute_and_store(key, compute)
+            except BaseException as e:
+                flight.error = e
+                logging.exception("background refresh failed for %s", key)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight.event.set()
+
+        threading.Thread(target=run, name=f"cache-refresh:{key[:40]}", daemon=True).start()
+
+
+def build_backend(name: str, redis_url: str = ""):
+    if name == "redis" and redis_url:
+        try:
+            import redis  # optional dependency
+
+            return RedisBackend(redis.Redis.from_url(redis_url))
+        except ImportError:
+            logging.warning("DASHBOARD_CACHE_BACKEND=redis pero el paquete redis no está instalado; usando memoria")
+    return MemoryBackend()
+
+
+dashboard_cache = ResponseCache(
+    build_backend(settings.dashboard_cache_backend, settings.redis_url),
+    ttl_seconds=settings.dashboard_cache_ttl_seconds,
+    stale_seconds=settings.dashboard_cache_stale_seconds,
+)
@@ -0,0 +1,85 @@
+"""In-process registry of committee types.
+
+Committee types are a handful of rows that change rarely but are read on
+every committee insert and every form load. The registry keeps them in memory
+and is invalidated by bumping its version whenever a type is written.
+"""
+import hashlib
+import threading
+import time
+from typing import FrozenSet, List, Optional
+
+from sqlmodel import Session, select
+
+from . import models, schemas
+from .config import settings
+
+
+class CommitteeTypeRegistry:
+    def __init__(self, ttl_seconds: float = 60.0):
+        # The TTL only bounds staleness across workers; writes in this
+        # process invalidate immediately.
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._types: List[schemas.CommitteeTypeOut] = []
+        self._active_names: FrozenSet[str] = frozenset()
+        self._etag = ""
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_version == self._version
+            and time.monotonic() - self._loaded_at < self._ttl_seconds
+        )
+
+    def refresh(self, session: Session) -> None:
+        # Taken before the query: an invalidation that lands while it runs leaves
+        # the loaded version behind, so the next read refreshes again
+        version = self._version
+        rows = session.exec(
+            select(models.CommitteeType)
+            .where(models.CommitteeType.is_active == True)  # noqa: E712
+            .order_by(models.CommitteeType.name)
+        ).all()
+        types = [schemas.CommitteeTypeOut.model_validate(row) for row in rows]
+        digest = hashlib.sha1(
+            "|".join(f"{t.id}:{t.name}" for t in types).encode("utf-8")
+        ).hexdigest()[:16]
+        with self._lock:
+            self._types = types
+            self._active_names = frozenset(t.name for t in types)
+            self._etag = f'W/"ct-{digest}"'
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, session: Session) -> None:
+        if not self._is_fresh():
+            self.refresh(session)
+
+    def active_types(self, session: Session) -> List[schemas.CommitteeTypeOut]:
+        self._ensure_loaded(session)
+        return self._types
+
+    def active_names(self, session: Session) -> FrozenSet[str]:
+        self._ensure_loaded(session)
+        return self._active_names
+
+    def is_active(self, session: Session, name: Optional[str]) -> bool:
+        return name in self.active_names(session)
+
+    def etag(self, session: Session) -> str:
+        self._ensure_loaded(session)
+        return self._etag
+
+
+committee_type_registry = CommitteeTypeRegistry(ttl_seconds=settings.committee_types_ttl_seconds)
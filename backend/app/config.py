@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+import logging
 import os
 from dotenv import load_dotenv, find_dotenv
 from pathlib import Path
@@ -15,13 +16,23 @@ if not env_file:
 if env_file:
     load_dotenv(env_file)
 else:
-    print("[config] Advertencia: No se encontró archivo .env. Variables dependerán del entorno del sistema.")
+    logging.getLogger(__name__).warning("No se encontró archivo .env. Variables dependerán del entorno del sistema.")
 
 class Settings(BaseModel):
     app_name: str = "Comités MORENA"
     environment: str = os.getenv("ENV", "dev")
     # Cambia default a vacío para calcular desde DB_*
     database_url: str = os.getenv("DATABASE_URL", "")
+    # Réplica de lectura opcional: los GET del dashboard se leen de ella
+    database_replica_url: str = os.getenv("DATABASE_REPLICA_URL", "")
+    db_replica_lag_seconds: float = float(os.getenv("DB_REPLICA_LAG_SECONDS", "5"))
+    # Pool de conexiones; DB_PRE_PING: always (cada checkout) | idle (solo conexiones inactivas) | never
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "300"))
+    db_pre_ping: str = os.getenv("DB_PRE_PING", "idle")
+    db_pre_ping_idle_seconds: float = float(os.getenv("DB_PRE_PING_IDLE_SECONDS", "30"))
     jwt_secret: str = os.getenv("JWT_SECRET", "change-me")
     jwt_algorithm: str = "HS256"
     google_client_id: str = os.getenv("GOOGLE_CLIENT_ID", "")
@@ -30,7 +41,63 @@ class Settings(BaseModel):
     microsoft_tenant_id: str = os.getenv("MICROSOFT_TENANT_ID", "common")
     frontend_origin: str = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
     max_members_per_committee: int = 10
+    max_bulk_committees: int = int(os.getenv("MAX_BULK_COMMITTEES", "200"))
+    committee_types_ttl_seconds: float = float(os.getenv("COMMITTEE_TYPES_TTL_SECONDS", "60"))
+    committee_list_cache_ttl_seconds: float = float(os.getenv("COMMITTEE_LIST_CACHE_TTL_SECONDS", "30"))
+    # Cache de respuestas del dashboard: "memory" (por proceso) o "redis" (compartido)
+    dashboard_cache_backend: str = os.getenv("DASHBOARD_CACHE_BACKEND", "memory")
+    dashboard_cache_ttl_seconds: float = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+    dashboard_cache_stale_seconds: float = float(os.getenv("DASHBOARD_CACHE_STALE_SECONDS", "300"))
+    redis_url: str = os.getenv("REDIS_URL", "")
+    # Asistencia: ventana para duplicados/dispositivos compartidos y política ante duplicados
+    attendance_window_seconds: float = float(os.getenv("ATTENDANCE_WINDOW_SECONDS", "3600"))
+    attendance_device_max_accounts: int = int(os.getenv("ATTENDANCE_DEVICE_MAX_ACCOUNTS", "3"))
+    attendance_duplicate_policy: str = os.getenv("ATTENDANCE_DUPLICATE_POLICY", "reject")  # reject | flag
+    # Canal en vivo de asistencias (SSE): "memory" (un worker) o "redis" (varios workers)
+    live_feed_backend: str = os.getenv("LIVE_FEED_BACKEND", "memory")
+    live_feed_buffer_size: int = int(os.getenv("LIVE_FEED_BUFFER_SIZE", "100"))
     upload_dir: str = os.getenv("UPLOAD_DIR", "uploads")
+    # Idempotency-Key en altas de comités, integrantes y documentos: cuánto se guarda la respuesta
+    idempotency_ttl_seconds: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    # Una petición en curso conserva su llave a lo más este tiempo (si el worker muere, la llave se libera)
+    idempotency_lock_seconds: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+    idempotency_max_response_bytes: int = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", "262144"))
+    # Límites de tasa (token bucket "<solicitudes>/<segundos>", "0" desactiva); RATE_LIMIT_BACKEND memory | redis
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    rate_limit_login: str = os.getenv("RATE_LIMIT_LOGIN", "10/60")  # por IP
+    rate_limit_ocr: str = os.getenv("RATE_LIMIT_OCR", "30/60")  # por usuario
+    rate_limit_attendance_ip: str = os.getenv("RATE_LIMIT_ATTENDANCE_IP", "300/60")  # por IP (red del evento)
+    rate_limit_attendance_device: str = os.getenv("RATE_LIMIT_ATTENDANCE_DEVICE", "5/60")  # por dispositivo
+    # Peticiones simultáneas por endpoint ("0" sin límite) y cuántas esperan turno antes de responder 503
+    login_max_concurrency: int = int(os.getenv("LOGIN_MAX_CONCURRENCY", "8"))
+    login_max_queue: int = int(os.getenv("LOGIN_MAX_QUEUE", "16"))
+    ocr_max_concurrency: int = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))
+    ocr_max_queue: int = int(os.getenv("OCR_MAX_QUEUE", "8"))
+    attendance_max_concurrency: int = int(os.getenv("ATTENDANCE_MAX_CONCURRENCY", "16"))
+    attendance_max_queue: int = int(os.getenv("ATTENDANCE_MAX_QUEUE", "64"))
+    concurrency_queue_timeout_seconds: float = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_SECONDS", "5"))
+    # Proxies (IPs o CIDR, separados por coma) cuyo X-Forwarded-For se acepta; vacío = se usa la IP de la conexión
+    trusted_proxies: str = os.getenv("TRUSTED_PROXIES", "")
+    # Logs estructurados: LOG_FORMAT json | text; LOG_SINKS stdout, stderr, file:<ruta> (separados por coma)
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "json")
+    log_sinks: str = os.getenv("LOG_SINKS", "stdout")
+    log_file_max_bytes: int = int(os.getenv("LOG_FILE_MAX_BYTES", "5000000"))
+    log_file_backups: int = int(os.getenv("LOG_FILE_BACKUPS", "3"))
+    # Muestreo de logs INFO/DEBUG por prefijo de logger; advertencias y errores siempre se registran
+    log_sample_rates: str = os.getenv("LOG_SAMPLE_RATES", "app.http=0.1")
+    # Métricas Prometheus en /metrics; con METRICS_TOKEN se exige "Authorization: Bearer <token>"
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "1") == "1"
+    metrics_token: str = os.getenv("METRICS_TOKEN", "")
+    # Perfilado de SQL por petición (Server-Timing, /admin/debug/queries); sentencias repetidas N veces = posible N+1
+    query_profiling: bool = os.getenv("QUERY_PROFILING", "0") == "1"
+    query_profiling_repeat_threshold: int = int(os.getenv("QUERY_PROFILING_REPEAT_THRESHOLD", "5"))
+    # Aplicar migraciones pendientes al arrancar; con "0" se aplican con scripts/migrate.py antes del despliegue
+    auto_migrate: bool = os.getenv("AUTO_MIGRATE", "1") == "1"
+    # Snapshot columnar (NumPy) para las estadísticas del dashboard
+    analytics_dir: str = os.getenv("ANALYTICS_DIR", "analytics")
+    analytics_min_rebuild_seconds: float = float(os.getenv("ANALYTICS_MIN_REBUILD_SECONDS", "10"))
     # Nuevos campos para MariaDB
     db_user: str = os.getenv("DB_USER", "")
     db_password: str = os.getenv("DB_PASSWORD", "")
@@ -52,4 +119,4 @@ if not settings.database_url:
     )
 
 if not settings.google_client_id:
-    print("[config] Advertencia: GOOGLE_CLIENT_ID vacío. Verifica ubicación del .env o exporta la variable.")
+    logging.getLogger(__name__).warning("GOOGLE_CLIENT_ID vacío. Verifica ubicación del .env o exporta la variable.")
@@ -0,0 +1,208 @@
+"""Section coverage against per-unit targets.
+
+The section catalog is loaded once into NumPy arrays (section id, municipio,
+distrito). Which sections have at least one committee comes from the
+`CoverageCount` rows that the write endpoints already maintain, so a report is
+a boolean mask plus `np.bincount` per municipio/distrito instead of an
+anti-join between `seccion` and `committee`. The mask is re-read only when the
+committee data version changes.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from . import dashboard_counters, models
+from .cache import dashboard_cache
+from .unit_scope import UnitScope
+
+MUNICIPIO = "municipio"
+DISTRITO = "distrito"
+SECCION = "seccion"  # scope only
+LEVELS = (MUNICIPIO, DISTRITO)
+CATALOG_REFRESH_SECONDS = 600.0
+MASK_REFRESH_SECONDS = 30.0  # other workers' writes with the in-memory cache backend
+
+
+@dataclass
+class CoverageGap:
+    level: str
+    code: int
+    name: str
+    unit_id: Optional[int]
+    total_sections: int
+    covered_sections: int
+    target_sections: int
+    gap: int
+    uncovered: List[int] = field(default_factory=list)
+
+
+@dataclass
+class _Catalog:
+    section_ids: np.ndarray  # sorted
+    codes: Dict[str, np.ndarray]  # level -> group code per section (-1 when unknown)
+    names: Dict[str, Dict[int, str]]
+
+
+class CoverageEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog: Optional[_Catalog] = None
+        self._catalog_loaded_at = 0.0
+        self._covered: Optional[np.ndarray] = None
+        self._covered_version: Optional[int] = None
+        self._covered_loaded_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._catalog = None
+            self._covered = None
+
+    def _load_catalog(self, session: Session) -> _Catalog:
+        with self._lock:
+            if self._catalog is not None and time.monotonic() - self._catalog_loaded_at < CATALOG_REFRESH_SECONDS:
+                return self._catalog
+        rows = session.exec(
+            select(
+                models.Seccion.id,
+                models.Seccion.municipio,
+                models.Seccion.nombre_municipio,
+                models.Seccion.distrito,
+                models.Seccion.nombre_distrito,
+            ).order_by(models.Seccion.id)
+        ).all()
+        names: Dict[str, Dict[int, str]] = {MUNICIPIO: {}, DISTRITO: {}}
+        for row in rows:
+            if row.municipio is not None:
+                names[MUNICIPIO].setdefault(row.municipio, row.nombre_municipio or f"Municipio {row.municipio}")
+            if row.distrito is not None:
+                names[DISTRITO].setdefault(row.distrito, row.nombre_distrito or f"Distrito {row.distrito}")
+        catalog = _Catalog(
+            section_ids=np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+            codes={
+                MUNICIPIO: np.fromiter(
+                    (row.municipio if row.municipio is not None else -1 for row in rows), dtype=np.int64, count=len(rows)
+                ),
+                DISTRITO: np.fromiter(
+                    (row.distrito if row.distrito is not None else -1 for row in rows), dtype=np.int64, count=len(rows)
+                ),
+            },
+            names=names,
+        )
+        with self._lock:
+            self._catalog = catalog
+            self._catalog_loaded_at = time.monotonic()
+            self._covered = None
+        return catalog
+
+    def _covered_mask(self, session: Session, catalog: _Catalog) -> np.ndarray:
+        version = dashboard_cache.backend.get_version("committees")
+        with self._lock:
+            if (
+                self._covered is not None
+                and self._covered_version == version
+                and time.monotonic() - self._covered_loaded_at < MASK_REFRESH_SECONDS
+            ):
+                return self._covered
+        codes = session.exec(
+            select(models.CoverageCount.code).where(
+                models.CoverageCount.kind == dashboard_counters.SECTION,
+                models.CoverageCount.committees > 0,
+            )
+        ).all()
+        covered_ids = []
+        for code in codes:
+            # Same matching rule as the counters: the code must be the canonical section id
+            if code.isdigit() and str(int(code)) == code:
+                covered_ids.append(int(code))
+        mask = np.isin(catalog.section_ids, np.asarray(covered_ids, dtype=np.int64))
+        with self._lock:
+            self._covered = mask
+            self._covered_version = version
+            self._covered_loaded_at = time.monotonic()
+        return mask
+
+    def _targets(self, session: Session, level: str) -> Dict[int, Tuple[int, int]]:
+        """Group code -> (unit_id, target_sections) for units of the level with a catalog link."""
+        column = (
+            models.AdministrativeUnit.seccion_municipio_id
+            if level == MUNICIPIO
+            else models.AdministrativeUnit.seccion_distrito_id
+        )
+        unit_type = "MUNICIPALITY" if level == MUNICIPIO else "DISTRICT"
+        rows = session.exec(
+            select(column.label("code"), models.AdministrativeUnit.id, models.CoverageTarget.target_sections)
+            .select_from(models.AdministrativeUnit)
+            .outerjoin(models.CoverageTarget, models.CoverageTarget.unit_id == models.AdministrativeUnit.id)
+            .where(models.AdministrativeUnit.unit_type == unit_type, column.is_not(None))
+        ).all()
+        return {row.code: (row.id, row.target_sections) for row in rows}
+
+    def report(
+        self,
+        session: Session,
+        level: str = MUNICIPIO,
+        scope: Optional[Dict[str, Set[int]]] = None,
+        include_sections: bool = False,
+        only_gaps: bool = False,
+    ) -> List[CoverageGap]:
+        """
+        Coverage per municipio or distrito, largest gap first. `scope` restricts
+        the catalog to {level: codes}; the gap is target minus covered sections.
+        """
+        catalog = self._load_catalog(session)
+        covered = self._covered_mask(session, catalog)
+        codes = catalog.codes[level]
+
+        selected = codes >= 0
+        for scope_level, scope_codes in (scope or {}).items():
+            column = catalog.section_ids if scope_level == SECCION else catalog.codes[scope_level]
+            selected &= np.isin(column, np.fromiter(scope_codes, dtype=np.int64))
+        if not selected.any():
+            return []
+
+        size = int(codes[selected].max()) + 1
+        totals = np.bincount(codes[selected], minlength=size)
+        covered_totals = np.bincount(codes[selected & covered], minlength=size)
+        targets = self._targets(session, level)
+
+        gaps: List[CoverageGap] = []
+        for code in np.nonzero(totals)[0].tolist():
+            total = int(totals[code])
+            unit_id, target = targets.get(code, (None, None))
+            target = total if target is None else min(int(target), total)
+            gap = max(target - int(covered_totals[code]), 0)
+            if only_gaps and gap == 0:
+                continue
+            gaps.append(
+                CoverageGap(
+                    level=level,
+                    code=code,
+                    name=catalog.names[level].get(code, str(code)),
+                    unit_id=unit_id,
+                    total_sections=total,
+                    covered_sections=int(covered_totals[code]),
+                    target_sections=target,
+                    gap=gap,
+                )
+            )
+        gaps.sort(key=lambda item: (-item.gap, item.name))
+
+        if include_sections and gaps:
+            uncovered = selected & ~covered
+            for item in gaps:
+                item.uncovered = catalog.section_ids[uncovered & (codes == item.code)].tolist()
+        return gaps
+
+
+def catalog_scope(scope: UnitScope) -> Optional[Dict[str, Set[int]]]:
+    """`report` scope for a dashboard scope: the catalog sections under the unit."""
+    if scope.statewide:
+        return None
+    return {SECCION: {int(code) for code in scope.section_codes if code.isdigit()}}
+
+
+coverage_engine = CoverageEngine()
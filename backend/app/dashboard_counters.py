@@ -0,0 +1,290 @@
+"""Incrementally maintained counters behind GET /dashboard/metrics.
+
+Write endpoints call the `record_*` helpers inside the same transaction as the
+insert/delete, so the counters commit or roll back together with the data.
+Section and municipality coverage is kept as a reference count per code in
+`CoverageCount` (upserted, so two first committees of a section don't collide);
+the covered totals only change when a count crosses zero.
+Check-ins are counted overall and per event (one `event_attendance:<id>`
+counter per event, created with the event), which feeds the live attendance
+totals.
+
+Every counter is split across `COUNTER_SLOTS` rows and each write adds to a
+random one, so concurrent check-ins and committee writes don't queue on a
+single row lock until commit; reads sum the slots (a short primary-key range
+per counter). `rebuild` recomputes everything from the base tables (first
+start or repair).
+"""
+import random
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import String, cast, delete, func, update
+from sqlmodel import Session, select
+
+from . import models
+from .upserts import increment
+
+COMMITTEES = "committees"
+MEMBERS = "members"
+DOCUMENTS = "documents"
+SECCIONES_CUBIERTAS = "secciones_cubiertas"
+MUNICIPIOS_CUBIERTOS = "municipios_cubiertos"
+TOTAL_SECCIONES = "total_secciones"
+ATTENDANCE = "attendance"
+EVENT_ATTENDANCE_PREFIX = "event_attendance:"
+
+COUNTER_NAMES = (
+    COMMITTEES,
+    MEMBERS,
+    DOCUMENTS,
+    SECCIONES_CUBIERTAS,
+    MUNICIPIOS_CUBIERTOS,
+    TOTAL_SECCIONES,
+    ATTENDANCE,
+)
+
+SECTION = "section"
+MUNICIPIO = "municipio"
+
+COUNTER_SLOTS = 8
+
+
+def _bump(session: Session, name: str, delta: int) -> None:
+    if not delta:
+        return
+    session.execute(
+        update(models.DashboardCounter)
+        .where(
+            models.DashboardCounter.name == name,
+            models.DashboardCounter.slot == random.randrange(COUNTER_SLOTS),
+        )
+        .values(value=models.DashboardCounter.value + delta)
+    )
+
+
+def _add_counter(session: Session, name: str, value: int) -> None:
+    session.add(models.DashboardCounter(name=name, slot=0, value=value))
+    for slot in range(1, COUNTER_SLOTS):
+        session.add(models.DashboardCounter(name=name, slot=slot, value=0))
+
+
+def _read(session: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Sum of the slots of each counter that exists."""
+    rows = session.exec(
+        select(models.DashboardCounter.name, func.sum(models.DashboardCounter.value))
+        .where(models.DashboardCounter.name.in_(list(names)))
+        .group_by(models.DashboardCounter.name)
+    ).all()
+    return {name: int(total or 0) for name, total in rows}
+
+
+def _adjust_coverage(session: Session, kind: str, code: str, delta: int) -> int:
+    """Apply `delta` to one coverage count; return +1/-1 when it starts/stops being covered."""
+    coverage = models.CoverageCount
+    if delta > 0:
+        # Upsert: the first committees of a new section may be created at the same moment
+        increment(session, coverage, [{"kind": kind, "code": code, "committees": delta}], column="committees")
+    else:
+        session.execute(
+            update(coverage)
+            .where(coverage.kind == kind, coverage.code == code)
+            .values(committees=coverage.committees + delta)
+        )
+    # The row is locked by the write above, so this reads the value just written
+    after = session.exec(
+        select(coverage.committees).where(coverage.kind == kind, coverage.code == code).with_for_update()
+    ).first()
+    if after is None:
+        return 0
+    before = after - delta
+    if after < 0:
+        session.execute(
+            update(coverage).where(coverage.kind == kind, coverage.code == code).values(committees=0)
+        )
+    if before <= 0 < after:
+        return 1
+    if before > 0 >= after:
+        return -1
+    return 0
+
+
+def _municipio_names(session: Session, section_numbers: Iterable[str]) -> Dict[str, str]:
+    # Same matching rule as the dashboard joins: CAST(seccion.id AS CHAR) = section_number
+    ids = {}
+    for number in section_numbers:
+        try:
+            section_id = int(number)
+        except (TypeError, ValueError):
+            continue
+        if str(section_id) == number:
+            ids[section_id] = number
+    if not ids:
+        return {}
+    rows = session.exec(
+        select(models.Seccion.id, models.Seccion.nombre_municipio).where(models.Seccion.id.in_(ids))
+    ).all()
+    return {ids[row.id]: row.nombre_municipio for row in rows if row.nombre_municipio is not None}
+
+
+def _record_sections(session: Session, section_numbers: Iterable[Optional[str]], sign: int) -> None:
+    per_section = Counter(number for number in section_numbers if number)
+    if not per_section:
+        return
+    municipios = _municipio_names(session, per_section)
+    per_municipio: Counter = Counter()
+    sections_delta = 0
+    for number, count in per_section.items():
+        sections_delta += _adjust_coverage(session, SECTION, number, sign * count)
+        if number in municipios:
+            per_municipio[municipios[number]] += count
+    municipios_delta = 0
+    for name, count in per_municipio.items():
+        municipios_delta += _adjust_coverage(session, MUNICIPIO, name, sign * count)
+    _bump(session, SECCIONES_CUBIERTAS, sections_delta)
+    _bump(session, MUNICIPIOS_CUBIERTOS, municipios_delta)
+
+
+def record_committees_created(
+    session: Session, section_numbers: Iterable[Optional[str]], members: int = 0
+) -> None:
+    section_numbers = list(section_numbers)
+    _bump(session, COMMITTEES, len(section_numbers))
+    _bump(session, MEMBERS, members)
+    _record_sections(session, section_numbers, 1)
+
+
+def record_committee_deleted(
+    session: Session, section_number: Optional[str], members: int = 0, documents: int = 0
+) -> None:
+    _bump(session, COMMITTEES, -1)
+    _bump(session, MEMBERS, -members)
+    _bump(session, DOCUMENTS, -documents)
+    _record_sections(session, [section_number], -1)
+
+
+def record_members(session: Session, delta: int) -> None:
+    _bump(session, MEMBERS, delta)
+
+
+def record_documents(session: Session, delta: int) -> None:
+    _bump(session, DOCUMENTS, delta)
+
+
+def event_counter_name(event_id: int) -> str:
+    return f"{EVENT_ATTENDANCE_PREFIX}{event_id}"
+
+
+def record_event_created(session: Session, event_id: int) -> None:
+    _add_counter(session, event_counter_name(event_id), 0)
+
+
+def record_attendance(session: Session, event_id: Optional[int]) -> None:
+    _bump(session, ATTENDANCE, 1)
+    if event_id is not None:
+        _bump(session, event_counter_name(event_id), 1)
+
+
+def rebuild(session: Session) -> Dict[str, int]:
+    """Recompute every counter and coverage count from the base tables."""
+    values = {
+        COMMITTEES: session.exec(select(func.count(models.Committee.id))).one(),
+        MEMBERS: session.exec(select(func.count(models.CommitteeMember.id))).one(),
+        DOCUMENTS: session.exec(select(func.count(models.CommitteeDocument.id))).one(),
+        TOTAL_SECCIONES: session.exec(select(func.count(models.Seccion.id))).one(),
+        ATTENDANCE: session.exec(select(func.count(models.Attendance.id))).one(),
+    }
+    event_counts = {event_id: 0 for event_id in session.exec(select(models.Event.id)).all()}
+    for event_id, total in session.exec(
+        select(models.Attendance.event_id, func.count(models.Attendance.id))
+        .where(models.Attendance.event_id.is_not(None))
+        .group_by(models.Attendance.event_id)
+    ).all():
+        if event_id in event_counts:
+            event_counts[event_id] = total
+
+    session.execute(delete(models.CoverageCount))
+    section_rows = session.exec(
+        select(models.Committee.section_number, func.count(models.Committee.id))
+        .where(
+            models.Committee.section_number.is_not(None),
+            models.Committee.section_number != "",
+        )
+        .group_by(models.Committee.section_number)
+    ).all()
+    for number, total in section_rows:
+        session.add(models.CoverageCount(kind=SECTION, code=number, committees=total))
+
+    municipio_rows = session.exec(
+        select(models.Seccion.nombre_municipio, func.count(models.Committee.id))
+        .select_from(models.Committee)
+        .join(models.Seccion, cast(models.Seccion.id, String) == models.Committee.section_number)
+        .where(models.Seccion.nombre_municipio.is_not(None))
+        .group_by(models.Seccion.nombre_municipio)
+    ).all()
+    for name, total in municipio_rows:
+        session.add(models.CoverageCount(kind=MUNICIPIO, code=name, committees=total))
+
+    values[SECCIONES_CUBIERTAS] = len(section_rows)
+    values[MUNICIPIOS_CUBIERTOS] = len(municipio_rows)
+
+    session.execute(delete(models.DashboardCounter))
+    for name in COUNTER_NAMES:
+        _add_counter(session, name, int(values[name] or 0))
+    for event_id, total in event_counts.items():
+        _add_counter(session, event_counter_name(event_id), int(total or 0))
+    session.commit()
+    return values
+
+
+def read_counters(session: Session) -> Dict[str, int]:
+    """One primary-key range scan over a few dozen rows; rebuilds on first use."""
+    values = _read(session, COUNTER_NAMES)
+    if any(name not in values for name in COUNTER_NAMES):
+        values = rebuild(session)
+    return values
+
+
+def read_attendance_total(session: Session) -> int:
+    values = _read(session, [ATTENDANCE])
+    if ATTENDANCE not in values:
+        values = read_counters(session)
+    return int(values[ATTENDANCE])
+
+
+def read_event_attendance(session: Session, event_ids: Iterable[int]) -> Dict[int, int]:
+    """Check-ins per event in one query; events without a counter read 0."""
+    event_ids = list(event_ids)
+    if not event_ids:
+        return {}
+    values = _read(session, [event_counter_name(event_id) for event_id in event_ids])
+    return {event_id: values.get(event_counter_name(event_id), 0) for event_id in event_ids}
+
+
+def refresh_total_secciones(session: Session) -> int:
+    """Re-count the section catalog, which is loaded outside the API; call it after importing `seccion`."""
+    total = int(session.exec(select(func.count(models.Seccion.id))).one() or 0)
+    # Only this function writes the counter, so slot 0 holds the whole value
+    session.execute(
+        update(models.DashboardCounter)
+        .where(models.DashboardCounter.name == TOTAL_SECCIONES, models.DashboardCounter.slot == 0)
+        .values(value=total)
+    )
+    session.commit()
+    return total
+
+
+def ensure_counters(session: Session) -> None:
+    names = set(
+        session.exec(
+            select(models.DashboardCounter.name)
+            .where(models.DashboardCounter.name.in_(COUNTER_NAMES))
+            .distinct()
+        ).all()
+    )
+    if any(name not in names for name in COUNTER_NAMES):
+        # First start, or a counter added since the last rebuild
+        rebuild(session)
+        return
+    # The section catalog is loaded outside the API, so its size is also refreshed on every start
+    refresh_total_secciones(session)
@@ -1,72 +1,230 @@
-from sqlalchemy import text
+"""
+Engines and sessions.
+
+Pool sizing, recycling and the pre-ping strategy come from `Settings`
+(DB_POOL_*, DB_PRE_PING). `DB_PRE_PING=idle` only pings connections that sat
+in the pool longer than DB_PRE_PING_IDLE_SECONDS, instead of adding a
+`SELECT 1` round trip to every checkout; a failed ping discards the connection
+and the pool hands out a fresh one.
+
+With DATABASE_REPLICA_URL set, `get_read_session` sends GET/HEAD requests of
+the routers that use it (the dashboard) to the replica; writes and every other
+router keep using the primary through `get_session`. Right after a write in
+this process (`data_versions.bump`) reads stay on the primary for
+DB_REPLICA_LAG_SECONDS, so caches are not rebuilt from a replica that has not
+caught up yet.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
 from sqlmodel import create_engine, Session, SQLModel
+from .cache import data_versions
 from .config import settings
 
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+READ_METHODS = ("GET", "HEAD")
+
+
+class PoolStats:
+    """Checkout counters for one engine; `snapshot` adds the pool's current occupancy."""
+
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.checkouts = 0
+        self.pings = 0
+        self.stale_connections = 0
+        self.peak_checked_out = 0
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        checked_out = _pool_metric(pool, "checkedout")
+        size = _pool_metric(pool, "size")
+        overflow = _pool_metric(pool, "overflow")
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        capacity = size + max_overflow if size is not None and max_overflow >= 0 else None
+        return {
+            "engine": self.name,
+            "pool": type(pool).__name__,
+            "size": size,
+            "max_overflow": max_overflow,
+            "checked_in": _pool_metric(pool, "checkedin"),
+            "checked_out": checked_out,
+            # QueuePool reports negative overflow while the pool is not yet full
+            "overflow": max(overflow, 0) if overflow is not None else None,
+            "peak_checked_out": self.peak_checked_out,
+            # None when the pool has no upper bound (max_overflow=-1) or does not report it
+            "utilization": round(checked_out / capacity, 3) if capacity and checked_out is not None else None,
+            "checkouts": self.checkouts,
+            "pings": self.pings,
+            "stale_connections": self.stale_connections,
+        }
+
+
+def _pool_metric(pool, name: str) -> Optional[int]:
+    # Only QueuePool reports occupancy; other pools (in-memory SQLite) may not have the method
+    value = getattr(pool, name, None)
+    return value() if callable(value) else None
+
+
+def _ping(dbapi_connection) -> None:
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+    except Exception as error:
+        # The pool invalidates this connection and retries the checkout with a new one
+        raise exc.DisconnectionError() from error
+
+
+def _instrument(name: str, engine: Engine) -> PoolStats:
+    stats = PoolStats(name, engine)
+    strategy = settings.db_pre_ping
+    idle_seconds = settings.db_pre_ping_idle_seconds
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        stats.checkouts += 1
+        checked_in_at = record.info.get("checked_in_at")
+        if strategy == "idle" and checked_in_at is not None and time.monotonic() - checked_in_at > idle_seconds:
+            stats.pings += 1
+            try:
+                _ping(dbapi_connection)
+            except exc.DisconnectionError:
+                stats.stale_connections += 1
+                raise
+        checked_out = _pool_metric(engine.pool, "checkedout")
+        if checked_out is not None:
+            stats.peak_checked_out = max(stats.peak_checked_out, checked_out)
+
+    return stats
+
+
+def build_engine(url: str, name: str = "primary") -> Engine:
+    if settings.db_pre_ping not in PRE_PING_STRATEGIES:
+        raise ValueError(f"DB_PRE_PING debe ser uno de {', '.join(PRE_PING_STRATEGIES)}")
+    parsed = make_url(url)
+    sqlite = parsed.get_backend_name() == "sqlite"
+    options = {
+        "pool_pre_ping": settings.db_pre_ping == "always",
+        "pool_recycle": settings.db_pool_recycle,
+        "connect_args": {"check_same_thread": False} if sqlite else {},
+    }
+    # In-memory SQLite uses a single-connection pool that takes no sizing
+    if not (sqlite and parsed.database in (None, "", ":memory:")):
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    engine = create_engine(url, **options)
+    pool_stats_by_engine[name] = _instrument(name, engine)
+    return engine
+
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    connect_args={"check_same_thread": False} if str(settings.database_url).startswith("sqlite") else {},
+pool_stats_by_engine: Dict[str, PoolStats] = {}
+engine = build_engine(settings.database_url)
+replica_engine: Optional[Engine] = (
+    build_engine(settings.database_replica_url, "replica") if settings.database_replica_url else None
 )
 
 
-def init_db():
+class _ReplicaRouter:
+    """Decides per read whether the replica may serve it (read-your-writes window after local writes)."""
+
+    def __init__(self, lag_seconds: float):
+        self.lag_seconds = lag_seconds
+        self._last_write = float("-inf")
+        self._lock = threading.Lock()
+
+    def record_write(self, _name: str = "") -> None:
+        with self._lock:
+            self._last_write = time.monotonic()
+
+    def use_replica(self) -> bool:
+        return replica_engine is not None and time.monotonic() - self._last_write >= self.lag_seconds
+
+
+replica_router = _ReplicaRouter(settings.db_replica_lag_seconds)
+if replica_engine is not None:
+    data_versions.subscribe(replica_router.record_write)
+
+
+def read_engine() -> Engine:
+    """Engine for reads that tolerate replica lag (dashboard aggregates and their caches)."""
+    return replica_engine if replica_router.use_replica() else engine
+
+
+def pool_stats() -> List[dict]:
+    return [stats.snapshot() for stats in pool_stats_by_engine.values()]
+
+
+def pool_health() -> Dict[str, dict]:
+    """
+    Per engine: "ok" when a pooled connection can be checked out (no query
+    unless it sat idle past DB_PRE_PING_IDLE_SECONDS; a new connection only
+    costs the connect), "saturated" when every connection is in use (reported
+    without waiting for one), "error" when no connection can be obtained.
+    """
+    health = {}
+    for name, stats in pool_stats_by_engine.items():
+        snapshot = stats.snapshot()
+        capacity = (snapshot["size"] or 0) + snapshot["max_overflow"]
+        if snapshot["size"] is not None and snapshot["max_overflow"] >= 0 and snapshot["checked_out"] >= capacity:
+            status = "saturated"
+        else:
+            try:
+                stats.engine.raw_connection().close()  # back to the pool
+                status = "ok"
+            except Exception as error:
+                health[name] = {"status": "error", "error": str(error)[:200], **snapshot}
+                continue
+        health[name] = {"status": status, **snapshot}
+    return health
+
+
+def init_db(apply_migrations: Optional[bool] = None) -> List[str]:
+    """
+    Create missing tables and apply pending migrations (default: AUTO_MIGRATE);
+    returns the names of the migrations applied.
+    """
     import logging
-    from . import models  # noqa: F401 ensure models imported
-    
-    logging.info("Creating database tables (if not exist)...")
-    SQLModel.metadata.create_all(engine)
+    from . import migrations, models  # noqa: F401 ensure models imported
 
-    # Manual migrations for legacy databases (MySQL)
-    if engine.dialect.name == "mysql":
-        with engine.connect() as conn:
-            result = conn.execute(text("SHOW COLUMNS FROM committee LIKE :column"), {"column": "administrative_unit_id"})
-            if result.first() is None:
-                logging.info("Adding column committee.administrative_unit_id (legacy migration)")
-                conn.execute(text("ALTER TABLE committee ADD COLUMN administrative_unit_id INT NULL"))
-                conn.commit()
-
-            owner_result = conn.execute(text("SHOW COLUMNS FROM committee LIKE :column"), {"column": "owner_id"})
-            owner_column = owner_result.mappings().first()
-            if owner_column and not owner_column["Type"].lower().startswith("varchar"):
-                logging.info("Altering column committee.owner_id to VARCHAR(255) (legacy migration)")
-                conn.execute(text("ALTER TABLE committee MODIFY COLUMN owner_id VARCHAR(255) NOT NULL"))
-                conn.commit()
-
-            for column_name, column_type in [
-                ("presidente", "VARCHAR(255)"),
-                ("email", "VARCHAR(255)"),
-                ("clave_afiliacion", "VARCHAR(255)"),
-                ("telefono", "VARCHAR(64)"),
-            ]:
-                column_result = conn.execute(text("SHOW COLUMNS FROM committee LIKE :column"), {"column": column_name})
-                column_info = column_result.mappings().first()
-
-                if column_info is None:
-                    logging.info("Adding column committee.%s (legacy migration)", column_name)
-                    conn.execute(
-                        text(
-                            f"ALTER TABLE committee ADD COLUMN {column_name} {column_type} NOT NULL DEFAULT ''"
-                        )
-                    )
-                    conn.commit()
-                else:
-                    logging.debug("Backfilling NULL values in committee.%s", column_name)
-                    conn.execute(text(f"UPDATE committee SET {column_name} = '' WHERE {column_name} IS NULL"))
-                    conn.commit()
-
-                    needs_alter = column_info.get("Null", "YES") == "YES" or (column_info.get("Default") not in ("", "''"))
-                    if needs_alter:
-                        logging.info("Normalizing column committee.%s to NOT NULL DEFAULT ''", column_name)
-                        conn.execute(
-                            text(
-                                f"ALTER TABLE committee MODIFY COLUMN {column_name} {column_type} NOT NULL DEFAULT ''"
-                            )
-                        )
-                        conn.commit()
+    SQLModel.metadata.create_all(engine)
+    if settings.auto_migrate if apply_migrations is None else apply_migrations:
+        return migrations.migrate(engine)
+    waiting = migrations.pending(engine)
+    if waiting:
+        logging.warning(
+            "Pending schema migrations (AUTO_MIGRATE=0): %s", ", ".join(name for _, name, _ in waiting)
+        )
+    return []
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+def get_read_session(request: Request, session: Session = Depends(get_session)):
+    """
+    Replica session for GET/HEAD when one is configured and not inside the
+    post-write window; otherwise the request's primary session (shared with
+    auth and scope dependencies, so no extra connection is checked out).
+    """
+    if request.method not in READ_METHODS or not replica_router.use_replica():
+        yield session
+        return
+    with Session(replica_engine) as replica_session:
+        yield replica_session
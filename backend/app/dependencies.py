@@ -1,21 +1,18 @@
-from fastapi import Depends, HTTPException
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
 from sqlmodel import Session, select
 from .config import settings
 from .database import get_session
 from . import models
+from .unit_scope import UnitScope, unit_hierarchy
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    session: Session = Depends(get_session),
-) -> models.User:
-    if credentials is None:
-        raise HTTPException(status_code=401, detail="No autenticado")
-    token = credentials.credentials
+def user_from_token(token: str, session: Session) -> models.User:
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
         user_id = int(payload.get("sub"))
@@ -28,10 +25,28 @@ def get_current_user(
     return user
 
 
-def require_dashboard_user(
-    user: models.User = Depends(get_current_user),
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     session: Session = Depends(get_session),
 ) -> models.User:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    return user_from_token(credentials.credentials, session)
+
+
+def get_stream_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    access_token: Optional[str] = Query(None),
+    session: Session = Depends(get_session),
+) -> models.User:
+    """Like get_current_user, but EventSource cannot send headers: accept ?access_token= too."""
+    token = credentials.credentials if credentials is not None else access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    return user_from_token(token, session)
+
+
+def _dashboard_assignment(user: models.User, session: Session) -> models.UserAssignment:
     assignment = session.exec(
         select(models.UserAssignment)
         .where(models.UserAssignment.user_id == user.id)
@@ -39,4 +54,34 @@ def require_dashboard_user(
     ).first()
     if assignment is None or assignment.role is None or assignment.role > 5:
         raise HTTPException(status_code=403, detail="No cuentas con permisos para acceder al dashboard")
+    return assignment
+
+
+def get_dashboard_assignment(
+    user: models.User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> models.UserAssignment:
+    return _dashboard_assignment(user, session)
+
+
+def require_dashboard_user(
+    user: models.User = Depends(get_current_user),
+    assignment: models.UserAssignment = Depends(get_dashboard_assignment),
+) -> models.User:
     return user
+
+
+def require_dashboard_stream_user(
+    user: models.User = Depends(get_stream_user),
+    session: Session = Depends(get_session),
+) -> models.User:
+    _dashboard_assignment(user, session)
+    return user
+
+
+def get_dashboard_scope(
+    assignment: models.UserAssignment = Depends(get_dashboard_assignment),
+    session: Session = Depends(get_session),
+) -> UnitScope:
+    """Units and sections the caller may see, from their latest assignment."""
+    return unit_hierarchy.scope_for_assignment(session, assignment)
@@ -0,0 +1,83 @@
+"""Event lookup and live attendance counts.
+
+Events are few, so the registry keeps their time windows in memory to resolve
+the current event of a check-in without a query. Attendance counts (per event
+and overall) are read from the counters each check-in bumps in its own
+transaction (app/dashboard_counters.py): a primary-key lookup, shared by every
+worker, instead of a COUNT over the attendance table.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from . import dashboard_counters, models
+
+EVENTS_REFRESH_SECONDS = 60.0
+
+
+def naive_local(value: datetime) -> datetime:
+    """Normalize to naive Mexico City time, the way DATETIME columns store it."""
+    if value.tzinfo is not None:
+        value = value.astimezone(models.MEXICO_CITY_TZ).replace(tzinfo=None)
+    return value
+
+
+class EventRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: List[Tuple[int, datetime, datetime]] = []
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _windows_for(self, session: Session) -> List[Tuple[int, datetime, datetime]]:
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < EVENTS_REFRESH_SECONDS:
+                return self._windows
+        rows = session.exec(
+            select(models.Event.id, models.Event.starts_at, models.Event.ends_at).order_by(models.Event.starts_at)
+        ).all()
+        windows = [(row.id, naive_local(row.starts_at), naive_local(row.ends_at)) for row in rows]
+        with self._lock:
+            self._windows = windows
+            self._loaded_at = time.monotonic()
+        return windows
+
+    def window(self, session: Session, event_id: int) -> Optional[Tuple[datetime, datetime]]:
+        for wid, starts_at, ends_at in self._windows_for(session):
+            if wid == event_id:
+                return starts_at, ends_at
+        return None
+
+    def current_event_id(self, session: Session, at: Optional[datetime] = None) -> Optional[int]:
+        at = naive_local(at or models.get_mexico_city_time())
+        current = None
+        for event_id, starts_at, ends_at in self._windows_for(session):
+            if starts_at <= at <= ends_at:
+                current = event_id  # latest start wins when events overlap
+        return current
+
+    def is_open(self, session: Session, event_id: int, at: Optional[datetime] = None) -> bool:
+        bounds = self.window(session, event_id)
+        if bounds is None:
+            return False
+        at = naive_local(at or models.get_mexico_city_time())
+        return bounds[0] <= at <= bounds[1]
+
+    def count(self, session: Session, event_id: int) -> int:
+        return self.counts(session, [event_id])[event_id]
+
+    def counts(self, session: Session, event_ids: Iterable[int]) -> Dict[int, int]:
+        return dashboard_counters.read_event_attendance(session, event_ids)
+
+    def total(self, session: Session) -> int:
+        """Check-ins across all events, for the live feed's running total."""
+        return dashboard_counters.read_attendance_total(session)
+
+
+event_registry = EventRegistry()
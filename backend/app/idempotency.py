@@ -0,0 +1,291 @@
+"""Idempotency-Key support for the write endpoints mobile clients retry.
+
+A client sends `Idempotency-Key: <unique value per logical write>` with
+`POST /committees`, `/committees/bulk`, `/committees/{id}/members` or
+`/committees/{id}/documents`. The first request claims the key (a row in
+`idempotency_keys`, keyed by a hash of user, path and key) and runs normally;
+its 2xx response is stored with a hash of the request body. A retry with the
+same key gets the stored response back, with `Idempotent-Replayed: true`,
+without running the write again:
+
+- same key, different body: 422 (the key was reused for another request);
+- same key while the first request is still running: 409 with Retry-After;
+- errors and responses over IDEMPOTENCY_MAX_RESPONSE_BYTES are not stored,
+  so the client can retry them.
+
+Each check is one primary-key lookup. Rows expire after
+IDEMPOTENCY_TTL_SECONDS and are purged at most once a minute per worker
+through the `expires_at` index. Multipart boundaries are left out of the body
+hash, because a retried upload is usually re-encoded with a new boundary.
+
+Requests without the header, or without a valid bearer token (the endpoint
+rejects those anyway), go straight through.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Set
+
+import jwt
+import orjson
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from . import models
+from .config import settings
+from .database import engine
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+_endpoints: Set[Callable] = set()
+
+
+def idempotent(endpoint: Callable) -> Callable:
+    """Mark a POST endpoint as honouring Idempotency-Key (put it under the route decorator)."""
+    _endpoints.add(endpoint)
+    return endpoint
+
+
+@dataclass
+class StoredResponse:
+    request_hash: Optional[str]
+    status_code: Optional[int]  # None while the first request is still running
+    content_type: Optional[str]
+    body: bytes
+
+
+_IN_PROGRESS = StoredResponse(None, None, None, b"")
+
+
+class IdempotencyStore:
+    def __init__(self, engine):
+        self.engine = engine
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    def claim(self, key_hash: str) -> Optional[StoredResponse]:
+        """None when this request now owns the key; otherwise what the key already holds."""
+        now = time.time()
+        with Session(self.engine) as session:
+            record = session.get(models.IdempotencyKey, key_hash)
+            if record is not None and record.expires_at > now:
+                return StoredResponse(
+                    record.request_hash, record.status_code, record.content_type, record.response_body or b""
+                )
+            if record is not None:
+                session.delete(record)
+                session.flush()
+            session.add(models.IdempotencyKey(key_hash=key_hash, expires_at=int(now + settings.idempotency_lock_seconds)))
+            try:
+                session.commit()
+            except IntegrityError:
+                # A concurrent request with the same key claimed it first
+                return _IN_PROGRESS
+        self._purge_expired(now)
+        return None
+
+    def complete(self, key_hash: str, request_hash: str, status_code: int, content_type: str, body: bytes) -> None:
+        with Session(self.engine) as session:
+            record = session.get(models.IdempotencyKey, key_hash)
+            if record is None:
+                return
+            record.request_hash = request_hash
+            record.status_code = status_code
+            record.content_type = content_type
+            record.response_body = body
+            record.expires_at = int(time.time() + settings.idempotency_ttl_seconds)
+            session.add(record)
+            session.commit()
+
+    def release(self, key_hash: str) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(models.IdempotencyKey).where(models.IdempotencyKey.key_hash == key_hash))
+            session.commit()
+
+    def _purge_expired(self, now: float) -> None:
+        with self._purge_lock:
+            if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = now
+        with Session(self.engine) as session:
+            session.exec(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < int(now)))
+            session.commit()
+
+
+idempotency_store = IdempotencyStore(engine)
+
+
+class _BodyHasher:
+    """sha256 of the request body with the multipart boundary removed, fed chunk by chunk."""
+
+    def __init__(self, content_type: str):
+        match = re.search(r'boundary="?([^";]+)"?', content_type)
+        self._boundary = match.group(1).encode("latin-1") if match else b""
+        self._hash = hashlib.sha256(content_type.split(";", 1)[0].strip().lower().encode("latin-1") + b"\x00")
+        self._tail = b""
+        self.complete = False
+
+    def update(self, chunk: bytes, more_body: bool) -> None:
+        if self._boundary:
+            data = (self._tail + chunk).replace(self._boundary, b"")
+            # Keep enough bytes to catch a boundary split across two chunks
+            keep = 0 if not more_body else min(len(data), len(self._boundary) - 1)
+            self._hash.update(data[: len(data) - keep])
+            self._tail = data[len(data) - keep:]
+        else:
+            self._hash.update(chunk)
+        if not more_body:
+            self.complete = True
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def _user_id(authorization: str) -> Optional[str]:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except Exception:
+        return None
+    return str(payload.get("sub")) if payload.get("sub") is not None else None
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _is_idempotent_route(scope) -> bool:
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "endpoint", None) in _endpoints
+    return False
+
+
+async def _send_json(send, status: int, detail: str, headers=()) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying stored responses for `@idempotent` endpoints (see module docstring)."""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store or idempotency_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        key = _header(scope, IDEMPOTENCY_HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        user_id = _user_id(_header(scope, b"authorization"))
+        if user_id is None or not _is_idempotent_route(scope):
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key no puede exceder {MAX_KEY_LENGTH} caracteres")
+            return
+
+        key_hash = hashlib.sha256(f"{user_id}\x00{scope['path']}\x00{key}".encode()).hexdigest()
+        hasher = _BodyHasher(_header(scope, b"content-type"))
+        stored = await run_in_threadpool(self.store.claim, key_hash)
+        if stored is not None:
+            await self._replay(stored, hasher, receive, send)
+            return
+
+        async def hashing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                hasher.update(message.get("body", b""), message.get("more_body", False))
+            return message
+
+        status = 500
+        content_type = ""
+        chunks = []
+        size = 0
+
+        async def capturing_send(message):
+            nonlocal status, content_type, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = next(
+                    (value.decode("latin-1") for name, value in message.get("headers", []) if name == b"content-type"),
+                    "",
+                )
+            elif message["type"] == "http.response.body" and size <= settings.idempotency_max_response_bytes:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                chunks.append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+        except BaseException:
+            await run_in_threadpool(self.store.release, key_hash)
+            raise
+        if 200 <= status < 300 and hasher.complete and size <= settings.idempotency_max_response_bytes:
+            await run_in_threadpool(
+                self.store.complete, key_hash, hasher.hexdigest(), status, content_type, b"".join(chunks)
+            )
+        else:
+            # Failed (or too large to keep): let the client retry with the same key
+            await run_in_threadpool(self.store.release, key_hash)
+
+    async def _replay(self, stored: StoredResponse, hasher: _BodyHasher, receive, send) -> None:
+        if stored.status_code is None:
+            await _send_json(
+                send,
+                409,
+                "Una solicitud con esta Idempotency-Key sigue en proceso",
+                headers=[(b"retry-after", b"1")],
+            )
+            return
+        while not hasher.complete:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # client went away
+            hasher.update(message.get("body", b""), message.get("more_body", False))
+        if hasher.hexdigest() != stored.request_hash:
+            await _send_json(send, 422, "La Idempotency-Key ya se usó con una solicitud distinta")
+            return
+        logger.info("Respuesta repetida por Idempotency-Key", extra={"status": stored.status_code})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": stored.status_code,
+                "headers": [
+                    (b"content-type", (stored.content_type or "application/json").encode("latin-1")),
+                    (b"content-length", str(len(stored.body)).encode()),
+                    (REPLAYED_HEADER, b"true"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": stored.body})
@@ -0,0 +1,171 @@
+"""In-process pub/sub for live attendance updates (Server-Sent Events).
+
+Every subscriber gets a bounded asyncio queue; when a slow client falls behind,
+the oldest messages are dropped so one connection can never hold unbounded
+memory. Messages carry running totals, so a client that missed some still
+shows correct numbers.
+
+With several uvicorn workers a check-in only reaches the subscribers of the
+worker that handled it. `RedisBroker` relays messages through a pub/sub channel
+so every worker fans them out to its own clients; like the response cache it
+accepts any redis-py compatible client, so a local stand-in can replace the
+server.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from .config import settings
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def offer(self, message: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+
+class InProcessBroker:
+    def __init__(self, buffer_size: int = 100):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def fan_out(self, message: Dict[str, Any]) -> None:
+        """Deliver to local subscribers; safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                # Loop already closed; the stream cleanup will unsubscribe it
+                pass
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        self.fan_out(message)
+
+
+class RedisBroker(InProcessBroker):
+    RECONNECT_MIN_SECONDS = 0.5
+    RECONNECT_MAX_SECONDS = 30.0
+
+    def __init__(self, client, channel: str = "r21:attendance", buffer_size: int = 100):
+        super().__init__(buffer_size)
+        self._client = client
+        self._channel = channel
+        self._listener: Optional[threading.Thread] = None
+        self._listener_lock = threading.Lock()
+
+    def _listen_once(self) -> None:
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self._channel)
+            for item in pubsub.listen():
+                try:
+                    self.fan_out(json.loads(item["data"]))
+                except Exception:
+                    logging.exception("invalid live feed message")
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+    def _listen(self) -> None:
+        # A dropped connection ends listen(); resubscribe with exponential backoff.
+        # Messages published meanwhile are lost, but each one carries running totals.
+        delay = self.RECONNECT_MIN_SECONDS
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    self._listen_once()
+                except Exception:
+                    logging.exception("live feed pub/sub failed")
+                if time.monotonic() - started > self.RECONNECT_MAX_SECONDS:
+                    delay = self.RECONNECT_MIN_SECONDS  # it was up for a while: not a flapping server
+                logging.warning("live feed pub/sub disconnected; reconnecting in %.1f s", delay)
+                time.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+        finally:
+            # Whatever stopped the loop, the next subscriber starts a new listener
+            with self._listener_lock:
+                if self._listener is threading.current_thread():
+                    self._listener = None
+
+    def subscribe(self) -> Subscription:
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="live-feed-redis", daemon=True)
+                self._listener.start()
+        return super().subscribe()
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        try:
+            self._client.publish(self._channel, json.dumps(message, default=str))
+        except Exception:
+            logging.exception("live feed publish failed; delivering locally")
+            self.fan_out(message)
+
+
+def build_broker(redis_url: str = "", buffer_size: int = 100):
+    if settings.live_feed_backend == "redis" and redis_url:
+        try:
+            import redis  # optional dependency
+
+            return RedisBroker(redis.Redis.from_url(redis_url), buffer_size=buffer_size)
+        except ImportError:
+            logging.warning("LIVE_FEED_BACKEND=redis pero el paquete redis no está instalado; usando memoria")
+    return InProcessBroker(buffer_size=buffer_size)
+
+
+def format_sse(message: Dict[str, Any], event: Optional[str] = None) -> str:
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(message, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def check_in_message(attendance) -> Dict[str, Any]:
+    """Payload for a new check-in; the caller adds the running totals."""
+    return {
+        "type": "check_in",
+        "id": attendance.id,
+        "name": attendance.name,
+        "event_id": attendance.event_id,
+        "latitude": float(attendance.latitude) if attendance.latitude is not None else None,
+        "longitude": float(attendance.longitude) if attendance.longitude is not None else None,
+        "created_at": attendance.created_at.isoformat() if attendance.created_at else None,
+    }
+
+
+attendance_broker = build_broker(settings.redis_url, settings.live_feed_buffer_size)
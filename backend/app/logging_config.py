@@ -0,0 +1,225 @@
+"""Structured logging with the I/O moved off the request thread.
+
+`configure_logging()` installs a single `QueueHandler` on the root logger.
+A request only formats its record and puts it on an in-memory queue. A
+`QueueListener` thread writes it to the configured sinks (LOG_SINKS:
+`stdout`, `stderr`, `file:<path>` with rotation), so a slow disk or
+terminal never adds latency to an upload or a login.
+
+Records are rendered as one JSON object per line (LOG_FORMAT=json, the
+default) or as plain text. Every record carries the `request_id` of the
+request that produced it: `RequestIdMiddleware` takes it from the
+`X-Request-ID` header (or generates one), keeps it in a context variable
+that FastAPI carries into the threadpool, and echoes it in the response.
+
+High-volume INFO/DEBUG logs can be sampled per logger prefix with
+LOG_SAMPLE_RATES (`app.http=0.1,app.documents=0.5`); warnings and errors are
+never sampled. The per-request access log (`app.http`) is one such stream.
+Fields passed through `extra={...}` become top-level JSON keys.
+"""
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import orjson
+
+from .config import settings
+
+REQUEST_ID_HEADER = b"x-request-id"
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came from `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+access_logger = logging.getLogger("app.http")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s [%(levelname)s] %(name)s [%(request_id)s] %(message)s")
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the current request id; runs on the caller's thread, before the record is queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of INFO/DEBUG records for the configured logger prefixes."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first so "app.http.slow" can override "app.http"
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, keep the message and the traceback apart so the
+        # sink's formatter can emit the exception as its own field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def _sink(spec: str) -> logging.Handler:
+    if spec == "stdout":
+        return logging.StreamHandler(sys.stdout)
+    if spec == "stderr":
+        return logging.StreamHandler(sys.stderr)
+    if spec.startswith("file:"):
+        path = spec[len("file:"):]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=settings.log_file_max_bytes, backupCount=settings.log_file_backups, encoding="utf-8"
+        )
+    raise ValueError(f"LOG_SINKS: destino desconocido {spec!r} (stdout, stderr o file:<ruta>)")
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> None:
+    """Route the root logger through the queue (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    formatter = JsonFormatter() if settings.log_format == "json" else TextFormatter()
+    sinks: List[logging.Handler] = []
+    for spec in filter(None, (part.strip() for part in settings.log_sinks.split(","))):
+        handler = _sink(spec)
+        handler.setFormatter(formatter)
+        sinks.append(handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(settings.log_sample_rates)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: request id per HTTP request, echoed as X-Request-ID, plus a sampled access log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = next(
+            (value.decode("latin-1") for key, value in scope["headers"] if key == REQUEST_ID_HEADER), ""
+        )
+        request_id = incoming if _REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            access_logger.log(
+                logging.WARNING if status >= 500 else logging.INFO,
+                "%s %s %s",
+                scope["method"],
+                scope["path"],
+                status,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(scope.get("route"), "path", None),
+                    "status": status,
+                    "duration_ms": round(elapsed_ms, 2),
+                },
+            )
+            request_id_var.reset(token)
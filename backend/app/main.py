@@ -1,9 +1,17 @@
+import logging
 import os
-from fastapi import FastAPI
+import secrets
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from .config import settings
-from .database import init_db
+from .database import init_db, pool_health
+from . import dashboard_counters, metrics, rollups, unit_closure
+from .committee_type_registry import committee_type_registry
+from .idempotency import IdempotencyMiddleware
+from .logging_config import RequestIdMiddleware, configure_logging
+from .query_profiler import QueryProfilerMiddleware
 from .auth import router as auth_router
 from .routers.committees import router as committees_router
 from .routers.documents import router as documents_router
@@ -12,20 +20,37 @@ from .routers.ocr import router as ocr_router
 from .routers.attendance import router as attendance_router
 from .routers.dashboard import router as dashboard_router
 from .routers.admin import router as admin_router
+from .routers.events import router as events_router
+from .routers.live import router as live_router
+
+logger = logging.getLogger(__name__)
 
 
 def create_app() -> FastAPI:
+    configure_logging()
     app = FastAPI(
         title=settings.app_name,
-        root_path="/api")
+        root_path="/api",
+        default_response_class=ORJSONResponse)
 
+    # Inside CORS, so replayed responses get the CORS headers too
+    app.add_middleware(IdempotencyMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[settings.frontend_origin, "http://localhost:5173"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Request-ID", "Idempotent-Replayed"],
     )
+    if settings.query_profiling:
+        # Query count and DB time per request; see app/query_profiler.py
+        app.add_middleware(QueryProfilerMiddleware)
+    if settings.metrics_enabled:
+        # Per-route latency histograms and in-flight requests for /metrics
+        app.add_middleware(metrics.MetricsMiddleware)
+    # Outermost, so every log line of the request (including the middlewares above) carries its id
+    app.add_middleware(RequestIdMiddleware)
 
     app.include_router(auth_router)
     app.include_router(committees_router)
@@ -35,6 +60,8 @@ def create_app() -> FastAPI:
     app.include_router(attendance_router)
     app.include_router(dashboard_router)
     app.include_router(admin_router)
+    app.include_router(events_router)
+    app.include_router(live_router)
 
     # Static files for uploaded images
     os.makedirs(settings.upload_dir, exist_ok=True)
@@ -43,37 +70,50 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     def on_startup():  # pragma: no cover - side effects only
+        # Creates missing tables; migrations (and the committee type seed) run once, tracked in schema_version.
+        # Not guarded: a worker must not serve requests against a schema it could not migrate.
         init_db()
-        # Seed default committee types if table is empty
-        try:
-            from .database import engine
-            from sqlmodel import Session, select
-            from . import models
-            with Session(engine) as session:
-                exists = session.exec(select(models.CommitteeType).limit(1)).first()
-                if not exists:
-                    defaults = [
-                        "Maestros",
-                        "Transportistas",
-                        "Seccionales",
-                        "Municipales",
-                        "Deportistas",
-                        "Territoriales",
-                        "Distritales",
-                        "Especiales",
-                        "Sectoriales",
-                        "Otros",
-                    ]
-                    for name in defaults:
-                        session.add(models.CommitteeType(name=name, is_active=True))
-                    session.commit()
-        except Exception:
-            # Do not block app startup if seeding fails
-            pass
+        from .database import engine
+        from sqlmodel import Session
+        warm_up = (
+            # Prime the registry so the first form load doesn't hit the DB
+            ("committee types", committee_type_registry.refresh),
+            # Backfill dashboard counters on the first start with the counters table
+            ("dashboard counters", dashboard_counters.ensure_counters),
+            # Same for the time-series rollups
+            ("rollups", rollups.ensure_rollups),
+            # Ancestry index for units inserted (or re-parented) outside unit_closure
+            ("unit closure", unit_closure.ensure_closure),
+        )
+        with Session(engine) as session:
+            for name, step in warm_up:
+                try:
+                    step(session)
+                except Exception:
+                    # Keep serving: the step runs again on the next start (counters and the type registry also load on first use)
+                    logger.exception("startup warm-up failed: %s", name)
+                    session.rollback()
 
     @app.get("/health")
-    def health():
-        return {"status": "ok"}
+    def health(response: Response):
+        # Pool checkout instead of a query: see database.pool_health
+        pools = pool_health()
+        statuses = {pool["status"] for pool in pools.values()}
+        if "error" in statuses:
+            response.status_code = 503
+            status = "error"
+        else:
+            status = "degraded" if "saturated" in statuses else "ok"
+        return {"status": status, "database": pools}
+
+    if settings.metrics_enabled:
+        @app.get("/metrics", include_in_schema=False)
+        def prometheus_metrics(request: Request):
+            if settings.metrics_token:
+                expected = f"Bearer {settings.metrics_token}"
+                if not secrets.compare_digest(request.headers.get("authorization", ""), expected):
+                    raise HTTPException(status_code=401, detail="Token de métricas inválido")
+            return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
     return app
 
@@ -0,0 +1,374 @@
+"""Process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms keep one shard per thread: a request only
+updates the dict of the thread it runs on (the event loop or a threadpool
+worker), so the hot path takes no lock and loses no increments. `/metrics`
+sums the shards when scraped. The only lock is taken once per thread, to
+register its shard.
+
+Values owned by other modules (pool occupancy, cache hit counts) are read at
+scrape time through `CallbackMetric`, so they cost nothing between scrapes.
+
+`MetricsMiddleware` records per-route request counts, latency histograms and
+in-flight requests. Routes are labelled with their path template
+(`/committees/{committee_id}`), never the raw path, so label cardinality stays
+bounded; requests that match no route are grouped as "unmatched".
+
+Every worker process has its own registry, so with several uvicorn workers
+each one is a separate scrape target (or aggregate them in Prometheus).
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _ThreadShards:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def all(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so a shard being written is never iterated
+        return [shard.copy() for shard in shards]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._shards = _ThreadShards()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        shard = self._shards.mine()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in self._shards.all():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self) -> Iterable[Sample]:
+        values = self.values()
+        if not values and not self.labelnames:
+            values = {(): 0}
+        for labels, value in sorted(values.items()):
+            yield self.name, self._labels(labels), value
+
+
+class Gauge(Counter):
+    """Counter that may go down (in-flight requests); shards sum to the current value."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _ThreadShards()
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shards.mine()
+        counts = shard.get(labels)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        merged: Dict[Labels, list] = {}
+        for shard in self._shards.all():
+            for labels, counts in shard.items():
+                total = merged.setdefault(labels, [0] * len(counts))
+                for index, value in enumerate(list(counts)):
+                    total[index] += value
+        for labels, counts in sorted(merged.items()):
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", base, counts[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+class CallbackMetric(_Metric):
+    """Values read at scrape time from `collect()` -> iterable of (label values, value)."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+        kind: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._collect():
+            if value is not None:
+                yield self.name, self._labels(labels), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                rendered = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{rendered}}} {_format_value(value)}" if rendered else f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+)
+http_latency = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+)
+http_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served"))
+upload_bytes = registry.register(Counter("upload_bytes_total", "Bytes received in file uploads", ("kind",)))
+upload_files = registry.register(Counter("upload_files_total", "Files received in uploads", ("kind",)))
+ocr_upstream_latency = registry.register(
+    Histogram(
+        "ocr_upstream_duration_seconds", "Latency of the OCR provider call", ("outcome",), buckets=UPSTREAM_BUCKETS
+    )
+)
+
+limiter_queue_wait = registry.register(
+    Histogram("limiter_queue_wait_seconds", "Time spent waiting for a concurrency slot", ("limiter",))
+)
+
+
+def _pool_samples(field: str):
+    def collect():
+        from .database import pool_stats
+
+        for stats in pool_stats():
+            yield (stats["engine"],), stats[field]
+
+    return collect
+
+
+def _pool_connections():
+    from .database import pool_stats
+
+    for stats in pool_stats():
+        yield (stats["engine"], "checked_out"), stats["checked_out"]
+        yield (stats["engine"], "checked_in"), stats["checked_in"]
+        yield (stats["engine"], "overflow"), stats["overflow"]
+
+
+registry.register(
+    CallbackMetric("db_pool_connections", "Pool connections by state", ("engine", "state"), _pool_connections)
+)
+registry.register(CallbackMetric("db_pool_size", "Configured pool size", ("engine",), _pool_samples("size")))
+registry.register(
+    CallbackMetric(
+        "db_pool_utilization", "Checked-out connections over pool capacity", ("engine",), _pool_samples("utilization")
+    )
+)
+registry.register(
+    CallbackMetric(
+        "db_pool_peak_checked_out", "Most connections checked out at once", ("engine",), _pool_samples("peak_checked_out")
+    )
+)
+registry.register(
+    CallbackMetric(
+        "db_pool_checkouts_total", "Connection checkouts", ("engine",), _pool_samples("checkouts"), kind="counter"
+    )
+)
+registry.register(
+    CallbackMetric(
+        "db_pool_pings_total", "Liveness pings on checkout", ("engine",), _pool_samples("pings"), kind="counter"
+    )
+)
+registry.register(
+    CallbackMetric(
+        "db_pool_stale_connections_total",
+        "Connections discarded after a failed ping",
+        ("engine",),
+        _pool_samples("stale_connections"),
+        kind="counter",
+    )
+)
+
+
+def _cache_counts() -> Dict[str, Dict[str, int]]:
+    from .cache import dashboard_cache, named_caches
+
+    counts = {
+        "dashboard": {
+            "hit": dashboard_cache.hits,
+            "stale": dashboard_cache.stale_hits,
+            "miss": dashboard_cache.misses,
+        }
+    }
+    for name, cache in named_caches.items():
+        counts[name] = {"hit": cache.hits, "miss": cache.misses}
+    return counts
+
+
+def _cache_requests():
+    for cache, counts in _cache_counts().items():
+        for result, value in counts.items():
+            yield (cache, result), value
+
+
+def _cache_hit_ratio():
+    for cache, counts in _cache_counts().items():
+        total = sum(counts.values())
+        # Stale entries are served without recomputing, so they count as hits
+        yield (cache,), (total - counts["miss"]) / total if total else None
+
+
+registry.register(
+    CallbackMetric("cache_requests_total", "Cache lookups by result", ("cache", "result"), _cache_requests, kind="counter")
+)
+registry.register(CallbackMetric("cache_hit_ratio", "Lookups served from cache", ("cache",), _cache_hit_ratio))
+
+
+def _limiter_state():
+    from .rate_limit import concurrency_limits
+
+    for name, limit in concurrency_limits.items():
+        yield (name, "in_flight"), limit.in_flight
+        yield (name, "queued"), limit.queue_depth
+
+
+def _limiter_rejections():
+    from .rate_limit import concurrency_limits, rate_limits
+
+    for name, limit in rate_limits.items():
+        yield (name, "rate"), limit.rejected
+    for name, limit in concurrency_limits.items():
+        yield (name, "queue_full"), limit.queue_full
+        yield (name, "queue_timeout"), limit.queue_timeouts
+
+
+def _rate_limit_allowed():
+    from .rate_limit import rate_limits
+
+    for name, limit in rate_limits.items():
+        yield (name,), limit.allowed
+
+
+registry.register(
+    CallbackMetric(
+        "limiter_requests", "Requests holding or waiting for a concurrency slot", ("limiter", "state"), _limiter_state
+    )
+)
+registry.register(
+    CallbackMetric(
+        "limiter_rejections_total",
+        "Requests shed with 429 (rate) or 503 (queue_full, queue_timeout)",
+        ("limiter", "reason"),
+        _limiter_rejections,
+        kind="counter",
+    )
+)
+registry.register(
+    CallbackMetric(
+        "rate_limit_allowed_total", "Requests that passed a rate limit", ("limiter",), _rate_limit_allowed, kind="counter"
+    )
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request until its last body chunk is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_latency.observe(elapsed, scope["method"], route)
+            http_requests.inc(scope["method"], route, status)
@@ -0,0 +1,176 @@
+"""Versioned schema migrations.
+
+Each migration runs once and is recorded in `schema_version`. On startup the
+runner reads the highest applied version (one primary-key lookup) and returns
+immediately when it matches the latest one, so restarts do not repeat
+`SHOW COLUMNS`/`ALTER`/backfill statements. New tables still come from
+`SQLModel.metadata.create_all`; migrations cover what it cannot do on existing
+tables (new columns, new indexes, type changes, data backfills).
+
+Migrations are written to be idempotent, because databases created before the
+runner existed already have some of them applied. To add one, append a
+function to `MIGRATIONS` with the next version number; never renumber.
+
+With several workers starting at once, MySQL/MariaDB serialize the runner
+through a named lock; the version is re-read after acquiring it.
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+
+MYSQL_DIALECTS = ("mysql", "mariadb")
+LOCK_NAME = "r21_schema_migrations"
+LOCK_TIMEOUT_SECONDS = 60
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+def is_mysql(engine: Engine) -> bool:
+    return engine.dialect.name in MYSQL_DIALECTS
+
+
+def _columns(conn: Connection, table: str) -> dict:
+    return {column["name"]: column for column in inspect(conn).get_columns(table)}
+
+
+def _attendance_event_id(conn: Connection) -> None:
+    if "event_id" not in _columns(conn, "attendance"):
+        conn.execute(text("ALTER TABLE attendance ADD COLUMN event_id INTEGER NULL"))
+
+
+def _attendance_indexes(conn: Connection) -> None:
+    # create_all skips indexes of tables that already exist
+    for index in models.Attendance.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _committee_legacy_columns(conn: Connection) -> None:
+    if not is_mysql(conn.engine):
+        return
+    columns = _columns(conn, "committee")
+    if "administrative_unit_id" not in columns:
+        conn.execute(text("ALTER TABLE committee ADD COLUMN administrative_unit_id INT NULL"))
+
+    owner = conn.execute(text("SHOW COLUMNS FROM committee LIKE 'owner_id'")).mappings().first()
+    if owner and not owner["Type"].lower().startswith("varchar"):
+        conn.execute(text("ALTER TABLE committee MODIFY COLUMN owner_id VARCHAR(255) NOT NULL"))
+
+    for column_name, column_type in [
+        ("presidente", "VARCHAR(255)"),
+        ("email", "VARCHAR(255)"),
+        ("clave_afiliacion", "VARCHAR(255)"),
+        ("telefono", "VARCHAR(64)"),
+    ]:
+        column_info = conn.execute(
+            text("SHOW COLUMNS FROM committee LIKE :column"), {"column": column_name}
+        ).mappings().first()
+        if column_info is None:
+            conn.execute(text(f"ALTER TABLE committee ADD COLUMN {column_name} {column_type} NOT NULL DEFAULT ''"))
+            continue
+        conn.execute(text(f"UPDATE committee SET {column_name} = '' WHERE {column_name} IS NULL"))
+        if column_info.get("Null", "YES") == "YES" or column_info.get("Default") not in ("", "''"):
+            conn.execute(text(f"ALTER TABLE committee MODIFY COLUMN {column_name} {column_type} NOT NULL DEFAULT ''"))
+
+
+def _seed_committee_types(conn: Connection) -> None:
+    if conn.execute(select(models.CommitteeType.id).limit(1)).first() is not None:
+        return
+    now = models.get_mexico_city_time()
+    conn.execute(
+        models.CommitteeType.__table__.insert(),
+        [
+            {"name": name, "is_active": True, "created_at": now}
+            for name in (
+                "Maestros",
+                "Transportistas",
+                "Seccionales",
+                "Municipales",
+                "Deportistas",
+                "Territoriales",
+                "Distritales",
+                "Especiales",
+                "Sectoriales",
+                "Otros",
+            )
+        ],
+    )
+
+
+def _drop_unsharded_dashboard_counters(conn: Connection) -> None:
+    # Replaced by dashboard_counter_slot; ensure_counters rebuilds the counters there on startup
+    conn.execute(text("DROP TABLE IF EXISTS dashboardcounter"))
+
+
+def _shard_activity_rollups(conn: Connection) -> None:
+    # The slot column joins the primary key. The buckets are derived data, so the
+    # table is recreated and ensure_rollups backfills it from history on startup
+    models.ActivityRollup.__table__.drop(conn, checkfirst=True)
+    models.ActivityRollup.__table__.create(conn)
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "attendance.event_id", _attendance_event_id),
+    (2, "attendance indexes", _attendance_indexes),
+    (3, "committee legacy columns", _committee_legacy_columns),
+    (4, "seed committee types", _seed_committee_types),
+    (5, "drop unsharded dashboard counters", _drop_unsharded_dashboard_counters),
+    (6, "shard activity rollups", _shard_activity_rollups),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(select(func.max(models.SchemaVersion.version))).scalar() or 0
+
+
+def pending(engine: Engine) -> List[Migration]:
+    with engine.connect() as conn:
+        version = current_version(conn)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def _lock(conn: Connection) -> bool:
+    """Named lock held by this connection (MySQL/MariaDB only); other dialects run a single writer."""
+    if not is_mysql(conn.engine):
+        return False
+    acquired = conn.execute(
+        text("SELECT GET_LOCK(:name, :timeout)"), {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_SECONDS}
+    ).scalar()
+    if acquired != 1:
+        raise RuntimeError("No se obtuvo el candado de migraciones; otro proceso las está aplicando")
+    return True
+
+
+def migrate(engine: Engine) -> List[str]:
+    """Apply pending migrations in order; returns the names applied (empty when up to date)."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+        conn.commit()
+        if version >= LATEST_VERSION:
+            return []
+        locked = _lock(conn)
+        try:
+            # Another worker may have finished while we waited for the lock
+            version = current_version(conn)
+            conn.commit()
+            applied = []
+            for number, name, apply in MIGRATIONS:
+                if number <= version:
+                    continue
+                logging.info("Applying schema migration %d: %s", number, name)
+                apply(conn)
+                conn.execute(
+                    models.SchemaVersion.__table__.insert(),
+                    {"version": number, "name": name, "applied_at": models.get_mexico_city_time()},
+                )
+                conn.commit()
+                applied.append(name)
+            return applied
+        finally:
+            if locked:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+                conn.commit()
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
 from decimal import Decimal
+from sqlalchemy import Column, Index, LargeBinary
 from sqlmodel import SQLModel, Field, Relationship
 
 # Zona horaria de Ciudad de México (UTC-6)
@@ -12,6 +13,15 @@ def get_mexico_city_time():
 
 
 # ...existing code...
+class SchemaVersion(SQLModel, table=True):
+    """Migraciones aplicadas por app/migrations.py"""
+    __tablename__ = "schema_version"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=lambda: get_mexico_city_time())
+
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(index=True, unique=True)
@@ -54,6 +64,18 @@ class AdministrativeUnit(SQLModel, table=True):
 
 
 # NUEVO
+class AdministrativeUnitClosure(SQLModel, table=True):
+    """
+    Tabla de cierre de la jerarquía: una fila por cada par (ancestro, descendiente),
+    incluida la propia unidad con depth=0. Se mantiene en app/unit_closure.py.
+    """
+    ancestor_id: int = Field(primary_key=True, foreign_key="administrativeunit.id")
+    descendant_id: int = Field(primary_key=True, foreign_key="administrativeunit.id", index=True)
+    depth: int = Field(default=0)
+
+    __table_args__ = (Index("ix_unitclosure_descendant_depth", "descendant_id", "depth"),)
+
+
 class UserAssignment(SQLModel, table=True):
     """
     Asigna un usuario a una unidad con un rol jerárquico.
@@ -144,6 +166,49 @@ class Attendance(SQLModel, table=True):
     accuracy: Optional[int] = Field(default=None)
     timezone: str = Field(max_length=64, default="")
     created_at: datetime = Field(default_factory=get_mexico_city_time, index=True)
+    # Sin FOREIGN KEY: MariaDB no admite llaves foráneas en tablas particionadas
+    # (ver scripts/partition_attendance.py)
+    event_id: Optional[int] = Field(default=None, index=True)
+
+    # Búsquedas de duplicados por cuenta/dispositivo dentro de una ventana de tiempo,
+    # y listados por evento acotados a su rango de fechas
+    __table_args__ = (
+        Index("ix_attendance_user_created", "provider_user_id", "created_at"),
+        Index("ix_attendance_device_created", "device_id", "created_at"),
+        Index("ix_attendance_event_created", "event_id", "created_at"),
+    )
+
+
+class Event(SQLModel, table=True):
+    """
+    Evento (reunión, asamblea) al que se ligan las asistencias.
+    Una asistencia sin event_id explícito se asigna al evento vigente en ese momento.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    location: str = Field(default="")
+    starts_at: datetime = Field(index=True)
+    ends_at: datetime = Field(index=True)
+    created_by: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=get_mexico_city_time)
+
+
+class AttendanceFlag(SQLModel, table=True):
+    """
+    Registro de asistencias sospechosas: cuenta repetida en la ventana ('duplicate')
+    o demasiadas cuentas en un mismo dispositivo ('shared_device').
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    attendance_id: Optional[int] = Field(default=None, index=True)
+    provider_user_id: str = Field(max_length=128)
+    device_id: str = Field(max_length=128)
+    reason: str = Field(max_length=32)
+    device_accounts: int = Field(default=1)
+    created_at: datetime = Field(default_factory=get_mexico_city_time)
+
+    __table_args__ = (
+        Index("ix_attendanceflag_created_device", "created_at", "device_id"),
+    )
 
 class Seccion(SQLModel, table=True):
     """
@@ -157,3 +222,67 @@ class Seccion(SQLModel, table=True):
     nombre_distrito: Optional[str] = Field(default=None, max_length=50)
     distrito_federal: Optional[int] = Field(default=None, index=True)
 
+
+
+class DashboardCounter(SQLModel, table=True):
+    """
+    Contadores agregados del dashboard (comités, promovidos, documentos, cobertura, asistencias).
+    Se actualizan en la misma transacción que cada alta/baja; ver app/dashboard_counters.py.
+    Cada contador se reparte en varias filas (`slot`) que se suman al leerlo, para que
+    las escrituras concurrentes no esperen todas el candado de una misma fila.
+    """
+    __tablename__ = "dashboard_counter_slot"
+    name: str = Field(primary_key=True, max_length=64)
+    slot: int = Field(default=0, primary_key=True)
+    value: int = Field(default=0)
+
+
+class CoverageCount(SQLModel, table=True):
+    """
+    Número de comités por sección ('section') o por municipio ('municipio').
+    Una fila con committees > 0 significa que la sección/municipio está cubierto.
+    """
+    kind: str = Field(primary_key=True, max_length=16)
+    code: str = Field(primary_key=True, max_length=64)
+    committees: int = Field(default=0)
+
+
+class CoverageTarget(SQLModel, table=True):
+    """
+    Meta de secciones cubiertas para una unidad (municipio o distrito).
+    Sin fila, la meta es el total de secciones del catálogo en la unidad.
+    """
+    unit_id: int = Field(primary_key=True, foreign_key="administrativeunit.id")
+    target_sections: int = Field(default=0)
+    updated_by: str = Field(default="", max_length=255)
+    updated_at: datetime = Field(default_factory=get_mexico_city_time)
+
+
+class ActivityRollup(SQLModel, table=True):
+    """
+    Altas por periodo (día u hora) por unidad administrativa y tipo de comité.
+    Se actualiza en cada alta/baja; ver app/rollups.py. unit_id=0 significa sin unidad.
+    Cada cubeta se reparte en varias filas (`slot`) que se suman al leer.
+    """
+    granularity: str = Field(primary_key=True, max_length=8)  # 'day' | 'hour'
+    metric: str = Field(primary_key=True, max_length=16)  # 'committees' | 'members' | 'attendance'
+    bucket: datetime = Field(primary_key=True)
+    unit_id: int = Field(default=0, primary_key=True)
+    committee_type: str = Field(default="", primary_key=True, max_length=64)
+    slot: int = Field(default=0, primary_key=True)
+    value: int = Field(default=0)
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """
+    Respuesta guardada de una escritura con encabezado Idempotency-Key; ver app/idempotency.py.
+    status_code NULL = petición en curso. expires_at en segundos epoch.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key_hash: str = Field(primary_key=True, max_length=64)
+    request_hash: Optional[str] = Field(default=None, max_length=64)
+    status_code: Optional[int] = None
+    content_type: Optional[str] = Field(default=None, max_length=100)
+    response_body: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary(length=2**24 - 1)))  # MEDIUMBLOB en MariaDB
+    expires_at: int = Field(index=True)
@@ -0,0 +1,255 @@
+"""Per-request SQL profiling and N+1 detection.
+
+`install(engine)` hooks `before_cursor_execute`/`after_cursor_execute` on an
+engine. Every statement is timed and attributed to the profile of the request
+that ran it (a context variable the middleware sets, which FastAPI carries into
+the threadpool running sync endpoints). Statements are grouped by shape: the
+SQL text with bound parameters, and `IN (?, ?, ...)` lists collapsed, so the
+same query issued once per row shows up as one shape with a high count.
+
+`QueryProfilerMiddleware` (enabled with QUERY_PROFILING=1) adds a
+`Server-Timing` header (`db;dur=...;desc="N queries"`), logs requests whose
+repeated shapes reach QUERY_PROFILING_REPEAT_THRESHOLD (likely N+1), and keeps
+the last requests for `GET /admin/debug/queries`.
+
+`query_budget` is the assertion helper for tests and scripts: it counts every
+statement run while it is active, in any thread, and raises AssertionError
+listing the repeated shapes when a route exceeds its budget::
+
+    with query_budget(5):
+        client.get("/committees", headers=headers)
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+MAX_SHAPE_LENGTH = 300
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _PLACEHOLDER_LIST.sub("(?...)", _WHITESPACE.sub(" ", statement).strip())
+    return shape if len(shape) <= MAX_SHAPE_LENGTH else shape[: MAX_SHAPE_LENGTH - 3] + "..."
+
+
+class QueryProfile:
+    """Statements of one request (or one `query_budget` block)."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.shapes: Counter = Counter()
+        self.shape_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            self.shapes[shape] += 1
+            self.shape_seconds[shape] = self.shape_seconds.get(shape, 0.0) + seconds
+
+    def repeated(self, threshold: int = 2) -> List[dict]:
+        """Shapes issued at least `threshold` times, most frequent first."""
+        return [
+            {"count": count, "db_ms": round(self.shape_seconds[shape] * 1000, 2), "statement": shape}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def summary(self, threshold: int) -> dict:
+        return {
+            "queries": self.queries,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "distinct_statements": len(self.shapes),
+            "repeated": self.repeated(threshold),
+        }
+
+
+_current: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+_budgets: Set[QueryProfile] = set()
+_budgets_lock = threading.Lock()
+_installed: Set[int] = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    if _budgets:
+        with _budgets_lock:
+            budgets = list(_budgets)
+        for budget in budgets:
+            budget.record(statement, elapsed)
+
+
+def install(engine: Engine) -> None:
+    """Attach the timing hooks to `engine` (idempotent)."""
+    if id(engine) in _installed:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _installed.add(id(engine))
+
+
+def install_all() -> None:
+    from .database import engine, replica_engine
+
+    install(engine)
+    if replica_engine is not None:
+        install(replica_engine)
+
+
+class RecentProfiles:
+    """Last profiled requests, for the debug endpoint."""
+
+    def __init__(self, maxlen: int = 200):
+        self._items: Deque[dict] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, item: dict) -> None:
+        with self._lock:
+            self._items.append(item)
+
+    def items(self) -> List[dict]:
+        with self._lock:
+            return list(reversed(self._items))
+
+    def by_route(self) -> List[dict]:
+        """Per route: requests seen, average and max queries and DB time, and N+1 flags."""
+        routes: Dict[str, dict] = {}
+        for item in self.items():
+            route = routes.setdefault(
+                item["route"],
+                {"route": item["route"], "requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0, "n_plus_one": 0},
+            )
+            route["requests"] += 1
+            route["queries"] += item["queries"]
+            route["max_queries"] = max(route["max_queries"], item["queries"])
+            route["db_ms"] += item["db_ms"]
+            route["n_plus_one"] += 1 if item["repeated"] else 0
+        return sorted(
+            (
+                {
+                    "route": route["route"],
+                    "requests": route["requests"],
+                    "avg_queries": round(route["queries"] / route["requests"], 1),
+                    "max_queries": route["max_queries"],
+                    "avg_db_ms": round(route["db_ms"] / route["requests"], 2),
+                    "n_plus_one_requests": route["n_plus_one"],
+                }
+                for route in routes.values()
+            ),
+            key=lambda route: route["avg_queries"],
+            reverse=True,
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+recent_profiles = RecentProfiles()
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware: one `QueryProfile` per HTTP request, reported in `Server-Timing`."""
+
+    def __init__(self, app, repeat_threshold: Optional[int] = None):
+        self.app = app
+        self.repeat_threshold = repeat_threshold or settings.query_profiling_repeat_threshold
+        install_all()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile(f"{scope['method']} {scope['path']}")
+        token = _current.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # Statements run after the headers (streaming bodies) are not included here
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.queries} queries", '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._report(scope, profile, (time.perf_counter() - started) * 1000)
+
+    def _report(self, scope, profile: QueryProfile, total_ms: float) -> None:
+        route = scope.get("route")
+        template = getattr(route, "path", scope["path"])
+        summary = profile.summary(self.repeat_threshold)
+        recent_profiles.add(
+            {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": f"{scope['method']} {template}",
+                "total_ms": round(total_ms, 2),
+                "at": time.time(),
+                **summary,
+            }
+        )
+        if summary["repeated"]:
+            worst = summary["repeated"][0]
+            logging.warning(
+                "Possible N+1 in %s %s: %d queries, %d× %s",
+                scope["method"], scope["path"], profile.queries, worst["count"], worst["statement"],
+            )
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None, label: str = "") -> Iterator[QueryProfile]:
+    """
+    Fail with AssertionError when more than `max_queries` statements (or any
+    shape more than `max_repeats` times) run inside the block.
+    """
+    install_all()
+    profile = QueryProfile(label)
+    with _budgets_lock:
+        _budgets.add(profile)
+    try:
+        yield profile
+    finally:
+        with _budgets_lock:
+            _budgets.discard(profile)
+    problems = []
+    if profile.queries > max_queries:
+        problems.append(f"{profile.queries} queries (budget {max_queries})")
+    if max_repeats is not None and profile.shapes and max(profile.shapes.values()) > max_repeats:
+        problems.append(f"a statement repeated {max(profile.shapes.values())} times (max {max_repeats})")
+    if problems:
+        repeated = "\n".join(f"  {row['count']}× {row['statement']}" for row in profile.repeated())
+        raise AssertionError(f"{label or 'Query budget'} exceeded: {'; '.join(problems)}\n{repeated}")
@@ -0,0 +1,329 @@
+"""Token-bucket rate limits and concurrency caps for the expensive endpoints.
+
+`RateLimit` keeps one token bucket per client key (IP, user or device): the
+bucket holds up to `burst` tokens and refills at `burst / period` tokens per
+second, so a spec like "10/60" allows a burst of 10 and then one request every
+6 s. Buckets live in a `MemoryBucketStore` (per process, LRU-bounded) or, with
+RATE_LIMIT_BACKEND=redis, in a `RedisBucketStore` shared by every worker (one
+atomic Lua script per check). Rejected requests get 429 with `Retry-After`.
+
+`ConcurrencyLimit` caps how many requests of an endpoint run at once. Up to
+`max_queue` more wait in FIFO order for at most `queue_timeout` seconds; the
+rest are shed immediately with 503, before they take a DB connection or a
+threadpool thread. Keeping the OCR and login caps well below the threadpool
+size (40 threads by default) leaves threads for the cheap endpoints when the
+expensive ones saturate. In-flight requests, queue depth and rejections are
+published on /metrics.
+
+Both are FastAPI dependencies and run on the event loop; a Redis round trip is
+moved to the threadpool (with a short socket timeout) so it never blocks it::
+
+    @router.post("/ine", dependencies=[Depends(ocr_rate_limit.by_user), Depends(ocr_concurrency)])
+"""
+import asyncio
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Deque, Dict, Optional, Tuple, Union
+
+from fastapi import Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics, models
+from .config import settings
+from .dependencies import get_current_user
+
+logger = logging.getLogger(__name__)
+
+rate_limits: Dict[str, "RateLimit"] = {}
+concurrency_limits: Dict[str, "ConcurrencyLimit"] = {}
+
+# A slow Redis fails open (see RateLimit.check) instead of holding the request
+REDIS_TIMEOUT_SECONDS = 0.25
+
+
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """"10/60" -> (burst 10, period 60 s); "" or "0" disables the limit (burst 0)."""
+    spec = spec.strip()
+    if not spec or spec == "0":
+        return 0.0, 1.0
+    count, _, period = spec.partition("/")
+    try:
+        burst, seconds = float(count), float(period or 1)
+    except ValueError:
+        raise ValueError(f"Límite de tasa inválido {spec!r}: usa <solicitudes>/<segundos>, p. ej. 10/60")
+    if burst < 0 or seconds <= 0:
+        raise ValueError(f"Límite de tasa inválido {spec!r}: usa <solicitudes>/<segundos>, p. ej. 10/60")
+    return burst, seconds
+
+
+class MemoryBucketStore:
+    """Per-process buckets. The least recently used keys are evicted first: they have refilled anyway."""
+
+    blocking = False
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Spend `cost` tokens; returns (allowed, seconds until enough tokens when rejected)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+# Refill and spend in one round trip; the server clock is used so workers never disagree on elapsed time
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Buckets shared by every worker. `client` is anything with the redis-py
+    `register_script` API; keys expire once a bucket would be full again.
+    """
+
+    blocking = True  # network round trip: called from the threadpool
+
+    def __init__(self, client, prefix: str = "r21:ratelimit:"):
+        self._prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, tokens = self._script(keys=[self._prefix + key], args=[rate, burst, cost])
+        tokens = float(tokens)
+        return bool(allowed), 0.0 if allowed else (cost - tokens) / rate
+
+
+def build_store(name: str, redis_url: str = ""):
+    if name == "redis" and redis_url:
+        try:
+            import redis  # optional dependency
+
+            return RedisBucketStore(
+                redis.Redis.from_url(
+                    redis_url,
+                    socket_timeout=REDIS_TIMEOUT_SECONDS,
+                    socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+                )
+            )
+        except ImportError:
+            logger.warning("RATE_LIMIT_BACKEND=redis pero el paquete redis no está instalado; usando memoria")
+    return MemoryBucketStore()
+
+
+bucket_store = build_store(settings.rate_limit_backend, settings.redis_url)
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@lru_cache(maxsize=8)
+def _trusted_networks(spec: str) -> Tuple[Network, ...]:
+    networks = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            raise ValueError(f"TRUSTED_PROXIES inválido {entry!r}: usa IPs o redes CIDR separadas por coma")
+    return tuple(networks)
+
+
+def _is_trusted(address: str, networks: Tuple[Network, ...]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    Address of the client, or None when the connection has none.
+
+    X-Forwarded-For is only read when the connection comes from one of
+    TRUSTED_PROXIES; it is then walked from the right, skipping our own proxies,
+    and the first other address is the client. Entries left of it were written
+    by the client and could be rotated to dodge the limits.
+    """
+    peer = request.client.host if request.client else None
+    networks = _trusted_networks(settings.trusted_proxies)
+    if peer is None or not networks or not _is_trusted(peer, networks):
+        return peer
+    forwarded = [entry.strip() for entry in request.headers.get("X-Forwarded-For", "").split(",") if entry.strip()]
+    for address in reversed(forwarded):
+        if not _is_trusted(address, networks):
+            return address
+    return forwarded[0] if forwarded else peer
+
+
+_trusted_networks(settings.trusted_proxies)  # a malformed TRUSTED_PROXIES fails at startup, not per request
+
+
+class RateLimit:
+    def __init__(self, name: str, spec: str, store=None):
+        self.name = name
+        self.burst, period = parse_rate(spec)
+        self.rate = self.burst / period
+        self.store = store or bucket_store
+        self.allowed = 0
+        self.rejected = 0
+        rate_limits[name] = self
+
+    def check(self, key: str) -> None:
+        """Spend one token from `key`'s bucket or raise 429."""
+        if not settings.rate_limit_enabled or self.burst <= 0:
+            return
+        try:
+            allowed, retry_after = self.store.take(f"{self.name}:{key}", self.rate, self.burst)
+        except Exception as error:
+            # A shared store outage must not take the endpoints down with it
+            logger.warning("Límite de tasa %s sin verificar: %s", self.name, error)
+            return
+        if allowed:
+            self.allowed += 1
+            return
+        self.rejected += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas solicitudes. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def check_async(self, key: str) -> None:
+        """`check` for async code: the in-memory store runs inline, a shared store off the event loop."""
+        if getattr(self.store, "blocking", False):
+            await run_in_threadpool(self.check, key)
+        else:
+            self.check(key)
+
+    async def by_client_ip(self, request: Request) -> None:
+        await self.check_async(client_ip(request) or "unknown")
+
+    async def by_user(self, user: models.User = Depends(get_current_user)) -> None:
+        await self.check_async(str(user.id))
+
+
+class ConcurrencyLimit:
+    """
+    Dependency that holds a slot for the rest of the request. Slots are handed
+    to waiters in arrival order; all state is touched only on the event loop.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = 0, queue_timeout: float = 5.0):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queue_full = 0
+        self.queue_timeouts = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        concurrency_limits[name] = self
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="Servicio saturado. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.queue_full += 1
+            raise self._overloaded()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            # release() passes its slot straight to the waiter; in_flight does not change
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            raise self._overloaded()
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # handed a slot just as the client went away
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            metrics.limiter_queue_wait.observe(time.perf_counter() - started, self.name)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def __call__(self):
+        if self.limit <= 0:
+            yield
+            return
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+login_rate_limit = RateLimit("login", settings.rate_limit_login)
+ocr_rate_limit = RateLimit("ocr", settings.rate_limit_ocr)
+attendance_ip_rate_limit = RateLimit("attendance_ip", settings.rate_limit_attendance_ip)
+attendance_device_rate_limit = RateLimit("attendance_device", settings.rate_limit_attendance_device)
+
+login_concurrency = ConcurrencyLimit(
+    "login", settings.login_max_concurrency, settings.login_max_queue, settings.concurrency_queue_timeout_seconds
+)
+ocr_concurrency = ConcurrencyLimit(
+    "ocr", settings.ocr_max_concurrency, settings.ocr_max_queue, settings.concurrency_queue_timeout_seconds
+)
+attendance_concurrency = ConcurrencyLimit(
+    "attendance",
+    settings.attendance_max_concurrency,
+    settings.attendance_max_queue,
+    settings.concurrency_queue_timeout_seconds,
+)
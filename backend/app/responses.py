@@ -0,0 +1,32 @@
+"""JSON responses that skip FastAPI's generic encoding path.
+
+The app's default response class is `ORJSONResponse`. For a handler that
+returns Pydantic models, FastAPI still dumps each model to a dict, validates it
+again against `response_model` and runs `jsonable_encoder` before encoding.
+
+Handlers that already build the exact `response_model` type can return
+`model_response(...)` instead: pydantic-core writes the models to JSON bytes
+in one pass, and FastAPI passes a `Response` through untouched (the declared
+`response_model` still documents the endpoint). `dump_json` gives the same bytes
+for caches, so hot payloads are stored serialized and served with
+`json_response` without touching a model at all.
+"""
+from typing import Any, Mapping, Optional
+
+from fastapi import Response
+from pydantic_core import to_json
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def dump_json(content: Any) -> bytes:
+    """Models, lists of models and plain JSON-compatible values to UTF-8 JSON."""
+    return to_json(content)
+
+
+def json_response(payload: bytes, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    return Response(content=payload, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def model_response(content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    return json_response(dump_json(content), status_code, headers)
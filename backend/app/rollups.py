@@ -0,0 +1,247 @@
+"""Daily and hourly rollups behind GET /dashboard/timeseries.
+
+Every committee, member and attendance write adds +1/-1 to the matching
+`ActivityRollup` bucket (per granularity, metric, unit and committee type) in
+the same transaction, so a range query reads only bucket rows instead of
+grouping the base tables by date. Deletions subtract from the bucket the row
+was created in, so the running sum always equals the current total.
+
+Each write is one upsert (app/upserts.py), so the first writes of a new hour
+never race to insert the same row. Every bucket is split across `ROLLUP_SLOTS`
+rows and each transaction adds to a random one, so check-ins in the same hour
+don't all queue on one row lock; `series` sums the slots.
+
+Committees are attributed to their administrative unit, or to the SECTION unit
+whose code matches their section number. `backfill` rebuilds everything from
+history.
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from . import models
+from .events import naive_local
+from .upserts import increment
+
+DAY = "day"
+HOUR = "hour"
+GRANULARITIES = (DAY, HOUR)
+
+COMMITTEES = "committees"
+MEMBERS = "members"
+ATTENDANCE = "attendance"
+METRICS = (COMMITTEES, MEMBERS, ATTENDANCE)
+
+NO_UNIT = 0
+BACKFILL_BATCH = 5000
+ROLLUP_SLOTS = 8
+
+Key = Tuple[datetime, int, str]  # (created_at, unit_id, committee_type)
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    value = naive_local(value)
+    if granularity == HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_step(granularity: str) -> timedelta:
+    return timedelta(hours=1) if granularity == HOUR else timedelta(days=1)
+
+
+def section_units(session: Session, section_numbers: Iterable[Optional[str]]) -> Dict[str, int]:
+    codes = {number for number in section_numbers if number}
+    if not codes:
+        return {}
+    rows = session.exec(
+        select(models.AdministrativeUnit.code, models.AdministrativeUnit.id).where(
+            models.AdministrativeUnit.unit_type == "SECTION",
+            models.AdministrativeUnit.code.in_(codes),
+        )
+    ).all()
+    return {row.code: row.id for row in rows}
+
+
+def committee_unit(committee: models.Committee, units_by_section: Dict[str, int]) -> int:
+    if committee.administrative_unit_id is not None:
+        return committee.administrative_unit_id
+    return units_by_section.get(committee.section_number or "", NO_UNIT)
+
+
+def _apply(session: Session, metric: str, deltas: Counter) -> None:
+    slot = random.randrange(ROLLUP_SLOTS)
+    increment(
+        session,
+        models.ActivityRollup,
+        [
+            {
+                "granularity": granularity,
+                "metric": metric,
+                "bucket": bucket,
+                "unit_id": unit_id,
+                "committee_type": committee_type,
+                "slot": slot,
+                "value": delta,
+            }
+            for (granularity, bucket, unit_id, committee_type), delta in deltas.items()
+            if delta
+        ],
+    )
+
+
+def record(session: Session, metric: str, items: Iterable[Key], sign: int = 1) -> None:
+    """Add `sign` to the day and hour bucket of every (created_at, unit_id, type)."""
+    deltas: Counter = Counter()
+    for created_at, unit_id, committee_type in items:
+        for granularity in GRANULARITIES:
+            deltas[(granularity, bucket_start(created_at, granularity), unit_id or NO_UNIT, committee_type or "")] += sign
+    _apply(session, metric, deltas)
+
+
+def record_committees(
+    session: Session, committees: Iterable[models.Committee], members: Iterable[Tuple[models.Committee, datetime]] = (), sign: int = 1
+) -> None:
+    committees = list(committees)
+    members = list(members)
+    units = section_units(session, [c.section_number for c in committees] + [c.section_number for c, _ in members])
+    now = models.get_mexico_city_time()
+    record(
+        session,
+        COMMITTEES,
+        [(c.created_at or now, committee_unit(c, units), c.type) for c in committees],
+        sign,
+    )
+    if members:
+        record(
+            session,
+            MEMBERS,
+            [(created_at or now, committee_unit(c, units), c.type) for c, created_at in members],
+            sign,
+        )
+
+
+def record_attendance(session: Session, created_at: Optional[datetime], sign: int = 1) -> None:
+    record(session, ATTENDANCE, [(created_at or models.get_mexico_city_time(), NO_UNIT, "")], sign)
+
+
+def backfill(session: Session) -> Dict[str, int]:
+    """Recompute every bucket from the base tables; returns rows read per metric."""
+    session.execute(delete(models.ActivityRollup))
+    units = section_units(session, session.exec(select(models.Committee.section_number).distinct()).all())
+
+    committee_dims: Dict[int, Tuple[int, str]] = {}
+    per_metric: Dict[str, Counter] = {metric: Counter() for metric in METRICS}
+    read = {metric: 0 for metric in METRICS}
+
+    def add(metric: str, created_at: datetime, unit_id: int, committee_type: str) -> None:
+        read[metric] += 1
+        for granularity in GRANULARITIES:
+            per_metric[metric][(granularity, bucket_start(created_at, granularity), unit_id, committee_type)] += 1
+
+    for row in session.exec(
+        select(
+            models.Committee.id,
+            models.Committee.created_at,
+            models.Committee.administrative_unit_id,
+            models.Committee.section_number,
+            models.Committee.type,
+        ).execution_options(yield_per=BACKFILL_BATCH)
+    ):
+        unit_id = row.administrative_unit_id if row.administrative_unit_id is not None else units.get(row.section_number or "", NO_UNIT)
+        committee_dims[row.id] = (unit_id, row.type or "")
+        add(COMMITTEES, row.created_at, *committee_dims[row.id])
+
+    for row in session.exec(
+        select(models.CommitteeMember.committee_id, models.CommitteeMember.created_at).execution_options(
+            yield_per=BACKFILL_BATCH
+        )
+    ):
+        add(MEMBERS, row.created_at, *committee_dims.get(row.committee_id, (NO_UNIT, "")))
+
+    for created_at in session.exec(
+        select(models.Attendance.created_at).execution_options(yield_per=BACKFILL_BATCH)
+    ):
+        add(ATTENDANCE, created_at, NO_UNIT, "")
+
+    for metric, deltas in per_metric.items():
+        session.add_all(
+            models.ActivityRollup(
+                granularity=granularity,
+                metric=metric,
+                bucket=bucket,
+                unit_id=unit_id,
+                committee_type=committee_type,
+                value=value,
+            )
+            for (granularity, bucket, unit_id, committee_type), value in deltas.items()
+        )
+    session.commit()
+    return read
+
+
+def ensure_rollups(session: Session) -> None:
+    """Backfill on first start, when there is history but no buckets yet."""
+    if session.exec(select(models.ActivityRollup).limit(1)).first() is not None:
+        return
+    has_history = session.exec(select(models.Committee.id).limit(1)).first() is not None or (
+        session.exec(select(models.Attendance.id).limit(1)).first() is not None
+    )
+    if has_history:
+        backfill(session)
+
+
+def series(
+    session: Session,
+    metric: str,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    unit_ids: Optional[Set[int]] = None,
+    committee_type: Optional[str] = None,
+    group_by: Optional[str] = None,
+) -> Dict[object, List[Tuple[datetime, int]]]:
+    """
+    Zero-filled buckets in [start, end) read from the rollup table only.
+    Returns {group key: [(bucket, value), ...]}; the key is None without `group_by`.
+    """
+    start = bucket_start(start, granularity)
+    end = naive_local(end)
+    group_column = {
+        "type": models.ActivityRollup.committee_type,
+        "unit": models.ActivityRollup.unit_id,
+    }.get(group_by)
+    columns = [models.ActivityRollup.bucket, func.sum(models.ActivityRollup.value).label("value")]
+    if group_column is not None:
+        columns.insert(0, group_column.label("group_key"))
+    statement = select(*columns).where(
+        models.ActivityRollup.granularity == granularity,
+        models.ActivityRollup.metric == metric,
+        models.ActivityRollup.bucket >= start,
+        models.ActivityRollup.bucket < end,
+    )
+    if unit_ids is not None:
+        statement = statement.where(models.ActivityRollup.unit_id.in_(unit_ids))
+    if committee_type is not None:
+        statement = statement.where(models.ActivityRollup.committee_type == committee_type)
+    group = [models.ActivityRollup.bucket] if group_column is None else [group_column, models.ActivityRollup.bucket]
+    rows = session.exec(statement.group_by(*group)).all()
+
+    values: Dict[object, Dict[datetime, int]] = {}
+    for row in rows:
+        key = row.group_key if group_column is not None else None
+        values.setdefault(key, {})[row.bucket] = int(row.value or 0)
+    if not values and group_column is None:
+        values[None] = {}
+
+    step = bucket_step(granularity)
+    buckets = []
+    current = start
+    while current < end:
+        buckets.append(current)
+        current += step
+    return {key: [(bucket, per_bucket.get(bucket, 0)) for bucket in buckets] for key, per_bucket in values.items()}
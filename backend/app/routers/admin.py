@@ -5,9 +5,13 @@ Solo accesible para el usuario administrador (jodomaq@gmail.com)
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select, func, or_
-from app.database import get_session
+from app.cache import data_versions
+from app.database import get_session, pool_stats
 from app.dependencies import get_current_user
-from app.models import User, AdministrativeUnit, UserAssignment, Seccion
+from app import unit_closure
+from app.config import settings
+from app.query_profiler import recent_profiles
+from app.models import User, AdministrativeUnit, AdministrativeUnitClosure, UserAssignment, Seccion, Committee
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -73,6 +77,10 @@ class AdministrativeUnitResponse(BaseModel):
     assignments_count: int = 0
 
 
+class AdministrativeUnitMove(BaseModel):
+    parent_id: Optional[int] = None  # None = mover a la raíz
+
+
 class UserAssignmentCreate(BaseModel):
     user_id: int
     administrative_unit_id: int
@@ -148,6 +156,7 @@ def create_user(
     )
     session.add(user)
     session.commit()
+    data_versions.bump("users")
     session.refresh(user)
     return user
 
@@ -188,6 +197,7 @@ def delete_user(
     
     session.delete(user)
     session.commit()
+    data_versions.bump("users", "assignments")
     return {"success": True, "message": "Usuario eliminado"}
 
 
@@ -219,41 +229,48 @@ def get_administrative_units(
     
     query = query.order_by(AdministrativeUnit.name)
     units = session.exec(query).all()
-    
-    # Enriquecer con información adicional
-    result = []
-    for unit in units:
-        children_count = session.exec(
-            select(func.count(AdministrativeUnit.id)).where(
-                AdministrativeUnit.parent_id == unit.id
-            )
-        ).one()
-        
-        assignments_count = session.exec(
-            select(func.count(UserAssignment.id)).where(
-                UserAssignment.administrative_unit_id == unit.id
-            )
-        ).one()
-        
-        parent_name = None
-        if unit.parent_id:
-            parent = session.get(AdministrativeUnit, unit.parent_id)
-            parent_name = parent.name if parent else None
-        
-        result.append(AdministrativeUnitResponse(
+    return _unit_responses(session, units)
+
+
+def _unit_responses(session: Session, units: List[AdministrativeUnit]) -> List[AdministrativeUnitResponse]:
+    """Enriquece las unidades con nombre del padre y conteos en tres consultas agrupadas"""
+    if not units:
+        return []
+    unit_ids = [unit.id for unit in units]
+    parent_ids = {unit.parent_id for unit in units if unit.parent_id}
+
+    children_counts = dict(session.exec(
+        select(AdministrativeUnitClosure.ancestor_id, func.count())
+        .where(
+            AdministrativeUnitClosure.ancestor_id.in_(unit_ids),
+            AdministrativeUnitClosure.depth == 1
+        )
+        .group_by(AdministrativeUnitClosure.ancestor_id)
+    ).all())
+    assignments_counts = dict(session.exec(
+        select(UserAssignment.administrative_unit_id, func.count(UserAssignment.id))
+        .where(UserAssignment.administrative_unit_id.in_(unit_ids))
+        .group_by(UserAssignment.administrative_unit_id)
+    ).all())
+    parent_names = dict(session.exec(
+        select(AdministrativeUnit.id, AdministrativeUnit.name).where(AdministrativeUnit.id.in_(parent_ids))
+    ).all()) if parent_ids else {}
+
+    return [
+        AdministrativeUnitResponse(
             id=unit.id,
             name=unit.name,
             code=unit.code,
             unit_type=unit.unit_type,
             parent_id=unit.parent_id,
-            parent_name=parent_name,
+            parent_name=parent_names.get(unit.parent_id),
             seccion_municipio_id=unit.seccion_municipio_id,
             seccion_distrito_id=unit.seccion_distrito_id,
-            children_count=children_count,
-            assignments_count=assignments_count
-        ))
-    
-    return result
+            children_count=children_counts.get(unit.id, 0),
+            assignments_count=assignments_counts.get(unit.id, 0)
+        )
+        for unit in units
+    ]
 
 
 @router.get("/administrative-units/{unit_id}", response_model=AdministrativeUnitResponse)
@@ -270,35 +287,103 @@ def get_administrative_unit(
             detail="Unidad administrativa no encontrada"
         )
     
-    children_count = session.exec(
-        select(func.count(AdministrativeUnit.id)).where(
-            AdministrativeUnit.parent_id == unit.id
+    return _unit_responses(session, [unit])[0]
+
+
+@router.get("/administrative-units/{unit_id}/path", response_model=List[AdministrativeUnitResponse])
+def get_administrative_unit_path(
+    unit_id: int,
+    session: Session = Depends(get_session),
+    _admin: User = Depends(verify_admin)
+):
+    """Ruta desde la raíz (estado) hasta la unidad, en una sola consulta"""
+    path = unit_closure.path_to_root(session, unit_id)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unidad administrativa no encontrada"
         )
-    ).one()
-    
-    assignments_count = session.exec(
-        select(func.count(UserAssignment.id)).where(
-            UserAssignment.administrative_unit_id == unit.id
+    return _unit_responses(session, list(path))
+
+
+@router.get("/administrative-units/{unit_id}/descendants", response_model=List[AdministrativeUnitResponse])
+def get_administrative_unit_descendants(
+    unit_id: int,
+    unit_type: Optional[str] = None,
+    session: Session = Depends(get_session),
+    _admin: User = Depends(verify_admin)
+):
+    """Todas las unidades debajo de la unidad (opcionalmente de un tipo), en una sola consulta"""
+    if not session.get(AdministrativeUnit, unit_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unidad administrativa no encontrada"
+        )
+    return _unit_responses(session, list(unit_closure.descendants(session, unit_id, unit_type)))
+
+
+@router.patch("/administrative-units/{unit_id}/parent", response_model=AdministrativeUnitResponse)
+def move_administrative_unit(
+    unit_id: int,
+    move: AdministrativeUnitMove,
+    session: Session = Depends(get_session),
+    _admin: User = Depends(verify_admin)
+):
+    """Cambia el padre de una unidad; todo su subárbol se mueve con ella"""
+    unit = session.get(AdministrativeUnit, unit_id)
+    if not unit:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unidad administrativa no encontrada"
+        )
+    if move.parent_id is not None and not session.get(AdministrativeUnit, move.parent_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unidad padre no encontrada"
+        )
+
+    try:
+        unit_closure.move_unit(session, unit, move.parent_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    session.commit()
+    session.refresh(unit)
+    data_versions.bump("units")
+    return _unit_responses(session, [unit])[0]
+
+
+@router.delete("/administrative-units/{unit_id}")
+def delete_administrative_unit(
+    unit_id: int,
+    session: Session = Depends(get_session),
+    _admin: User = Depends(verify_admin)
+):
+    """Elimina una unidad sin hijas, asignaciones ni comités"""
+    unit = session.get(AdministrativeUnit, unit_id)
+    if not unit:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unidad administrativa no encontrada"
+        )
+    in_use = session.exec(
+        select(
+            select(func.count(UserAssignment.id)).where(UserAssignment.administrative_unit_id == unit_id).scalar_subquery(),
+            select(func.count(Committee.id)).where(Committee.administrative_unit_id == unit_id).scalar_subquery(),
         )
     ).one()
-    
-    parent_name = None
-    if unit.parent_id:
-        parent = session.get(AdministrativeUnit, unit.parent_id)
-        parent_name = parent.name if parent else None
-    
-    return AdministrativeUnitResponse(
-        id=unit.id,
-        name=unit.name,
-        code=unit.code,
-        unit_type=unit.unit_type,
-        parent_id=unit.parent_id,
-        parent_name=parent_name,
-        seccion_municipio_id=unit.seccion_municipio_id,
-        seccion_distrito_id=unit.seccion_distrito_id,
-        children_count=children_count,
-        assignments_count=assignments_count
-    )
+    if any(in_use):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La unidad tiene asignaciones o comités; reasígnelos primero"
+        )
+
+    try:
+        unit_closure.delete_unit(session, unit)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    session.commit()
+    data_versions.bump("units")
+    return {"success": True, "message": "Unidad administrativa eliminada"}
 
 
 # ========== USER ASSIGNMENTS ENDPOINTS ==========
@@ -391,6 +476,7 @@ def create_assignment(
     )
     session.add(assignment)
     session.commit()
+    data_versions.bump("assignments")
     session.refresh(assignment)
     
     return UserAssignmentResponse(
@@ -423,6 +509,7 @@ def delete_assignment(
     
     session.delete(assignment)
     session.commit()
+    data_versions.bump("assignments")
     return {"success": True, "message": "Asignación eliminada"}
 
 
@@ -529,3 +616,27 @@ def get_admin_stats(
         "total_secciones": total_secciones,
         "units_by_type": units_by_type
     }
+
+
+@router.get("/database/pools")
+def get_database_pools(_admin: User = Depends(verify_admin)):
+    """Ocupación de los pools de conexiones (primaria y réplica, si existe)"""
+    return pool_stats()
+
+
+@router.get("/debug/queries")
+def get_query_profiles(
+    limit: int = 50,
+    clear: bool = False,
+    _admin: User = Depends(verify_admin),
+):
+    """Consultas SQL por petición y por ruta (requiere QUERY_PROFILING=1)"""
+    result = {
+        "enabled": settings.query_profiling,
+        "repeat_threshold": settings.query_profiling_repeat_threshold,
+        "routes": recent_profiles.by_route(),
+        "requests": recent_profiles.items()[:limit],
+    }
+    if clear:
+        recent_profiles.clear()
+    return result
@@ -1,27 +1,27 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token as google_id_token
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
+from .. import dashboard_counters, rollups
 from ..database import get_session
-from ..models import Attendance
+from ..attendance_guard import REASON_DUPLICATE, REASON_SHARED_DEVICE, Verdict, attendance_guard
+from ..models import Attendance, AttendanceFlag
 from ..schemas import AttendanceCreate, AttendanceResponse
 from ..config import settings
+from ..events import event_registry
+from ..live_feed import attendance_broker, check_in_message
+from ..rate_limit import attendance_concurrency, attendance_device_rate_limit, attendance_ip_rate_limit, client_ip
 
 router = APIRouter(prefix="/oauth", tags=["attendance"])
 
 
-def get_client_ip(request: Request) -> Optional[str]:
-    """Extract client IP from request headers"""
-    forwarded = request.headers.get("X-Forwarded-For")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.client.host if request.client else None
-
-
-@router.post("/attendance/", response_model=AttendanceResponse)
+@router.post(
+    "/attendance/",
+    response_model=AttendanceResponse,
+    dependencies=[Depends(attendance_ip_rate_limit.by_client_ip), Depends(attendance_concurrency)],
+)
 async def oauth_attendance(
     attendance_data: AttendanceCreate,
     request: Request,
@@ -49,14 +49,21 @@ async def oauth_attendance(
     
     if not attendance_data.device_id:
         raise HTTPException(status_code=400, detail="device_id is required")
+
+    # The device id is in the body, so this bucket is checked here rather than as a dependency
+    await attendance_device_rate_limit.check_async(attendance_data.device_id)
     
     # Verify Google OAuth token
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token as google_id_token
+
     try:
         if not settings.google_client_id:
             raise HTTPException(status_code=500, detail="GOOGLE_CLIENT_ID not configured")
         
-        # Verify the Google ID token
-        idinfo = google_id_token.verify_oauth2_token(
+        # Verify the Google ID token (fetches Google's certificates, so off the event loop)
+        idinfo = await run_in_threadpool(
+            google_id_token.verify_oauth2_token,
             attendance_data.credential, 
             google_requests.Request(), 
             settings.google_client_id
@@ -77,8 +84,61 @@ async def oauth_attendance(
     
     # Get request metadata
     user_agent = request.headers.get('User-Agent', '')
-    ip = get_client_ip(request)
-    
+    # Same rule as the rate limits: X-Forwarded-For only counts when it comes from TRUSTED_PROXIES
+    ip = client_ip(request)
+
+    # The database work below is synchronous, so it runs in the threadpool, not on the event loop
+    return await run_in_threadpool(
+        _register_attendance, session, attendance_data, provider_user_id, email, name, user_agent, ip
+    )
+
+
+def _flags(
+    verdict: Verdict, attendance_id: Optional[int], provider_user_id: str, device_id: str
+) -> List[AttendanceFlag]:
+    reasons = []
+    if verdict.duplicate_of is not None:
+        reasons.append(REASON_DUPLICATE)
+    if verdict.shared_device:
+        reasons.append(REASON_SHARED_DEVICE)
+    return [
+        AttendanceFlag(
+            attendance_id=attendance_id,
+            provider_user_id=provider_user_id,
+            device_id=device_id,
+            reason=reason,
+            device_accounts=verdict.device_accounts,
+        )
+        for reason in reasons
+    ]
+
+
+def _register_attendance(
+    session: Session,
+    attendance_data: AttendanceCreate,
+    provider_user_id: str,
+    email: str,
+    name: str,
+    user_agent: str,
+    ip: Optional[str],
+) -> AttendanceResponse:
+    # Explicit event must be open now; otherwise the check-in goes to the current event, if any
+    if attendance_data.event_id is not None:
+        if not event_registry.is_open(session, attendance_data.event_id):
+            return AttendanceResponse(ok=False, error="El evento no existe o no está en curso")
+        event_id = attendance_data.event_id
+    else:
+        event_id = event_registry.current_event_id(session)
+
+    # Repeat check-ins and shared devices are resolved in memory, with an index seek on a miss (see attendance_guard)
+    verdict = attendance_guard.check(session, provider_user_id, attendance_data.device_id)
+    if verdict.duplicate_of is not None and settings.attendance_duplicate_policy == "reject":
+        # The rejected attempt has no attendance row, but it still shows up in the suspicious devices report
+        for flag in _flags(verdict, None, provider_user_id, attendance_data.device_id):
+            session.add(flag)
+        session.commit()
+        return AttendanceResponse(ok=False, id=verdict.duplicate_of, error="Ya registraste tu asistencia")
+
     # Process location data
     latitude = None
     longitude = None
@@ -105,13 +165,26 @@ async def oauth_attendance(
             longitude=longitude,
             accuracy=accuracy,
             timezone=attendance_data.timezone,
+            event_id=event_id,
         )
         
         session.add(attendance)
+        session.flush()
+        attendance_id = attendance.id
+
+        for flag in _flags(verdict, attendance_id, provider_user_id, attendance_data.device_id):
+            session.add(flag)
+        rollups.record_attendance(session, attendance.created_at)
+        dashboard_counters.record_attendance(session, event_id)
+        message = check_in_message(attendance)
         session.commit()
-        session.refresh(attendance)
+        attendance_guard.record(provider_user_id, attendance_data.device_id, attendance_id)
+
+        message["total"] = event_registry.total(session)
+        message["event_total"] = event_registry.count(session, event_id) if event_id is not None else None
+        attendance_broker.publish(message)
         
-        return AttendanceResponse(ok=True, id=attendance.id)
+        return AttendanceResponse(ok=True, id=attendance_id)
         
     except Exception as e:
         session.rollback()
@@ -119,7 +192,7 @@ async def oauth_attendance(
 
 
 @router.get("/attendance/", response_model=list[AttendanceResponse])
-async def get_attendance_records(
+def get_attendance_records(
     skip: int = 0,
     limit: int = 100,
     session: Session = Depends(get_session)
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session, select
 from typing import List
 
 from ..database import get_session
 from .. import models, schemas
 from ..dependencies import get_current_user
+from ..committee_type_registry import committee_type_registry
 
 
 router = APIRouter(prefix="/committee-types", tags=["committee-types"])
@@ -12,12 +13,18 @@ router = APIRouter(prefix="/committee-types", tags=["committee-types"])
 
 @router.get("", response_model=List[schemas.CommitteeTypeOut])
 def list_committee_types(
+    request: Request,
+    response: Response,
     session: Session = Depends(get_session),
     user: models.User = Depends(get_current_user),
 ):
     # Optionally, restrict by owner in the future; for now return all active
-    types = session.exec(select(models.CommitteeType).where(models.CommitteeType.is_active == True).order_by(models.CommitteeType.name)).all()  # noqa: E712
-    return types
+    etag = committee_type_registry.etag(session)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return committee_type_registry.active_types(session)
 
 
 @router.post("", response_model=schemas.CommitteeTypeOut)
@@ -33,4 +40,5 @@ def create_committee_type(
     session.add(ct)
     session.commit()
     session.refresh(ct)
+    committee_type_registry.invalidate()
     return ct
@@ -1,17 +1,26 @@
+import logging
 import os
 import shutil
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, or_, select
+from sqlalchemy import exists
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, insert, or_, select
 from typing import List
-from .. import models, schemas
+from .. import dashboard_counters, models, rollups, schemas
 from ..database import get_session
 from ..dependencies import get_current_user
 from ..config import settings
+from ..committee_type_registry import committee_type_registry
+from ..cache import TTLCache, dashboard_cache, data_versions
+from ..idempotency import idempotent
+from ..responses import dump_json, json_response, model_response
 
 router = APIRouter(prefix="/committees", tags=["committees"])
+logger = logging.getLogger(__name__)
 
 
 @router.post("", response_model=schemas.CommitteeOut)
+@idempotent
 def create_committee(
     data: schemas.CommitteeCreate,
     session: Session = Depends(get_session),
@@ -31,14 +40,8 @@ def create_committee(
     if len(data.members) > settings.max_members_per_committee:
         raise HTTPException(status_code=400, detail=f"Máximo {settings.max_members_per_committee} integrantes")
 
-    # Validate committee type against DB
-    ctype = session.exec(
-        select(models.CommitteeType).where(
-            models.CommitteeType.name == data.type,
-            models.CommitteeType.is_active == True,  # noqa: E712
-        )
-    ).first()
-    if not ctype:
+    # Validate committee type against the in-process registry
+    if not committee_type_registry.is_active(session, data.type):
         raise HTTPException(status_code=400, detail="Tipo de comité inválido o inactivo")
 
     committee = models.Committee(
@@ -68,44 +71,167 @@ def create_committee(
     ]
     for m in members:
         session.add(m)
+    dashboard_counters.record_committees_created(session, [committee.section_number], members=len(members))
+    rollups.record_committees(session, [committee], [(committee, m.created_at) for m in members])
     session.commit()
+    data_versions.bump("committees")
     session.refresh(committee)
     return committee
 
 
-@router.get("", response_model=List[schemas.CommitteeOut])
-def list_committees(
-    session: Session = Depends(get_session), user: models.User = Depends(get_current_user)
+@router.post("/bulk", response_model=schemas.CommitteeBulkResponse)
+@idempotent
+def bulk_create_committees(
+    data: schemas.CommitteeBulkCreate,
+    session: Session = Depends(get_session),
+    user: models.User = Depends(get_current_user),
 ):
-    committees_db = session.exec(
-        select(models.Committee)
-        .where(
-            or_(
-                models.Committee.owner_id == user.email,
-                models.Committee.email == user.email
+    if len(data.committees) > settings.max_bulk_committees:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.max_bulk_committees} comités por carga")
+
+    # Role and committee types are resolved once for the whole batch
+    ua = session.exec(
+        select(models.UserAssignment)
+        .where(models.UserAssignment.user_id == user.id)
+        .order_by(models.UserAssignment.created_at.desc())
+    ).first()
+    if not (ua):
+        raise HTTPException(status_code=403, detail="Tu rol no permite crear comités")
+    active_types = committee_type_registry.active_names(session)
+
+    results: List[schemas.CommitteeBulkItemResult] = []
+    accepted: List[tuple[int, schemas.CommitteeCreate]] = []
+    for index, item in enumerate(data.committees):
+        error = None
+        if ua.role != 6 and len(item.members or []) > 0:
+            error = "Tu rol no permite agregar integrantes al crear comité"
+        elif len(item.members) > settings.max_members_per_committee:
+            error = f"Máximo {settings.max_members_per_committee} integrantes"
+        elif item.type not in active_types:
+            error = "Tipo de comité inválido o inactivo"
+        if error:
+            results.append(schemas.CommitteeBulkItemResult(index=index, ok=False, error=error))
+        else:
+            accepted.append((index, item))
+
+    if accepted:
+        committees = [
+            models.Committee(
+                name=item.name,
+                section_number=item.section_number,
+                type=item.type,
+                owner_id=user.email,
+                presidente=item.presidente,
+                email=item.email,
+                clave_afiliacion=item.clave_afiliacion,
+                telefono=item.telefono,
             )
-        )
+            for _, item in accepted
+        ]
+        try:
+            session.add_all(committees)
+            session.flush()  # get committee ids
+            created_ids = [committee.id for committee in committees]
+            created_at = models.get_mexico_city_time()
+            member_rows = [
+                {
+                    "full_name": m.full_name,
+                    "ine_key": m.ine_key,
+                    "phone": m.phone,
+                    "email": m.email,
+                    "section_number": m.section_number,
+                    "invited_by": m.invited_by,
+                    "committee_id": committee_id,
+                    "created_at": created_at,
+                }
+                for committee_id, (_, item) in zip(created_ids, accepted)
+                for m in item.members
+            ]
+            if member_rows:
+                # Single executemany for every member in the batch
+                session.execute(insert(models.CommitteeMember), member_rows)
+            dashboard_counters.record_committees_created(
+                session, [item.section_number for _, item in accepted], members=len(member_rows)
+            )
+            rollups.record_committees(
+                session,
+                committees,
+                [(committee, created_at) for committee, (_, item) in zip(committees, accepted) for _ in item.members],
+            )
+            session.commit()
+            data_versions.bump("committees")
+        except Exception as e:
+            session.rollback()
+            raise HTTPException(status_code=400, detail=f"Error al crear comités: {str(e)}")
+        for committee_id, (index, _) in zip(created_ids, accepted):
+            results.append(schemas.CommitteeBulkItemResult(index=index, ok=True, id=committee_id))
+
+    results.sort(key=lambda r: r.index)
+    return schemas.CommitteeBulkResponse(
+        created=len(accepted),
+        failed=len(results) - len(accepted),
+        results=results,
+    )
+
+
+# Per-user listing cache of serialized JSON. Keys embed the "committees" version of the dashboard cache
+# backend, which is shared by every worker with DASHBOARD_CACHE_BACKEND=redis, so any write invalidates them
+_list_cache = TTLCache(maxsize=2048, ttl_seconds=settings.committee_list_cache_ttl_seconds, name="committee_list")
+
+
+def _committees_with_document_flag(session: Session, *criteria) -> List[schemas.CommitteeOut]:
+    # Members come from one selectin query and document existence from a correlated EXISTS,
+    # so the number of statements doesn't grow with the number of committees.
+    has_document = (
+        exists()
+        .where(models.CommitteeDocument.committee_id == models.Committee.id)
+        .correlate(models.Committee)
+        .label("has_document")
+    )
+    rows = session.exec(
+        select(models.Committee, has_document)
+        .options(selectinload(models.Committee.members))
+        .where(*criteria)
         .order_by(models.Committee.created_at.desc())
     ).all()
     committees_out = []
-    for committee in committees_db:
+    for committee, committee_has_document in rows:
         committee_out = schemas.CommitteeOut.model_validate(committee)
-        committee_out.has_document = len(committee.documents) > 0
+        committee_out.has_document = bool(committee_has_document)
         committees_out.append(committee_out)
     return committees_out
 
 
+@router.get("", response_model=List[schemas.CommitteeOut])
+def list_committees(
+    session: Session = Depends(get_session), user: models.User = Depends(get_current_user)
+):
+    cache_key = (user.email, dashboard_cache.backend.get_version("committees"))
+    payload = _list_cache.get(cache_key)
+    if payload is None:
+        committees_out = _committees_with_document_flag(
+            session,
+            or_(
+                models.Committee.owner_id == user.email,
+                models.Committee.email == user.email
+            ),
+        )
+        # Cached serialized: a hit is a dictionary lookup plus the bytes
+        payload = dump_json(committees_out)
+        _list_cache.set(cache_key, payload)
+    return json_response(payload)
+
+
 @router.get("/{committee_id}", response_model=schemas.CommitteeOut)
 def get_committee(committee_id: int, session: Session = Depends(get_session), user: models.User = Depends(get_current_user)):
-    committee = session.get(models.Committee, committee_id)
-    if not committee:
+    committee_out = next(iter(_committees_with_document_flag(session, models.Committee.id == committee_id)), None)
+    if not committee_out:
         raise HTTPException(status_code=404, detail="Comité no encontrado")
-    committee_out = schemas.CommitteeOut.model_validate(committee)
-    committee_out.has_document = len(committee.documents) > 0
-    return committee_out
+    return model_response(committee_out)
 
 
 @router.post("/{committee_id}/members", response_model=schemas.CommitteeOut)
+@idempotent
 def add_member(
     committee_id: int,
     member: schemas.CommitteeMemberCreate,
@@ -138,17 +264,17 @@ def add_member(
             committee_id=committee.id,
         )
         session.add(new_member)
+        dashboard_counters.record_members(session, 1)
+        rollups.record_committees(session, [], [(committee, new_member.created_at)])
         session.commit()
+        data_versions.bump("committees")
         session.refresh(committee)
         return committee
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        # Log and return detailed error for debugging
-        import traceback
-        error_detail = f"Error al agregar miembro: {str(e)}\nTipo: {type(e).__name__}\nTraceback: {traceback.format_exc()}"
-        print(error_detail)  # Para logs del servidor
+        logger.exception("Error al agregar miembro al comité %s", committee_id)
         raise HTTPException(status_code=500, detail=f"Error al agregar miembro: {str(e)}")
 
 
@@ -174,7 +300,10 @@ def delete_member(
     if not member or member.committee_id != committee.id:
         raise HTTPException(status_code=404, detail="Integrante no encontrado")
     session.delete(member)
+    dashboard_counters.record_members(session, -1)
+    rollups.record_committees(session, [], [(committee, member.created_at)], sign=-1)
     session.commit()
+    data_versions.bump("committees")
     session.refresh(committee)
     return committee
 
@@ -220,5 +349,10 @@ def delete_committee(
 
     # Finally delete the committee
     session.delete(committee)
+    dashboard_counters.record_committee_deleted(
+        session, committee.section_number, members=len(members), documents=len(docs)
+    )
+    rollups.record_committees(session, [committee], [(committee, m.created_at) for m in members], sign=-1)
     session.commit()
+    data_versions.bump("committees")
     return None
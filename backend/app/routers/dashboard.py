@@ -1,21 +1,33 @@
 import hashlib
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from io import BytesIO
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from fpdf import FPDF
-from openpyxl import Workbook
-from sqlalchemy import String, cast, distinct, func
+from sqlalchemy import case, distinct, func
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 
-from .. import models, schemas
-from ..database import get_session
-from ..dependencies import require_dashboard_user
+from .. import dashboard_counters, models, rollups, schemas, unit_tree
+from ..analytics_snapshot import analytics_snapshots, reset_served_stale, served_stale
+from ..attendance_guard import REASON_DUPLICATE
+from ..attendance_map import MAX_ZOOM, attendance_map_index, tile_bounds
+from ..cache import Uncached, dashboard_cache
+from ..coverage import (
+    DISTRITO as COVERAGE_DISTRITO,
+    MUNICIPIO as COVERAGE_MUNICIPIO,
+    CoverageGap,
+    catalog_scope,
+    coverage_engine,
+)
+from ..database import get_read_session, get_session, read_engine
+from ..dependencies import get_dashboard_scope, require_dashboard_user
+from ..events import event_registry, naive_local
+from ..responses import dump_json, json_response, model_response
+from ..unit_scope import STATEWIDE, UnitScope, unit_hierarchy
 
 router = APIRouter(
     prefix="/dashboard",
@@ -76,6 +88,34 @@ def _safe_scalar(session: Session, statement, default: int | float = 0) -> int |
         return default
 
 
+def _cached(name: str, compute, depends_on, params=()):
+    """
+    Serve a pure read through the shared dashboard cache. `compute` receives its
+    own session because stale entries are recomputed after the request ends.
+    """
+    def run():
+        reset_served_stale()
+        with Session(read_engine()) as session:
+            value = compute(session)
+        # Built from a snapshot behind the data: answer, but keep it out of the cache
+        return Uncached(value) if served_stale() else value
+
+    return dashboard_cache.get_or_compute(name, run, depends_on=depends_on, params=params)
+
+
+def _cached_json(name: str, compute, depends_on, params=()) -> Response:
+    """Like `_cached`, but the cache holds the serialized bytes so hits skip serialization."""
+    payload = _cached(f"{name}.json", lambda session: dump_json(compute(session)), depends_on, params)
+    return json_response(payload)
+
+
+def _snapshot_rows(snapshot, scope: UnitScope):
+    """Row mask of the committees in scope, or None for statewide."""
+    if scope.statewide:
+        return None
+    return snapshot.rows_in(scope.unit_ids, scope.section_codes)
+
+
 def _normalize_upload_path(filename: str) -> str:
     normalized = filename.replace("\\", "/") if filename else ""
     if normalized.startswith("/uploads/"):
@@ -89,117 +129,194 @@ def _latin1(text: Optional[str]) -> str:
     return text.encode("latin-1", "ignore").decode("latin-1")
 
 
-def _serialize_committees(session: Session, committees: Iterable[models.Committee]) -> List[schemas.CommitteeDashboardOut]:
-    committees_list = list(committees)
-    if not committees_list:
+def _blank_to_none(value: Optional[str]) -> Optional[str]:
+    # Same normalization as CommitteeMemberBase's validators
+    return None if value is None or not value.strip() else value
+
+
+def _committee_payload(
+    session: Session, committee_id: Optional[int] = None, scope: UnitScope = STATEWIDE
+) -> List[dict]:
+    """
+    Committees in the `CommitteeDashboardOut` shape as plain dicts. Committees
+    (with owner and unit), members and documents are read as flat column tuples
+    in three queries and grouped in one pass; no ORM object or model is built.
+    """
+    committee = models.Committee
+    unit = models.AdministrativeUnit
+    criteria = []
+    if committee_id is not None:
+        criteria.append(committee.id == committee_id)
+    scope_filter = scope.committee_filter()
+    if scope_filter is not None:
+        criteria.append(scope_filter)
+
+    rows = session.exec(
+        select(
+            committee.id,
+            committee.name,
+            committee.section_number,
+            committee.type,
+            committee.owner_id,
+            models.User.name,
+            committee.created_at,
+            committee.presidente,
+            committee.email,
+            committee.clave_afiliacion,
+            committee.telefono,
+            unit.id,
+            unit.name,
+            unit.unit_type,
+            unit.code,
+        )
+        .outerjoin(models.User, models.User.email == committee.owner_id)
+        .outerjoin(unit, unit.id == committee.administrative_unit_id)
+        .where(*criteria)
+        .order_by(committee.created_at.desc())
+    ).all()
+    if not rows:
         return []
 
-    owner_emails = {c.owner_id for c in committees_list if c.owner_id}
-    owner_map: Dict[str, models.User] = {}
-    if owner_emails:
-        owners = session.exec(
-            select(models.User).where(models.User.email.in_(owner_emails))
-        ).all()
-        owner_map = {owner.email: owner for owner in owners}
-
-    section_ids: set[int] = set()
-    for committee in committees_list:
-        if committee.section_number:
-            try:
-                section_ids.add(int(committee.section_number))
-            except ValueError:
-                continue
-    section_map: Dict[int, models.Seccion] = {}
+    # Section numbers are parsed once per distinct value
+    section_ids: Dict[str, int] = {}
+    for number in {row[2] for row in rows if row[2]}:
+        try:
+            section_ids[number] = int(number)
+        except ValueError:
+            continue
+    section_map: Dict[int, dict] = {}
     if section_ids:
         try:
-            sections = session.exec(
-                select(models.Seccion).where(models.Seccion.id.in_(section_ids))
-            ).all()
-            section_map = {section.id: section for section in sections if section.id is not None}
+            section_map = {
+                row[0]: dict(zip(("id", "municipio", "nombre_municipio", "distrito", "nombre_distrito", "distrito_federal"), row))
+                for row in session.exec(
+                    select(
+                        models.Seccion.id,
+                        models.Seccion.municipio,
+                        models.Seccion.nombre_municipio,
+                        models.Seccion.distrito,
+                        models.Seccion.nombre_distrito,
+                        models.Seccion.distrito_federal,
+                    ).where(models.Seccion.id.in_(set(section_ids.values())))
+                ).all()
+            }
         except SQLAlchemyError:
             section_map = {}
 
-    payload: List[schemas.CommitteeDashboardOut] = []
-    for committee in committees_list:
-        owner = owner_map.get(committee.owner_id)
-        section_ref = None
-        if committee.section_number:
-            try:
-                section_model = section_map.get(int(committee.section_number))
-            except ValueError:
-                section_model = None
-            section_ref = (
-                schemas.SectionRef.model_validate(section_model)
-                if section_model is not None
-                else None
-            )
-        admin_ref = (
-            schemas.AdministrativeUnitRef.model_validate(committee.administrative_unit)
-            if committee.administrative_unit is not None
-            else None
+    # Members and documents of the same committees; a subquery keeps the statement size fixed
+    if committee_id is not None:
+        in_selection = [committee_id]
+    else:
+        in_selection = select(committee.id).where(*criteria)
+    member = models.CommitteeMember
+    members_by_committee: Dict[int, List[dict]] = defaultdict(list)
+    for row in session.exec(
+        select(
+            member.committee_id,
+            member.full_name,
+            member.ine_key,
+            member.phone,
+            member.email,
+            member.section_number,
+            member.invited_by,
+            member.id,
+            member.created_at,
         )
-        members = [
-            schemas.CommitteeMemberOut.model_validate(member)
-            for member in getattr(committee, "members", [])
-        ]
-        documents = [
-            schemas.DocumentWithUrl(
-                id=document.id,
-                filename=document.filename,
-                original_name=document.original_name,
-                content_type=document.content_type,
-                size=document.size,
-                created_at=document.created_at,
-                url=_normalize_upload_path(document.filename),
-            )
-            for document in getattr(committee, "documents", [])
-        ]
-        payload.append(
-            schemas.CommitteeDashboardOut(
-                id=committee.id,
-                name=committee.name,
-                section_number=committee.section_number,
-                type=committee.type,
-                owner_id=committee.owner_id,
-                owner_name=owner.name if owner else None,
-                created_at=committee.created_at,
-                presidente=committee.presidente,
-                email=committee.email,
-                clave_afiliacion=committee.clave_afiliacion,
-                telefono=committee.telefono,
-                administrative_unit=admin_ref,
-                section=section_ref,
-                members=members,
-                documents=documents,
-                total_members=len(members),
-            )
+        .where(member.committee_id.in_(in_selection))
+        .order_by(member.id)
+    ):
+        members_by_committee[row[0]].append({
+            "full_name": row[1],
+            "ine_key": _blank_to_none(row[2]),
+            "phone": row[3],
+            "email": _blank_to_none(row[4]),
+            "section_number": row[5],
+            "invited_by": row[6],
+            "id": row[7],
+            "created_at": row[8],
+        })
+    document = models.CommitteeDocument
+    documents_by_committee: Dict[int, List[dict]] = defaultdict(list)
+    for row in session.exec(
+        select(
+            document.committee_id,
+            document.id,
+            document.filename,
+            document.original_name,
+            document.content_type,
+            document.size,
+            document.created_at,
         )
-    return payload
-
+        .where(document.committee_id.in_(in_selection))
+        .order_by(document.id)
+    ):
+        documents_by_committee[row[0]].append({
+            "id": row[1],
+            "filename": row[2],
+            "original_name": row[3],
+            "content_type": row[4],
+            "size": row[5],
+            "created_at": row[6],
+            "url": _normalize_upload_path(row[2]),
+        })
 
-def _load_committees(session: Session, committee_id: Optional[int] = None) -> List[models.Committee]:
-    statement = (
-        select(models.Committee)
-        .options(
-            selectinload(models.Committee.members),
-            selectinload(models.Committee.documents),
-            selectinload(models.Committee.administrative_unit),
-        )
-        .order_by(models.Committee.created_at.desc())
-    )
-    if committee_id is not None:
-        statement = statement.where(models.Committee.id == committee_id)
-    return session.exec(statement).all()
+    payload: List[dict] = []
+    for (
+        cid, name, section_number, committee_type, owner_id, owner_name, created_at,
+        presidente, email, clave_afiliacion, telefono, unit_id, unit_name, unit_type, unit_code,
+    ) in rows:
+        members = members_by_committee.get(cid, [])
+        section_id = section_ids.get(section_number) if section_number else None
+        payload.append({
+            "id": cid,
+            "name": name,
+            "section_number": section_number,
+            "type": committee_type,
+            "owner_id": owner_id,
+            "owner_name": owner_name,
+            "created_at": created_at,
+            "presidente": presidente,
+            "email": email,
+            "clave_afiliacion": clave_afiliacion,
+            "telefono": telefono,
+            "administrative_unit": (
+                {"id": unit_id, "name": unit_name, "unit_type": unit_type, "code": unit_code}
+                if unit_id is not None
+                else None
+            ),
+            "section": section_map.get(section_id) if section_id is not None else None,
+            "members": members,
+            "documents": documents_by_committee.get(cid, []),
+            "total_members": len(members),
+        })
+    return payload
 
 
 @router.get("/attendance", response_model=List[schemas.AttendanceOut])
-def list_attendance(session: Session = Depends(get_session)) -> List[schemas.AttendanceOut]:
-    statement = select(models.Attendance).order_by(models.Attendance.created_at.desc())
-    return session.exec(statement).all()
+def list_attendance(
+    response: Response,
+    event_id: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    before_id: Optional[int] = None,
+    session: Session = Depends(get_read_session),
+) -> List[schemas.AttendanceOut]:
+    # Keyset pagination on id; the next page starts at X-Next-Before-Id
+    statement = select(models.Attendance).order_by(models.Attendance.id.desc()).limit(limit)
+    if event_id is not None:
+        statement = statement.where(models.Attendance.event_id == event_id)
+        bounds = event_registry.window(session, event_id)
+        if bounds is not None:
+            statement = statement.where(models.Attendance.created_at.between(*bounds))
+    if before_id is not None:
+        statement = statement.where(models.Attendance.id < before_id)
+    records = session.exec(statement).all()
+    if len(records) == limit:
+        response.headers["X-Next-Before-Id"] = str(records[-1].id)
+    return records
 
 
 @router.get("/attendance/map", response_model=List[schemas.AttendanceMapPoint])
-def list_attendance_map(session: Session = Depends(get_session)) -> List[schemas.AttendanceMapPoint]:
+def list_attendance_map(session: Session = Depends(get_read_session)) -> List[schemas.AttendanceMapPoint]:
     statement = (
         select(models.Attendance)
         .where(
@@ -222,107 +339,133 @@ def list_attendance_map(session: Session = Depends(get_session)) -> List[schemas
     ]
 
 
-@router.get("/committee-stats", response_model=schemas.CommitteeStatsResponse)
-def committee_stats(session: Session = Depends(get_session)) -> schemas.CommitteeStatsResponse:
-    user_stmt = (
+@router.get("/attendance/suspicious", response_model=List[schemas.SuspiciousDevice])
+def suspicious_devices(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    session: Session = Depends(get_read_session),
+) -> List[schemas.SuspiciousDevice]:
+    # Reads only the flags table (filled at ingest), never the attendance table
+    since = models.get_mexico_city_time() - timedelta(hours=hours)
+    flag = models.AttendanceFlag
+    rows = session.exec(
         select(
-            models.Committee.owner_id.label("owner_email"),
-            func.count(models.Committee.id).label("total"),
-            models.User.id.label("user_id"),
-            models.User.name.label("user_name"),
+            flag.device_id,
+            func.count(distinct(flag.provider_user_id)).label("accounts"),
+            func.count(flag.id).label("flags"),
+            func.sum(case((flag.reason == REASON_DUPLICATE, 1), else_=0)).label("duplicates"),
+            func.min(flag.created_at).label("first_seen"),
+            func.max(flag.created_at).label("last_seen"),
+        )
+        .where(flag.created_at >= since)
+        .group_by(flag.device_id)
+        .order_by(func.count(distinct(flag.provider_user_id)).desc(), func.count(flag.id).desc())
+    ).all()
+    return [
+        schemas.SuspiciousDevice(
+            device_id=row.device_id,
+            accounts=row.accounts,
+            flags=row.flags,
+            duplicates=int(row.duplicates or 0),
+            first_seen=row.first_seen,
+            last_seen=row.last_seen,
         )
-        .select_from(models.Committee)
-        .outerjoin(models.User, models.User.email == models.Committee.owner_id)
-        .group_by(models.Committee.owner_id, models.User.id, models.User.name)
-        .order_by(func.count(models.Committee.id).desc())
+        for row in rows
+    ]
+
+
+def _cluster_response(zoom: int, bbox) -> schemas.AttendanceClusterResponse:
+    clusters = attendance_map_index.clusters(zoom, bbox)
+    return schemas.AttendanceClusterResponse(
+        zoom=zoom,
+        total=sum(cluster.count for cluster in clusters),
+        clusters=[
+            schemas.AttendanceCluster(latitude=c.latitude, longitude=c.longitude, count=c.count)
+            for c in clusters
+        ],
+    )
+
+
+@router.get("/attendance/clusters", response_model=schemas.AttendanceClusterResponse)
+def attendance_clusters(
+    zoom: int = Query(8, ge=0, le=MAX_ZOOM),
+    min_lat: Optional[float] = None,
+    min_lng: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    max_lng: Optional[float] = None,
+    session: Session = Depends(get_read_session),
+) -> schemas.AttendanceClusterResponse:
+    attendance_map_index.sync(session)
+    bbox = None
+    if None not in (min_lat, min_lng, max_lat, max_lng):
+        bbox = (min_lat, min_lng, max_lat, max_lng)
+    return _cluster_response(zoom, bbox)
+
+
+@router.get("/attendance/tiles/{z}/{x}/{y}", response_model=schemas.AttendanceClusterResponse)
+def attendance_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_read_session),
+):
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise HTTPException(status_code=404, detail="Tile fuera de rango")
+    attendance_map_index.sync(session)
+    etag = f'W/"att-{z}-{x}-{y}-{attendance_map_index.last_id}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=30"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return _cluster_response(z, tile_bounds(z, x, y))
+
+
+@router.get("/committee-stats", response_model=schemas.CommitteeStatsResponse)
+def committee_stats(scope: UnitScope = Depends(get_dashboard_scope)) -> Response:
+    """Committees by owner, section and type, from the analytics snapshot: may trail a
+    write by up to two snapshot builds (see app/analytics_snapshot.py)."""
+    return _cached_json(
+        "committee-stats",
+        lambda session: _committee_stats(session, scope),
+        ("committees", "users"),
+        params=(scope.cache_key,),
     )
+
+
+def _committee_stats(session: Session, scope: UnitScope = STATEWIDE) -> schemas.CommitteeStatsResponse:
+    snapshot = analytics_snapshots.current(session)
+    rows = _snapshot_rows(snapshot, scope)
     by_user = [
         schemas.CommitteeOwnerStat(
-            owner_email=row.owner_email or "sin-correo",
-            owner_name=row.user_name,
-            owner_id=row.user_id,
-            total=row.total or 0,
+            owner_email=owner_email or "sin-correo",
+            owner_name=user_name,
+            owner_id=user_id,
+            total=total,
         )
-        for row in session.exec(user_stmt).all()
+        for owner_email, user_id, user_name, total in snapshot.by_owner(rows)
     ]
-
-    try:
-        section_stmt = (
-            select(
-                models.Committee.section_number.label("section_number"),
-                func.count(models.Committee.id).label("total"),
-                models.Seccion.nombre_municipio.label("municipio"),
-            )
-            .select_from(models.Committee)
-            .outerjoin(
-                models.Seccion,
-                cast(models.Seccion.id, String) == models.Committee.section_number,
-            )
-            .where(
-                models.Committee.section_number.is_not(None),
-                models.Committee.section_number != "",
-            )
-            .group_by(models.Committee.section_number, models.Seccion.nombre_municipio)
-            .order_by(func.count(models.Committee.id).desc())
-        )
-        section_rows = session.exec(section_stmt).all()
-    except SQLAlchemyError:
-        section_rows = []
-
     by_section = [
         schemas.CommitteeLocationStat(
-            code=row.section_number,
-            label=f"Sección {row.section_number}" if row.section_number else "Sin sección",
-            municipality=row.municipio,
-            total=row.total or 0,
+            code=section_number,
+            label=f"Sección {section_number}",
+            municipality=municipio,
+            total=total,
         )
-        for row in section_rows
+        for section_number, municipio, total in snapshot.by_section(rows)
     ]
-
-    try:
-        municipality_stmt = (
-            select(
-                models.Seccion.nombre_municipio.label("municipio"),
-                func.count(models.Committee.id).label("total"),
-            )
-            .select_from(models.Committee)
-            .outerjoin(
-                models.Seccion,
-                cast(models.Seccion.id, String) == models.Committee.section_number,
-            )
-            .where(
-                models.Committee.section_number.is_not(None),
-                models.Committee.section_number != "",
-                models.Seccion.nombre_municipio.is_not(None),
-            )
-            .group_by(models.Seccion.nombre_municipio)
-            .order_by(func.count(models.Committee.id).desc())
-        )
-        municipality_rows = session.exec(municipality_stmt).all()
-    except SQLAlchemyError:
-        municipality_rows = []
-
     by_municipality = [
         schemas.CommitteeLocationStat(
-            code=row.municipio,
-            label=row.municipio or "Sin municipio",
-            municipality=row.municipio,
-            total=row.total or 0,
+            code=municipio,
+            label=municipio,
+            municipality=municipio,
+            total=total,
         )
-        for row in municipality_rows
+        for municipio, total in snapshot.by_municipality(rows)
     ]
-
-    type_stmt = (
-        select(
-            models.Committee.type.label("type"),
-            func.count(models.Committee.id).label("total"),
-        )
-        .group_by(models.Committee.type)
-        .order_by(func.count(models.Committee.id).desc())
-    )
     by_type = [
-        schemas.CommitteeTypeStat(type=row.type or "Sin tipo", total=row.total or 0)
-        for row in session.exec(type_stmt).all()
+        schemas.CommitteeTypeStat(type=committee_type or "Sin tipo", total=total)
+        for committee_type, total in snapshot.by_type(rows)
     ]
 
     return schemas.CommitteeStatsResponse(
@@ -335,156 +478,121 @@ def committee_stats(session: Session = Depends(get_session)) -> schemas.Committe
 
 @router.get("/administrative-tree", response_model=List[schemas.AdministrativeUnitNode])
 def administrative_tree(
-    prune_empty: bool = True, 
-    session: Session = Depends(get_session)
-) -> List[schemas.AdministrativeUnitNode]:
-    units = session.exec(select(models.AdministrativeUnit)).all()
-    if not units:
-        return []
-
-    # Get stats per administrative unit (Committees and Members)
-    stats_stmt = (
-        select(
-            models.Committee.administrative_unit_id,
-            func.count(distinct(models.Committee.id)).label("committee_count"),
-            func.count(models.CommitteeMember.id).label("member_count"),
-        )
-        .select_from(models.Committee)
-        .outerjoin(models.CommitteeMember, models.CommitteeMember.committee_id == models.Committee.id)
-        .where(models.Committee.administrative_unit_id.is_not(None))
-        .group_by(models.Committee.administrative_unit_id)
+    prune_empty: bool = True,
+    depth: Optional[int] = Query(default=None, ge=1),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> Response:
+    """Unit hierarchy with committee/member totals; the totals come from the analytics
+    snapshot and may trail a write by up to two snapshot builds."""
+    payload = _cached(
+        "administrative-tree",
+        lambda session: _administrative_tree(prune_empty, scope, depth),
+        ("committees", "assignments", "users", "units"),
+        params=(prune_empty, depth, scope.cache_key),
     )
-    stats_rows = session.exec(stats_stmt).all()
-    stats_map = {
-        row.administrative_unit_id: (row.committee_count, row.member_count)
-        for row in stats_rows
-        if row.administrative_unit_id is not None
-    }
-
-    # FALLBACK: Aggregation by section_number for committees not yet linked to AdministrativeUnit
-    # 1. Get mapping of code -> unit_id for SECTION units
-    section_units = session.exec(
-        select(models.AdministrativeUnit.code, models.AdministrativeUnit.id)
-        .where(models.AdministrativeUnit.unit_type == "SECTION")
-    ).all()
-    section_code_map = {row.code: row.id for row in section_units if row.code}
+    return json_response(payload)
+
+
+@router.get("/administrative-tree/{unit_id}/children", response_model=List[schemas.AdministrativeUnitNode])
+def administrative_tree_children(
+    unit_id: int,
+    prune_empty: bool = True,
+    depth: int = Query(default=1, ge=1),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> Response:
+    """Next `depth` levels below a unit, for opening the tree level by level (totals as in /administrative-tree)."""
+    if not scope.allows_unit(unit_id):
+        raise HTTPException(status_code=403, detail="La unidad está fuera de tu ámbito")
+    payload = _cached(
+        "administrative-tree-children",
+        lambda session: _administrative_tree_children(unit_id, prune_empty, depth),
+        ("committees", "assignments", "users", "units"),
+        params=(unit_id, prune_empty, depth),
+    )
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    return json_response(payload)
 
-    # 2. Count by section_number where administrative_unit_id is NULL
-    fallback_stmt = (
+
+def _unit_tree() -> unit_tree.UnitTree:
+    """Statewide tree with rolled-up totals; scoped views render one of its subtrees."""
+    return _cached("administrative-tree-data", _build_unit_tree, ("committees", "assignments", "users", "units"))
+
+
+def _build_unit_tree(session: Session) -> unit_tree.UnitTree:
+    units = session.exec(
         select(
-            models.Committee.section_number,
-            func.count(distinct(models.Committee.id)).label("committee_count"),
-            func.count(models.CommitteeMember.id).label("member_count"),
+            models.AdministrativeUnit.id,
+            models.AdministrativeUnit.parent_id,
+            models.AdministrativeUnit.name,
+            models.AdministrativeUnit.code,
+            models.AdministrativeUnit.unit_type,
         )
-        .select_from(models.Committee)
-        .outerjoin(models.CommitteeMember, models.CommitteeMember.committee_id == models.Committee.id)
-        .where(models.Committee.administrative_unit_id.is_(None))
-        .where(models.Committee.section_number.is_not(None))
-        .where(models.Committee.section_number != "")
-        .group_by(models.Committee.section_number)
-    )
-    fallback_rows = session.exec(fallback_stmt).all()
+    ).all()
 
-    # 3. Merge into stats_map
-    for row in fallback_rows:
-        # standardizing str just in case
-        u_id = section_code_map.get(str(row.section_number))
-        if u_id:
-            c_curr, m_curr = stats_map.get(u_id, (0, 0))
-            stats_map[u_id] = (c_curr + row.committee_count, m_curr + row.member_count)
+    # Committees and members per unit; unlinked committees count for their SECTION unit
+    section_code_map = {row.code: row.id for row in units if row.unit_type == "SECTION" and row.code}
+    stats_map = analytics_snapshots.current(session).by_unit(section_code_map)
 
+    assignments_by_unit: Dict[int, List[dict]] = defaultdict(list)
     assignments = session.exec(
-        select(models.UserAssignment)
-        .options(selectinload(models.UserAssignment.user))
+        select(models.UserAssignment).options(selectinload(models.UserAssignment.user))
     ).all()
-
-    assignments_by_unit: Dict[int, List[schemas.AssignmentUserSummary]] = defaultdict(list)
     for assignment in assignments:
         if assignment.administrative_unit_id is None:
             continue
         user = assignment.user
-        if user is None:
-            user_email = f"usuario{assignment.user_id}@desconocido.local"
-            user_name = f"Usuario {assignment.user_id}"
-            user_id = assignment.user_id
-        else:
-            user_email = user.email
-            user_name = user.name
-            user_id = user.id
-        assignments_by_unit[assignment.administrative_unit_id].append(
-            schemas.AssignmentUserSummary(
-                user_id=user_id,
-                user_name=user_name,
-                user_email=user_email,
-                role=assignment.role,
-                role_label=_role_label(assignment.role),
-            )
-        )
+        assignments_by_unit[assignment.administrative_unit_id].append({
+            "user_id": user.id if user else assignment.user_id,
+            "user_name": user.name if user else f"Usuario {assignment.user_id}",
+            "user_email": user.email if user else f"usuario{assignment.user_id}@desconocido.local",
+            "role": assignment.role,
+            "role_label": _role_label(assignment.role),
+        })
 
-    children_map: Dict[Optional[int], List[models.AdministrativeUnit]] = defaultdict(list)
-    for unit in units:
-        children_map[unit.parent_id].append(unit)
+    return unit_tree.build_tree([tuple(row) for row in units], stats_map, assignments_by_unit)
 
-    def build_node(unit: models.AdministrativeUnit) -> Optional[schemas.AdministrativeUnitNode]:
-        # Recursive build
-        children_nodes = []
-        child_units = sorted(children_map.get(unit.id, []), key=lambda u: u.name.lower())
-        
-        cumulative_committees = 0
-        cumulative_members = 0
-
-        for child_unit in child_units:
-            child_node = build_node(child_unit)
-            if child_node:
-                children_nodes.append(child_node)
-                cumulative_committees += child_node.total_committees
-                cumulative_members += child_node.total_members
-
-        # Direct stats
-        direct_committees, direct_members = stats_map.get(unit.id, (0, 0))
-        
-        total_committees = cumulative_committees + direct_committees
-        total_members = cumulative_members + direct_members
-
-        # Pruning: Only return node if it has stats or meaningful content
-        # IF prune_empty is True, we check totals.
-        if prune_empty and total_committees == 0 and total_members == 0:
-            return None
-
-        return schemas.AdministrativeUnitNode(
-            id=unit.id,
-            name=unit.name,
-            code=unit.code,
-            unit_type=unit.unit_type,
-            assignments=assignments_by_unit.get(unit.id, []),
-            children=children_nodes,
-            total_committees=total_committees,
-            total_members=total_members,
-        )
 
-    roots = sorted(children_map.get(None, []), key=lambda u: u.name.lower())
-    final_nodes = []
-    for root in roots:
-        node = build_node(root)
-        if node:
-            final_nodes.append(node)
-            
-    return final_nodes
+def _administrative_tree(prune_empty: bool, scope: UnitScope = STATEWIDE, depth: Optional[int] = None) -> bytes:
+    tree = _unit_tree()
+    if scope.statewide:
+        start = tree.roots
+    else:
+        position = tree.positions.get(scope.unit_id)
+        start = [position] if position is not None else []
+    return unit_tree.render(tree, start, depth, prune_empty)
+
+
+def _administrative_tree_children(unit_id: int, prune_empty: bool, depth: int) -> Optional[bytes]:
+    tree = _unit_tree()
+    position = tree.positions.get(unit_id)
+    if position is None:
+        return None
+    return unit_tree.render(tree, tree.children[position], depth, prune_empty)
 
 
 @router.get("/municipal-stats", response_model=List[schemas.AdministrativeUnitNode])
-def municipal_stats(
-    session: Session = Depends(get_session)
-) -> List[schemas.AdministrativeUnitNode]:
+def municipal_stats(scope: UnitScope = Depends(get_dashboard_scope)) -> Response:
+    """Coverage per municipality with its coordinators; committee counts come from the
+    analytics snapshot, so they may trail a write by up to two snapshot builds."""
+    return _cached_json(
+        "municipal-stats",
+        lambda session: _municipal_stats(session, scope),
+        ("committees", "assignments", "users", "units"),
+        params=(scope.cache_key,),
+    )
+
+
+def _municipal_stats(session: Session, scope: UnitScope = STATEWIDE) -> List[schemas.AdministrativeUnitNode]:
     # 1. Fetch Assignments and Map to Municipality Name (normalization try)
     # We try to link existing AdministrativeUnits (where assignments live) to the names coming from Seccion
-    assignments = session.exec(
-        select(models.UserAssignment)
-        .options(
-            selectinload(models.UserAssignment.user),
-            selectinload(models.UserAssignment.administrative_unit)
-        )
-    ).all()
+    assignments_stmt = select(models.UserAssignment).options(
+        selectinload(models.UserAssignment.user),
+        selectinload(models.UserAssignment.administrative_unit)
+    )
+    if not scope.statewide:
+        assignments_stmt = assignments_stmt.where(models.UserAssignment.administrative_unit_id.in_(scope.unit_ids))
+    assignments = session.exec(assignments_stmt).all()
     
     # Map normalized_name -> list of assignments
     assignments_map: Dict[str, List[schemas.AssignmentUserSummary]] = defaultdict(list)
@@ -503,35 +611,15 @@ def municipal_stats(
                 )
                 assignments_map[unit.name.strip().upper()].append(summ)
 
-    # 2. Execute SQL-like query to get Stats grouped by Section, but with Municipality Info
-    # Based on user request: SELECT ... FROM committee INNER JOIN seccion ...
-    stats_query = (
-        select(
-            models.Seccion.municipio.label("municipio_id"),
-            models.Seccion.nombre_municipio,
-            models.Seccion.id.label("section_id"),
-            func.count(distinct(models.Committee.id)).label("committee_count"),
-            func.count(models.CommitteeMember.id).label("member_count")
-        )
-        .select_from(models.Committee)
-        .join(models.Seccion, cast(models.Seccion.id, String) == models.Committee.section_number)
-        .outerjoin(models.CommitteeMember, models.CommitteeMember.committee_id == models.Committee.id)
-        .group_by(models.Seccion.id, models.Seccion.municipio, models.Seccion.nombre_municipio)
-        .order_by(models.Seccion.nombre_municipio)
-    )
-    
-    try:
-        rows = session.exec(stats_query).all()
-    except SQLAlchemyError as e:
-        print(f"Error executing municipal stats query: {e}")
-        return []
+    # 2. Stats per catalog section (committees joined to Seccion), from the columnar snapshot
+    snapshot = analytics_snapshots.current(session)
+    rows = snapshot.by_catalog_section(_snapshot_rows(snapshot, scope))
 
     # 3. Process results into Hierarchy
     # Structure: MunicipalityID -> { name, sections: [ {id, committees, members} ] }
     municipalities: Dict[int, Dict] = {}
     
-    for row in rows:
-        mun_id = row.municipio_id
+    for section_id, mun_id, nombre_municipio, committee_count, member_count in rows:
         # Safety check if municipio_id is None
         if not mun_id: 
             cont = "Unknown"
@@ -539,19 +627,19 @@ def municipal_stats(
         
         if mun_id not in municipalities:
             municipalities[mun_id] = {
-                "name": row.nombre_municipio or "Desconocido",
+                "name": nombre_municipio or "Desconocido",
                 "sections": [],
                 "total_committees": 0,
                 "total_members": 0
             }
         
         municipalities[mun_id]["sections"].append({
-            "id": row.section_id,
-            "committees": row.committee_count,
-            "members": row.member_count
+            "id": section_id,
+            "committees": committee_count,
+            "members": member_count
         })
-        municipalities[mun_id]["total_committees"] += row.committee_count
-        municipalities[mun_id]["total_members"] += row.member_count
+        municipalities[mun_id]["total_committees"] += committee_count
+        municipalities[mun_id]["total_members"] += member_count
 
     # 4. Build Node List
     final_nodes = []
@@ -595,7 +683,8 @@ def municipal_stats(
             assignments=mun_assignments,
             children=children,
             total_committees=data["total_committees"],
-            total_members=data["total_members"]
+            total_members=data["total_members"],
+            has_children=bool(children)
         )
         
         final_nodes.append(node)
@@ -604,15 +693,27 @@ def municipal_stats(
 
 
 @router.get("/user-assignments", response_model=List[schemas.UserAssignmentRow])
-def list_user_assignments(session: Session = Depends(get_session)) -> List[schemas.UserAssignmentRow]:
-    assignments = session.exec(
+def list_user_assignments(scope: UnitScope = Depends(get_dashboard_scope)) -> Response:
+    return _cached_json(
+        "user-assignments",
+        lambda session: _user_assignments(session, scope),
+        ("assignments", "users", "units"),
+        params=(scope.cache_key,),
+    )
+
+
+def _user_assignments(session: Session, scope: UnitScope = STATEWIDE) -> List[schemas.UserAssignmentRow]:
+    statement = (
         select(models.UserAssignment)
         .options(
             selectinload(models.UserAssignment.user),
             selectinload(models.UserAssignment.administrative_unit),
         )
         .order_by(models.UserAssignment.created_at.desc())
-    ).all()
+    )
+    if not scope.statewide:
+        statement = statement.where(models.UserAssignment.administrative_unit_id.in_(scope.unit_ids))
+    assignments = session.exec(statement).all()
 
     results: List[schemas.UserAssignmentRow] = []
     for assignment in assignments:
@@ -646,25 +747,32 @@ def list_user_assignments(session: Session = Depends(get_session)) -> List[schem
 
 
 @router.get("/committees", response_model=List[schemas.CommitteeDashboardOut])
-def list_committees(session: Session = Depends(get_session)) -> List[schemas.CommitteeDashboardOut]:
-    committees = _load_committees(session)
-    return _serialize_committees(session, committees)
+def list_committees(
+    session: Session = Depends(get_read_session), scope: UnitScope = Depends(get_dashboard_scope)
+) -> Response:
+    return model_response(_committee_payload(session, scope=scope))
 
 
 @router.get("/committees/{committee_id}", response_model=schemas.CommitteeDashboardOut)
-def get_committee_detail(committee_id: int, session: Session = Depends(get_session)) -> schemas.CommitteeDashboardOut:
-    committee = next(iter(_load_committees(session, committee_id)), None)
-    if committee is None:
-        raise HTTPException(status_code=404, detail="Comité no encontrado")
-    serialized = _serialize_committees(session, [committee])
+def get_committee_detail(
+    committee_id: int,
+    session: Session = Depends(get_read_session),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> Response:
+    serialized = _committee_payload(session, committee_id, scope)
     if not serialized:
         raise HTTPException(status_code=404, detail="Comité no encontrado")
-    return serialized[0]
+    return model_response(serialized[0])
 
 
 @router.get("/exports/committees.xlsx")
-def export_committees_excel(session: Session = Depends(get_session)) -> StreamingResponse:
-    committees = _serialize_committees(session, _load_committees(session))
+def export_committees_excel(
+    session: Session = Depends(get_read_session), scope: UnitScope = Depends(get_dashboard_scope)
+) -> StreamingResponse:
+    # openpyxl is only needed here; importing it lazily keeps it out of every worker's startup
+    from openpyxl import Workbook
+
+    committees = _committee_payload(session, scope=scope)
     workbook = Workbook()
     ws_committees = workbook.active
     ws_committees.title = "Comites"
@@ -684,20 +792,20 @@ def export_committees_excel(session: Session = Depends(get_session)) -> Streamin
         ]
     )
     for committee in committees:
-        municipality = committee.section.nombre_municipio if committee.section else ""
+        municipality = committee["section"]["nombre_municipio"] if committee["section"] else ""
         ws_committees.append(
             [
-                committee.id,
-                committee.name,
-                committee.type,
-                committee.section_number,
+                committee["id"],
+                committee["name"],
+                committee["type"],
+                committee["section_number"],
                 municipality,
-                committee.presidente,
-                committee.telefono,
-                committee.email,
-                committee.total_members,
-                committee.owner_name or committee.owner_id,
-                committee.created_at.strftime("%Y-%m-%d %H:%M"),
+                committee["presidente"],
+                committee["telefono"],
+                committee["email"],
+                committee["total_members"],
+                committee["owner_name"] or committee["owner_id"],
+                committee["created_at"].strftime("%Y-%m-%d %H:%M"),
             ]
         )
 
@@ -712,15 +820,15 @@ def export_committees_excel(session: Session = Depends(get_session)) -> Streamin
         "Invitado por",
     ])
     for committee in committees:
-        for member in committee.members:
+        for member in committee["members"]:
             ws_members.append([
-                committee.id,
-                committee.name,
-                member.full_name,
-                member.phone,
-                member.email,
-                member.section_number,
-                member.invited_by,
+                committee["id"],
+                committee["name"],
+                member["full_name"],
+                member["phone"],
+                member["email"],
+                member["section_number"],
+                member["invited_by"],
             ])
 
     buffer = BytesIO()
@@ -735,11 +843,17 @@ def export_committees_excel(session: Session = Depends(get_session)) -> Streamin
 
 
 @router.get("/committees/{committee_id}/acta.pdf")
-def download_committee_acta(committee_id: int, session: Session = Depends(get_session)) -> StreamingResponse:
-    committee_model = next(iter(_load_committees(session, committee_id)), None)
-    if committee_model is None:
+def download_committee_acta(
+    committee_id: int,
+    session: Session = Depends(get_read_session),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> StreamingResponse:
+    serialized = _committee_payload(session, committee_id, scope)
+    if not serialized:
         raise HTTPException(status_code=404, detail="Comité no encontrado")
-    committee = _serialize_committees(session, [committee_model])[0]
+    # A single committee: the typed model keeps the PDF layout code readable
+    committee = schemas.CommitteeDashboardOut.model_validate(serialized[0])
+    from fpdf import FPDF  # lazy, like openpyxl in the Excel export
 
     folio_seed = f"{committee.id}-{committee.created_at.isoformat()}-{committee.email}-{committee.total_members}"
     folio = hashlib.sha256(folio_seed.encode("utf-8")).hexdigest()[:12].upper()
@@ -823,12 +937,17 @@ def download_committee_acta(committee_id: int, session: Session = Depends(get_se
 
 
 @router.get("/documents", response_model=List[schemas.DocumentGalleryItem])
-def list_documents(session: Session = Depends(get_session)) -> List[schemas.DocumentGalleryItem]:
+def list_documents(
+    session: Session = Depends(get_read_session), scope: UnitScope = Depends(get_dashboard_scope)
+) -> Response:
     statement = (
         select(models.CommitteeDocument, models.Committee)
         .join(models.Committee, models.Committee.id == models.CommitteeDocument.committee_id)
         .order_by(models.CommitteeDocument.created_at.desc())
     )
+    scope_filter = scope.committee_filter()
+    if scope_filter is not None:
+        statement = statement.where(scope_filter)
     rows = session.exec(statement).all()
     items: List[schemas.DocumentGalleryItem] = []
     for document, committee in rows:
@@ -844,50 +963,74 @@ def list_documents(session: Session = Depends(get_session)) -> List[schemas.Docu
                 created_at=document.created_at,
             )
         )
-    return items
+    return model_response(items)
 
 
 @router.get("/metrics", response_model=schemas.DashboardMetrics)
-def dashboard_metrics(session: Session = Depends(get_session)) -> schemas.DashboardMetrics:
-    total_committees = int(_safe_scalar(session, select(func.count(models.Committee.id)), 0))
-    total_promovidos = int(_safe_scalar(session, select(func.count(models.CommitteeMember.id)), 0))
-    total_documentos = int(_safe_scalar(session, select(func.count(models.CommitteeDocument.id)), 0))
-
-    secciones_cubiertas = int(
-        _safe_scalar(
-            session,
-            select(func.count(distinct(models.Committee.section_number))).where(
-                models.Committee.section_number.is_not(None),
-                models.Committee.section_number != "",
-            ),
-            0,
+def dashboard_metrics(scope: UnitScope = Depends(get_dashboard_scope)) -> Response:
+    if not scope.statewide:
+        return _cached_json(
+            "metrics", lambda session: _scoped_metrics(session, scope), ("committees",), params=(scope.cache_key,)
         )
+    return _cached_json("metrics", _dashboard_metrics, ("committees",))
+
+
+def _scoped_metrics(session: Session, scope: UnitScope) -> schemas.DashboardMetrics:
+    # The maintained counters are statewide; a unit's totals are small indexed counts
+    scope_filter = scope.committee_filter()
+    total_committees = session.exec(select(func.count(models.Committee.id)).where(scope_filter)).one()
+    total_promovidos = session.exec(
+        select(func.count(models.CommitteeMember.id))
+        .join(models.Committee, models.Committee.id == models.CommitteeMember.committee_id)
+        .where(scope_filter)
+    ).one()
+    total_documentos = session.exec(
+        select(func.count(models.CommitteeDocument.id))
+        .join(models.Committee, models.Committee.id == models.CommitteeDocument.committee_id)
+        .where(scope_filter)
+    ).one()
+    covered_codes = set(
+        session.exec(select(models.Committee.section_number).where(scope_filter).distinct()).all()
+    ) & scope.section_codes
+
+    municipio_of: Dict[str, Optional[int]] = {}
+    section_ids = [int(code) for code in scope.section_codes if code.isdigit()]
+    if section_ids:
+        rows = session.exec(
+            select(models.Seccion.id, models.Seccion.municipio).where(models.Seccion.id.in_(section_ids))
+        ).all()
+        municipio_of = {str(row.id): row.municipio for row in rows}
+    municipios_meta = len({m for m in municipio_of.values() if m is not None})
+    municipios_cubiertos = len({municipio_of.get(code) for code in covered_codes} - {None})
+
+    total_secciones = len(scope.section_codes)
+    return schemas.DashboardMetrics(
+        total_committees=int(total_committees or 0),
+        total_promovidos=int(total_promovidos or 0),
+        municipios_cubiertos=municipios_cubiertos,
+        municipios_meta=municipios_meta,
+        porcentaje_municipios=round(municipios_cubiertos / municipios_meta * 100, 2) if municipios_meta else 0.0,
+        secciones_cubiertas=len(covered_codes),
+        total_secciones=total_secciones,
+        porcentaje_secciones=round(len(covered_codes) / total_secciones * 100, 2) if total_secciones else 0.0,
+        total_documentos=int(total_documentos or 0),
     )
-    total_secciones = int(_safe_scalar(session, select(func.count(models.Seccion.id)), 0))
+
+
+def _dashboard_metrics(session: Session) -> schemas.DashboardMetrics:
+    # Counters are maintained on every committee/member/document write (app/dashboard_counters.py)
+    counters = dashboard_counters.read_counters(session)
+    total_committees = int(counters[dashboard_counters.COMMITTEES])
+    total_promovidos = int(counters[dashboard_counters.MEMBERS])
+    total_documentos = int(counters[dashboard_counters.DOCUMENTS])
+
+    secciones_cubiertas = int(counters[dashboard_counters.SECCIONES_CUBIERTAS])
+    total_secciones = int(counters[dashboard_counters.TOTAL_SECCIONES])
     porcentaje_secciones = (
         round((secciones_cubiertas / total_secciones) * 100, 2) if total_secciones > 0 else 0.0
     )
 
-    try:
-        municipios_cubiertos = int(
-            _safe_scalar(
-                session,
-                select(func.count(distinct(models.Seccion.nombre_municipio)))
-                .select_from(models.Committee)
-                .outerjoin(
-                    models.Seccion,
-                    cast(models.Seccion.id, String) == models.Committee.section_number,
-                )
-                .where(
-                    models.Committee.section_number.is_not(None),
-                    models.Committee.section_number != "",
-                    models.Seccion.nombre_municipio.is_not(None),
-                ),
-                0,
-            )
-        )
-    except SQLAlchemyError:
-        municipios_cubiertos = 0
+    municipios_cubiertos = int(counters[dashboard_counters.MUNICIPIOS_CUBIERTOS])
 
     porcentaje_municipios = (
         round(min(municipios_cubiertos / MUNICIPALITY_TARGET, 1.0) * 100, 2)
@@ -906,3 +1049,194 @@ def dashboard_metrics(session: Session = Depends(get_session)) -> schemas.Dashbo
         porcentaje_secciones=porcentaje_secciones,
         total_documentos=total_documentos,
     )
+
+
+def _scope_for_unit(session: Session, caller: UnitScope, unit_id: int) -> UnitScope:
+    """Narrow the caller's scope to one unit, which must lie inside it."""
+    if session.get(models.AdministrativeUnit, unit_id) is None:
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    if not caller.allows_unit(unit_id):
+        raise HTTPException(status_code=403, detail="La unidad está fuera de tu ámbito")
+    return unit_hierarchy.scope(session, unit_id)
+
+
+def _coverage_out(item: CoverageGap) -> schemas.CoverageGapOut:
+    return schemas.CoverageGapOut(
+        level=item.level,
+        code=item.code,
+        name=item.name,
+        unit_id=item.unit_id,
+        total_sections=item.total_sections,
+        covered_sections=item.covered_sections,
+        target_sections=item.target_sections,
+        gap=item.gap,
+        porcentaje=round(item.covered_sections / item.total_sections * 100, 2) if item.total_sections else 0.0,
+        uncovered=item.uncovered,
+    )
+
+
+@router.get("/coverage", response_model=List[schemas.CoverageGapOut])
+def coverage_gaps(
+    level: str = Query(COVERAGE_MUNICIPIO, pattern=f"^({COVERAGE_MUNICIPIO}|{COVERAGE_DISTRITO})$"),
+    unit_id: Optional[int] = None,
+    include_sections: bool = False,
+    only_gaps: bool = False,
+    session: Session = Depends(get_read_session),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> List[schemas.CoverageGapOut]:
+    if unit_id is not None:
+        scope = _scope_for_unit(session, scope, unit_id)
+    report = coverage_engine.report(
+        session,
+        level,
+        scope=catalog_scope(scope),
+        include_sections=include_sections,
+        only_gaps=only_gaps,
+    )
+    return [_coverage_out(item) for item in report]
+
+
+def _target_out(target: models.CoverageTarget, unit: models.AdministrativeUnit) -> schemas.CoverageTargetOut:
+    return schemas.CoverageTargetOut(
+        unit_id=unit.id,
+        unit_name=unit.name,
+        unit_type=unit.unit_type,
+        target_sections=target.target_sections,
+        updated_by=target.updated_by,
+        updated_at=target.updated_at,
+    )
+
+
+@router.get("/coverage/targets", response_model=List[schemas.CoverageTargetOut])
+def list_coverage_targets(
+    session: Session = Depends(get_read_session), scope: UnitScope = Depends(get_dashboard_scope)
+) -> List[schemas.CoverageTargetOut]:
+    statement = (
+        select(models.CoverageTarget, models.AdministrativeUnit)
+        .join(models.AdministrativeUnit, models.AdministrativeUnit.id == models.CoverageTarget.unit_id)
+        .order_by(models.AdministrativeUnit.name)
+    )
+    if not scope.statewide:
+        statement = statement.where(models.CoverageTarget.unit_id.in_(scope.unit_ids))
+    rows = session.exec(statement).all()
+    return [_target_out(target, unit) for target, unit in rows]
+
+
+@router.put("/coverage/targets/{unit_id}", response_model=schemas.CoverageTargetOut)
+def set_coverage_target(
+    unit_id: int,
+    data: schemas.CoverageTargetIn,
+    session: Session = Depends(get_session),
+    user: models.User = Depends(require_dashboard_user),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> schemas.CoverageTargetOut:
+    unit = session.get(models.AdministrativeUnit, unit_id)
+    if not unit:
+        raise HTTPException(status_code=404, detail="Unidad no encontrada")
+    if not scope.allows_unit(unit_id):
+        raise HTTPException(status_code=403, detail="La unidad está fuera de tu ámbito")
+    linked = (unit.unit_type == "MUNICIPALITY" and unit.seccion_municipio_id is not None) or (
+        unit.unit_type == "DISTRICT" and unit.seccion_distrito_id is not None
+    )
+    if not linked:
+        raise HTTPException(
+            status_code=400,
+            detail="Solo se pueden fijar metas a municipios o distritos ligados al catálogo de secciones",
+        )
+    target = session.get(models.CoverageTarget, unit_id)
+    if target is None:
+        target = models.CoverageTarget(unit_id=unit_id)
+    target.target_sections = data.target_sections
+    target.updated_by = user.email
+    target.updated_at = models.get_mexico_city_time()
+    session.add(target)
+    session.commit()
+    session.refresh(target)
+    return _target_out(target, unit)
+
+
+@router.delete("/coverage/targets/{unit_id}")
+def delete_coverage_target(
+    unit_id: int, session: Session = Depends(get_session), scope: UnitScope = Depends(get_dashboard_scope)
+):
+    target = session.get(models.CoverageTarget, unit_id)
+    if not target:
+        raise HTTPException(status_code=404, detail="Meta no encontrada")
+    if not scope.allows_unit(unit_id):
+        raise HTTPException(status_code=403, detail="La unidad está fuera de tu ámbito")
+    session.delete(target)
+    session.commit()
+    return {"success": True, "message": "Meta eliminada"}
+
+
+TIMESERIES_MAX_BUCKETS = 1000
+
+
+@router.get("/timeseries", response_model=schemas.TimeSeriesResponse)
+def timeseries(
+    metric: str = Query(rollups.COMMITTEES, pattern="^(committees|members|attendance)$"),
+    granularity: str = Query(rollups.DAY, pattern="^(day|hour)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    unit_id: Optional[int] = None,
+    committee_type: Optional[str] = None,
+    group_by: Optional[str] = Query(None, pattern="^(unit|type)$"),
+    session: Session = Depends(get_read_session),
+    scope: UnitScope = Depends(get_dashboard_scope),
+) -> schemas.TimeSeriesResponse:
+    end = naive_local(end or models.get_mexico_city_time() + rollups.bucket_step(granularity))
+    start = naive_local(start) if start else end - timedelta(days=30)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="El fin del periodo debe ser posterior al inicio")
+    if (end - start) / rollups.bucket_step(granularity) > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Máximo {TIMESERIES_MAX_BUCKETS} periodos por consulta")
+
+    if unit_id is not None:
+        scope = _scope_for_unit(session, scope, unit_id)
+    # Attendance is not tied to a unit, so it is always statewide
+    unit_ids = None if scope.statewide or metric == rollups.ATTENDANCE else set(scope.unit_ids)
+    data = rollups.series(
+        session,
+        metric,
+        granularity,
+        start,
+        end,
+        unit_ids=unit_ids,
+        committee_type=committee_type,
+        group_by=group_by,
+    )
+
+    labels: Dict[object, str] = {}
+    if group_by == "unit":
+        unit_rows = session.exec(
+            select(models.AdministrativeUnit.id, models.AdministrativeUnit.name).where(
+                models.AdministrativeUnit.id.in_([key for key in data if key])
+            )
+        ).all()
+        labels = {row.id: row.name for row in unit_rows}
+        labels[rollups.NO_UNIT] = "Sin unidad"
+
+    series_out = []
+    for key, points in data.items():
+        if group_by == "type":
+            label = key or "Sin tipo"
+        elif group_by == "unit":
+            label = labels.get(key, str(key))
+        else:
+            label = "Total"
+        series_out.append(
+            schemas.TimeSeries(
+                key=None if key is None else str(key),
+                label=label,
+                total=sum(value for _, value in points),
+                points=[schemas.TimeSeriesPoint(bucket=bucket, value=value) for bucket, value in points],
+            )
+        )
+    series_out.sort(key=lambda item: -item.total)
+    return schemas.TimeSeriesResponse(
+        metric=metric,
+        granularity=granularity,
+        start=rollups.bucket_start(start, granularity),
+        end=end,
+        series=series_out,
+    )
@@ -1,51 +1,37 @@
 import os
 import uuid
 import logging
-import logging.handlers
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlmodel import Session, select
 from typing import List
-from .. import models, schemas
+from .. import dashboard_counters, metrics, models, schemas
 from ..database import get_session
 from ..dependencies import get_current_user
 from ..config import settings
+from ..cache import data_versions
+from ..idempotency import idempotent
 
 router = APIRouter(prefix="/committees", tags=["documents"])
-log_path = os.path.join(settings.upload_dir, "logs")
-os.makedirs(log_path, exist_ok=True)
-handler = logging.handlers.RotatingFileHandler(
-    os.path.join(log_path, "documents.log"), maxBytes=5_000_000, backupCount=3, encoding="utf-8"
-)
-formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s %(message)s")
-handler.setFormatter(formatter)
-
-logger = logging.getLogger("documents")
-logger.setLevel(logging.INFO)
-logger.addHandler(handler)
+# Goes through the app's queued logging (app/logging_config.py); LOG_SINKS=file:... keeps a log file
+logger = logging.getLogger(__name__)
 
 
 @router.post("/{committee_id}/documents", response_model=List[schemas.DocumentOut])
+@idempotent
 async def upload_documents(
     committee_id: int,
-    request: Request,
     files: list[UploadFile] = File(...),
     session: Session = Depends(get_session),
     user: models.User = Depends(get_current_user),
 ):
-    logger.info("Inicia la subida de archivos para el comité %s", committee_id)
     try:
         committee = session.get(models.Committee, committee_id)
         if not committee:
             raise HTTPException(status_code=404, detail="Comité no encontrado")
         saved_docs = []
+        received_bytes = 0
         base_dir = os.path.join(settings.upload_dir, "committees", str(committee_id))
         os.makedirs(base_dir, exist_ok=True)
-        logger.info(
-            "Payload crudo: content-type=%s, params=%s",
-            request.headers.get("content-type"),
-            request.query_params,
-        )
-        logger.info("Archivos anunciados: %s", [f.filename for f in files])    
         for f in files:
             if not (f.content_type.startswith("image/") or f.content_type == "application/pdf"):
                 raise HTTPException(status_code=400, detail="Solo se permiten imágenes y archivos PDF")
@@ -60,7 +46,10 @@ async def upload_documents(
             new_name = f"{uuid.uuid4().hex}{file_ext}"
             full_path = os.path.join(base_dir, new_name)
             content = await f.read()
-            logger.info("Archivo %s recibido (%s bytes, %s)", f.filename, len(content), f.content_type)
+            metrics.upload_bytes.inc("documents", amount=len(content))
+            metrics.upload_files.inc("documents")
+            received_bytes += len(content)
+            logger.debug("Archivo %s recibido (%s bytes, %s)", f.filename, len(content), f.content_type)
             with open(full_path, "wb") as out:
                 out.write(content)
             doc = models.CommitteeDocument(
@@ -72,7 +61,14 @@ async def upload_documents(
             )
             session.add(doc)
             saved_docs.append(doc)
+        dashboard_counters.record_documents(session, len(saved_docs))
         session.commit()
+        data_versions.bump("committees")
+        logger.info(
+            "Documentos subidos al comité %s",
+            committee_id,
+            extra={"committee_id": committee_id, "files": len(saved_docs), "bytes": received_bytes},
+        )
     except Exception:
         logger.exception("upload_documents failed for committee %s", committee_id)
         session.rollback()
@@ -88,7 +84,6 @@ def list_documents(
     session: Session = Depends(get_session),
     user: models.User = Depends(get_current_user),
 ):
-    logger.info("Inicia la lectura de archivos para el comité %s", committee_id)
     committee = session.get(models.Committee, committee_id)
     if not committee:
         raise HTTPException(status_code=404, detail="Comité no encontrado")
@@ -120,5 +115,7 @@ def delete_document(
         # ignore file deletion errors
         pass
     session.delete(doc)
+    dashboard_counters.record_documents(session, -1)
     session.commit()
+    data_versions.bump("committees")
     return None
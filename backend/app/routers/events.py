@@ -0,0 +1,92 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import Session, select
+
+from .. import dashboard_counters, models, schemas
+from ..database import get_session
+from ..dependencies import require_dashboard_user
+from ..events import event_registry, naive_local
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+    dependencies=[Depends(require_dashboard_user)],
+)
+
+
+def _event_out(event: models.Event, attendance_count: int) -> schemas.EventOut:
+    out = schemas.EventOut.model_validate(event)
+    out.attendance_count = attendance_count
+    return out
+
+
+@router.get("", response_model=List[schemas.EventOut])
+def list_events(session: Session = Depends(get_session)) -> List[schemas.EventOut]:
+    events = session.exec(select(models.Event).order_by(models.Event.starts_at.desc())).all()
+    # Every event's count in one lookup instead of one query per event
+    counts = event_registry.counts(session, [event.id for event in events])
+    return [_event_out(event, counts[event.id]) for event in events]
+
+
+@router.post("", response_model=schemas.EventOut)
+def create_event(
+    data: schemas.EventCreate,
+    session: Session = Depends(get_session),
+    user: models.User = Depends(require_dashboard_user),
+) -> schemas.EventOut:
+    starts_at = naive_local(data.starts_at)
+    ends_at = naive_local(data.ends_at)
+    if ends_at <= starts_at:
+        raise HTTPException(status_code=400, detail="La fecha de término debe ser posterior al inicio")
+    event = models.Event(
+        name=data.name,
+        location=data.location,
+        starts_at=starts_at,
+        ends_at=ends_at,
+        created_by=user.email,
+    )
+    session.add(event)
+    session.flush()
+    dashboard_counters.record_event_created(session, event.id)
+    session.commit()
+    session.refresh(event)
+    event_registry.invalidate()
+    return _event_out(event, 0)
+
+
+@router.get("/{event_id}", response_model=schemas.EventOut)
+def get_event(event_id: int, session: Session = Depends(get_session)) -> schemas.EventOut:
+    event = session.get(models.Event, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Evento no encontrado")
+    return _event_out(event, event_registry.count(session, event.id))
+
+
+@router.get("/{event_id}/attendance", response_model=List[schemas.AttendanceOut])
+def list_event_attendance(
+    event_id: int,
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    before_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+) -> List[schemas.AttendanceOut]:
+    bounds = event_registry.window(session, event_id)
+    if bounds is None:
+        raise HTTPException(status_code=404, detail="Evento no encontrado")
+    # event_id + created_at range: index range scan on SQLite, partition pruning on MariaDB
+    statement = (
+        select(models.Attendance)
+        .where(
+            models.Attendance.event_id == event_id,
+            models.Attendance.created_at.between(*bounds),
+        )
+        .order_by(models.Attendance.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        statement = statement.where(models.Attendance.id < before_id)
+    records = session.exec(statement).all()
+    if len(records) == limit:
+        response.headers["X-Next-Before-Id"] = str(records[-1].id)
+    return records
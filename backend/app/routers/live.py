@@ -0,0 +1,61 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from ..database import engine
+from ..dependencies import require_dashboard_stream_user
+from ..events import event_registry
+from ..live_feed import attendance_broker, format_sse
+
+KEEPALIVE_SECONDS = 15.0
+
+router = APIRouter(
+    prefix="/live",
+    tags=["live"],
+    dependencies=[Depends(require_dashboard_stream_user)],
+)
+
+
+def _snapshot(event_id: Optional[int]) -> dict:
+    with Session(engine) as session:
+        current = event_id if event_id is not None else event_registry.current_event_id(session)
+        return {
+            "type": "snapshot",
+            "total": event_registry.total(session),
+            "event_id": current,
+            "event_total": event_registry.count(session, current) if current is not None else None,
+        }
+
+
+@router.get("/attendance")
+async def attendance_stream(request: Request, event_id: Optional[int] = None) -> StreamingResponse:
+    """Server-Sent Events: a snapshot with the totals, then one message per check-in."""
+    snapshot = await asyncio.to_thread(_snapshot, event_id)
+    subscription = attendance_broker.subscribe()
+
+    async def stream():
+        try:
+            yield format_sse(snapshot, event="snapshot")
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                if event_id is not None and message.get("event_id") != event_id:
+                    continue
+                yield format_sse(message, event=message.get("type"))
+        finally:
+            attendance_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,12 @@
 import base64
 import re
+import time
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
 from ..dependencies import get_current_user
-from .. import models, schemas
+from .. import metrics, models, schemas
 from ..config import settings
-import requests
+from ..rate_limit import ocr_concurrency, ocr_rate_limit
 
 router = APIRouter(prefix="/ocr", tags=["ocr"])
 
@@ -51,7 +53,12 @@ def _extract_fields_from_text(text: str) -> dict:
     }
 
 
-@router.post("/ine", response_model=schemas.OcrIneOut)
+# Rate per user first, so a throttled client never takes one of the few upstream slots
+@router.post(
+    "/ine",
+    response_model=schemas.OcrIneOut,
+    dependencies=[Depends(ocr_rate_limit.by_user), Depends(ocr_concurrency)],
+)
 async def ocr_ine(
     file: UploadFile = File(...),
     user: models.User = Depends(get_current_user),
@@ -59,10 +66,14 @@ async def ocr_ine(
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Solo se permiten imágenes")
     content = await file.read()
+    metrics.upload_bytes.inc("ocr", amount=len(content))
+    metrics.upload_files.inc("ocr")
 
     if not settings.openai_api_key:
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY no configurada")
 
+    import requests
+
     b64 = base64.b64encode(content).decode("utf-8")
 
     # Construct a prompt to extract fields
@@ -73,8 +84,12 @@ async def ocr_ine(
         "Si no encuentras un campo, deja null. Solo JSON."
     )
 
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        resp = requests.post(
+        # Blocking call: run it on a threadpool thread instead of stalling the event loop for up to 30 s
+        resp = await run_in_threadpool(
+            requests.post,
             f"{settings.openai_base_url}/chat/completions",
             headers={
                 "Authorization": f"Bearer {settings.openai_api_key}",
@@ -100,12 +115,15 @@ async def ocr_ine(
             },
             timeout=30,
         )
+        outcome = "http_error" if resp.status_code >= 400 else "ok"
         resp.raise_for_status()
         data = resp.json()
         text = data["choices"][0]["message"]["content"]
     except Exception as e:
         # Fallback to simple heuristic OCR if API fails
         raise HTTPException(status_code=502, detail=f"Error al llamar OpenAI: {e}")
+    finally:
+        metrics.ocr_upstream_latency.observe(time.perf_counter() - started, outcome)
 
     # Try to parse JSON first
     parsed: dict | None = None
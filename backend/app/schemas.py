@@ -1,5 +1,5 @@
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from datetime import datetime
 from decimal import Decimal
 
@@ -91,6 +91,23 @@ class CommitteeOut(CommitteeBase):
         from_attributes = True
 
 
+class CommitteeBulkCreate(BaseModel):
+    committees: List[CommitteeCreate]
+
+
+class CommitteeBulkItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class CommitteeBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[CommitteeBulkItemResult]
+
+
 class DocumentOut(BaseModel):
     id: int
     filename: str
@@ -130,6 +147,7 @@ class AttendanceCreate(BaseModel):
     device_id: str
     location: Optional[LocationData] = None
     timezone: str = ""
+    event_id: Optional[int] = None
 
 
 class AttendanceOut(BaseModel):
@@ -146,6 +164,27 @@ class AttendanceOut(BaseModel):
     accuracy: Optional[int]
     timezone: str
     created_at: datetime
+    event_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EventCreate(BaseModel):
+    name: str
+    location: str = ""
+    starts_at: datetime
+    ends_at: datetime
+
+
+class EventOut(BaseModel):
+    id: int
+    name: str
+    location: str
+    starts_at: datetime
+    ends_at: datetime
+    created_at: datetime
+    attendance_count: int = 0
 
     class Config:
         from_attributes = True
@@ -201,6 +240,7 @@ class AdministrativeUnitNode(BaseModel):
     children: List["AdministrativeUnitNode"] = []
     total_committees: int = 0
     total_members: int = 0
+    has_children: bool = False  # children omitted by a depth limit can be fetched lazily
 
     class Config:
         from_attributes = True
@@ -290,6 +330,52 @@ class DashboardMetrics(BaseModel):
     total_documentos: int
 
 
+class CoverageGapOut(BaseModel):
+    level: str
+    code: int
+    name: str
+    unit_id: Optional[int] = None
+    total_sections: int
+    covered_sections: int
+    target_sections: int
+    gap: int
+    porcentaje: float
+    uncovered: List[int] = []
+
+
+class CoverageTargetIn(BaseModel):
+    target_sections: int = Field(ge=0)
+
+
+class CoverageTargetOut(BaseModel):
+    unit_id: int
+    unit_name: str
+    unit_type: str
+    target_sections: int
+    updated_by: str
+    updated_at: datetime
+
+
+class TimeSeriesPoint(BaseModel):
+    bucket: datetime
+    value: int
+
+
+class TimeSeries(BaseModel):
+    key: Optional[str] = None
+    label: str
+    total: int
+    points: List[TimeSeriesPoint]
+
+
+class TimeSeriesResponse(BaseModel):
+    metric: str
+    granularity: str
+    start: datetime
+    end: datetime
+    series: List[TimeSeries]
+
+
 class AttendanceMapPoint(BaseModel):
     id: int
     name: str
@@ -302,6 +388,27 @@ class AttendanceMapPoint(BaseModel):
         from_attributes = True
 
 
+class AttendanceCluster(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+
+
+class AttendanceClusterResponse(BaseModel):
+    zoom: int
+    total: int
+    clusters: List[AttendanceCluster]
+
+
+class SuspiciousDevice(BaseModel):
+    device_id: str
+    accounts: int
+    flags: int
+    duplicates: int
+    first_seen: datetime
+    last_seen: datetime
+
+
 # Assignment/Access schemas
 class SimpleCommitteeOut(BaseModel):
     id: int
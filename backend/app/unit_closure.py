@@ -0,0 +1,167 @@
+"""Closure table for the `AdministrativeUnit` hierarchy.
+
+`AdministrativeUnitClosure` holds one row per (ancestor, descendant) pair,
+including every unit with itself at depth 0. "All descendants of X" is then a
+single lookup on the primary key prefix (ancestor_id) and "path to root" a
+single lookup on (descendant_id, depth), instead of walking `parent_id` one
+query per level.
+
+Every code path that creates, moves or deletes a unit goes through
+`add_unit` / `move_unit` / `delete_unit` in the same transaction as the unit
+itself. `ensure_closure` rebuilds the table at startup when it is missing or
+no longer matches `parent_id` (e.g. units inserted or re-parented by hand).
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, literal
+from sqlmodel import Session, select
+
+from . import models
+from .cache import data_versions
+
+Closure = models.AdministrativeUnitClosure
+Unit = models.AdministrativeUnit
+
+
+def add_unit(session: Session, unit: models.AdministrativeUnit) -> None:
+    """Link a new unit below its parent; flushes to obtain the id if needed."""
+    if unit.id is None:
+        session.add(unit)
+        session.flush()
+    session.add(Closure(ancestor_id=unit.id, descendant_id=unit.id, depth=0))
+    if unit.parent_id is not None:
+        session.execute(
+            insert(Closure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(Closure.ancestor_id, literal(unit.id), Closure.depth + 1).where(
+                    Closure.descendant_id == unit.parent_id
+                ),
+            )
+        )
+
+
+def move_unit(session: Session, unit: models.AdministrativeUnit, new_parent_id: Optional[int]) -> None:
+    """Re-parent a unit with its whole subtree."""
+    subtree = descendant_ids(session, unit.id)
+    if new_parent_id is not None and new_parent_id in subtree:
+        raise ValueError("No se puede mover una unidad debajo de sí misma o de sus descendientes")
+
+    old_ancestors = list(
+        session.exec(select(Closure.ancestor_id).where(Closure.descendant_id == unit.id, Closure.depth > 0)).all()
+    )
+    # Ids are read first: MariaDB rejects a DELETE whose subquery reads the same table
+    if old_ancestors:
+        session.execute(
+            delete(Closure).where(Closure.descendant_id.in_(subtree), Closure.ancestor_id.in_(old_ancestors))
+        )
+    if new_parent_id is not None:
+        above = session.exec(
+            select(Closure.ancestor_id, Closure.depth).where(Closure.descendant_id == new_parent_id)
+        ).all()
+        below = session.exec(
+            select(Closure.descendant_id, Closure.depth).where(Closure.ancestor_id == unit.id)
+        ).all()
+        session.add_all(
+            Closure(ancestor_id=a.ancestor_id, descendant_id=b.descendant_id, depth=a.depth + b.depth + 1)
+            for a in above
+            for b in below
+        )
+    unit.parent_id = new_parent_id
+    session.add(unit)
+
+
+def delete_unit(session: Session, unit: models.AdministrativeUnit) -> None:
+    """Delete a leaf unit and its closure rows."""
+    has_children = session.exec(
+        select(Closure.descendant_id).where(Closure.ancestor_id == unit.id, Closure.depth == 1).limit(1)
+    ).first()
+    if has_children is not None:
+        raise ValueError("La unidad tiene unidades hijas; elimínelas o muévalas primero")
+    session.execute(delete(Closure).where(Closure.descendant_id == unit.id))
+    session.delete(unit)
+
+
+def rebuild(session: Session) -> int:
+    """Recompute the table from `parent_id`; returns the number of rows written."""
+    rows = session.exec(select(Unit.id, Unit.parent_id)).all()
+    parents: Dict[int, Optional[int]] = {row.id: row.parent_id for row in rows}
+    pairs: List[Tuple[int, int, int]] = []
+    for unit_id in parents:
+        ancestor, depth, seen = unit_id, 0, set()
+        while ancestor is not None and ancestor in parents and ancestor not in seen:
+            seen.add(ancestor)  # cycle guard
+            pairs.append((ancestor, unit_id, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+
+    session.execute(delete(Closure))
+    if pairs:
+        session.execute(
+            insert(Closure),
+            [{"ancestor_id": a, "descendant_id": d, "depth": depth} for a, d, depth in pairs],
+        )
+    session.commit()
+    data_versions.bump("units")
+    return len(pairs)
+
+
+def ensure_closure(session: Session) -> None:
+    """Rebuild when the table disagrees with `parent_id`.
+
+    Three counts in one round trip: every unit needs its self row, and the
+    depth-1 rows must be exactly the (parent_id, id) pairs. A unit added or
+    re-parented by hand shows up as a missing or stale depth-1 row, and any
+    deeper row depends on those, so checking one level is enough.
+    """
+    units, linked, parented, parent_links, matching = session.exec(
+        select(
+            select(func.count(Unit.id)).scalar_subquery(),
+            select(func.count()).select_from(Closure).where(Closure.depth == 0).scalar_subquery(),
+            select(func.count(Unit.id)).where(Unit.parent_id.is_not(None)).scalar_subquery(),
+            select(func.count()).select_from(Closure).where(Closure.depth == 1).scalar_subquery(),
+            select(func.count())
+            .select_from(Closure)
+            .join(Unit, (Unit.id == Closure.descendant_id) & (Unit.parent_id == Closure.ancestor_id))
+            .where(Closure.depth == 1)
+            .scalar_subquery(),
+        )
+    ).one()
+    if units != linked or not parented == parent_links == matching:
+        rebuild(session)
+
+
+def descendants_subquery(unit_id: int, include_self: bool = True):
+    """`SELECT descendant_id` for use in `Model.column.in_(...)`."""
+    statement = select(Closure.descendant_id).where(Closure.ancestor_id == unit_id)
+    if not include_self:
+        statement = statement.where(Closure.depth > 0)
+    return statement
+
+
+def descendant_ids(session: Session, unit_id: int, include_self: bool = True) -> List[int]:
+    return list(session.execute(descendants_subquery(unit_id, include_self)).scalars())
+
+
+def descendants(
+    session: Session, unit_id: int, unit_type: Optional[str] = None, include_self: bool = False
+) -> Sequence[models.AdministrativeUnit]:
+    statement = (
+        select(Unit)
+        .join(Closure, Closure.descendant_id == Unit.id)
+        .where(Closure.ancestor_id == unit_id)
+        .order_by(Closure.depth, Unit.name)
+    )
+    if not include_self:
+        statement = statement.where(Closure.depth > 0)
+    if unit_type:
+        statement = statement.where(Unit.unit_type == unit_type)
+    return session.exec(statement).all()
+
+
+def path_to_root(session: Session, unit_id: int) -> Sequence[models.AdministrativeUnit]:
+    """The unit's ancestors from the root down to the unit itself."""
+    return session.exec(
+        select(Unit)
+        .join(Closure, Closure.ancestor_id == Unit.id)
+        .where(Closure.descendant_id == unit_id)
+        .order_by(Closure.depth.desc())
+    ).all()
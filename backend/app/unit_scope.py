@@ -0,0 +1,207 @@
+"""Hierarchical scoping of dashboard data by the caller's administrative unit.
+
+`UnitHierarchy` numbers the `AdministrativeUnit` tree in pre-order once and
+keeps nested-set intervals: the descendants of a unit are the contiguous slice
+`order[lft:rgt + 1]`, so resolving a scope never walks the tree. A `UnitScope`
+carries the unit ids and section numbers under a unit; routers turn it into a
+WHERE clause on `Committee` so out-of-scope rows are never loaded.
+
+Units are written by the population scripts, not by the API, so the intervals
+are reloaded after `HIERARCHY_REFRESH_SECONDS` or when the "units" data version
+changes.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from . import models
+from .cache import dashboard_cache
+
+HIERARCHY_REFRESH_SECONDS = 300.0
+STATEWIDE_ROLE = 1
+
+
+@dataclass(frozen=True)
+class UnitScope:
+    unit_id: Optional[int]  # None: the whole state
+    unit_ids: FrozenSet[int] = frozenset()
+    section_codes: FrozenSet[str] = frozenset()
+
+    @property
+    def statewide(self) -> bool:
+        return self.unit_id is None
+
+    @property
+    def cache_key(self) -> int:
+        return self.unit_id or 0
+
+    def committee_filter(self):
+        """WHERE clause for `Committee`, or None when nothing is filtered."""
+        if self.statewide:
+            return None
+        clauses = []
+        if self.unit_ids:
+            clauses.append(models.Committee.administrative_unit_id.in_(self.unit_ids))
+        if self.section_codes:
+            clauses.append(models.Committee.section_number.in_(self.section_codes))
+        # An empty scope must match nothing rather than everything
+        return or_(*clauses) if clauses else models.Committee.id.is_(None)
+
+    def allows_unit(self, unit_id: Optional[int]) -> bool:
+        return self.statewide or unit_id in self.unit_ids
+
+    def allows_committee(self, committee: models.Committee) -> bool:
+        return (
+            self.statewide
+            or committee.administrative_unit_id in self.unit_ids
+            or (committee.section_number or "") in self.section_codes
+        )
+
+
+STATEWIDE = UnitScope(unit_id=None)
+
+
+@dataclass
+class _Intervals:
+    order: List[int]  # unit ids in pre-order
+    bounds: Dict[int, Tuple[int, int]]  # unit id -> (lft, rgt) positions in `order`
+    parents: Dict[int, Optional[int]]
+    types: Dict[int, str]
+    codes: Dict[int, Optional[str]]
+    municipios: Dict[int, int]  # MUNICIPALITY unit -> Seccion.municipio
+    distritos: Dict[int, int]  # DISTRICT unit -> Seccion.distrito
+    version: int
+    loaded_at: float
+
+
+class UnitHierarchy:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._intervals: Optional[_Intervals] = None
+        self._scopes: Dict[int, UnitScope] = {}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._intervals = None
+            self._scopes = {}
+
+    def _load(self, session: Session) -> _Intervals:
+        version = dashboard_cache.backend.get_version("units")
+        with self._lock:
+            current = self._intervals
+        if (
+            current is not None
+            and current.version == version
+            and time.monotonic() - current.loaded_at < HIERARCHY_REFRESH_SECONDS
+        ):
+            return current
+
+        rows = session.exec(
+            select(
+                models.AdministrativeUnit.id,
+                models.AdministrativeUnit.parent_id,
+                models.AdministrativeUnit.unit_type,
+                models.AdministrativeUnit.code,
+                models.AdministrativeUnit.seccion_municipio_id,
+                models.AdministrativeUnit.seccion_distrito_id,
+            ).order_by(models.AdministrativeUnit.id)
+        ).all()
+        children: Dict[Optional[int], List[int]] = {}
+        known = {row.id for row in rows}
+        for row in rows:
+            parent = row.parent_id if row.parent_id in known else None
+            children.setdefault(parent, []).append(row.id)
+
+        order: List[int] = []
+        bounds: Dict[int, Tuple[int, int]] = {}
+        # Iterative pre-order; rgt is fixed when a unit's subtree has been emitted
+        stack: List[Tuple[int, bool]] = [(unit_id, False) for unit_id in reversed(children.get(None, []))]
+        while stack:
+            unit_id, done = stack.pop()
+            if done:
+                bounds[unit_id] = (bounds[unit_id][0], len(order) - 1)
+                continue
+            if unit_id in bounds:
+                continue  # cycle guard
+            bounds[unit_id] = (len(order), len(order))
+            order.append(unit_id)
+            stack.append((unit_id, True))
+            stack.extend((child, False) for child in reversed(children.get(unit_id, [])))
+
+        intervals = _Intervals(
+            order=order,
+            bounds=bounds,
+            parents={row.id: row.parent_id for row in rows},
+            types={row.id: row.unit_type for row in rows},
+            codes={row.id: row.code for row in rows},
+            municipios={
+                row.id: row.seccion_municipio_id
+                for row in rows
+                if row.unit_type == "MUNICIPALITY" and row.seccion_municipio_id is not None
+            },
+            distritos={
+                row.id: row.seccion_distrito_id
+                for row in rows
+                if row.unit_type == "DISTRICT" and row.seccion_distrito_id is not None
+            },
+            version=version,
+            loaded_at=time.monotonic(),
+        )
+        with self._lock:
+            self._intervals = intervals
+            self._scopes = {}
+        return intervals
+
+    def descendants(self, session: Session, unit_id: int) -> List[int]:
+        """The unit and everything below it (empty if the unit does not exist)."""
+        intervals = self._load(session)
+        bounds = intervals.bounds.get(unit_id)
+        if bounds is None:
+            return []
+        return intervals.order[bounds[0] : bounds[1] + 1]
+
+    def scope(self, session: Session, unit_id: int) -> UnitScope:
+        intervals = self._load(session)
+        with self._lock:
+            cached = self._scopes.get(unit_id)
+        if cached is not None:
+            return cached
+
+        unit_ids = self.descendants(session, unit_id)
+        sections = {
+            intervals.codes[uid]
+            for uid in unit_ids
+            if intervals.types.get(uid) == "SECTION" and intervals.codes.get(uid)
+        }
+        # Municipios/distritos without SECTION units below them: take the sections from the catalog
+        municipios = {intervals.municipios[uid] for uid in unit_ids if uid in intervals.municipios}
+        distritos = {intervals.distritos[uid] for uid in unit_ids if uid in intervals.distritos}
+        if municipios or distritos:
+            clauses = []
+            if municipios:
+                clauses.append(models.Seccion.municipio.in_(municipios))
+            if distritos:
+                clauses.append(models.Seccion.distrito.in_(distritos))
+            sections.update(str(section_id) for section_id in session.exec(select(models.Seccion.id).where(or_(*clauses))).all())
+
+        scope = UnitScope(unit_id=unit_id, unit_ids=frozenset(unit_ids), section_codes=frozenset(sections))
+        with self._lock:
+            self._scopes[unit_id] = scope
+        return scope
+
+    def scope_for_assignment(self, session: Session, assignment: models.UserAssignment) -> UnitScope:
+        """State coordinators and root units see everything; everyone else their subtree."""
+        if assignment.role == STATEWIDE_ROLE or assignment.administrative_unit_id is None:
+            return STATEWIDE
+        intervals = self._load(session)
+        unit_id = assignment.administrative_unit_id
+        if unit_id in intervals.bounds and intervals.parents.get(unit_id) is None:
+            return STATEWIDE
+        return self.scope(session, unit_id)
+
+
+unit_hierarchy = UnitHierarchy()
@@ -0,0 +1,119 @@
+"""Array-backed administrative tree rendered straight to JSON.
+
+`UnitTree` keeps the units in flat lists indexed by position, with children
+sorted by name once at build time. Cumulative committee/member totals are
+rolled up level by level with `np.add.at` (deepest level first) instead of a
+recursive walk. `render` emits the `AdministrativeUnitNode` shape as plain
+dicts with an explicit stack and serializes them with orjson, so a response
+never builds (and re-validates) one Pydantic model per unit.
+
+`max_depth` cuts the output after that many levels; nodes keep
+`has_children` so the dashboard can fetch the next level lazily.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+
+@dataclass
+class UnitTree:
+    ids: List[int]
+    names: List[str]
+    codes: List[Optional[str]]
+    types: List[str]
+    children: List[List[int]]  # positions, sorted by name
+    roots: List[int]
+    total_committees: List[int]
+    total_members: List[int]
+    assignments: Dict[int, list]  # position -> AssignmentUserSummary dicts
+    positions: Dict[int, int]  # unit id -> position
+
+    def visible(self, position: int, prune_empty: bool) -> bool:
+        return not prune_empty or self.total_committees[position] > 0 or self.total_members[position] > 0
+
+
+def build_tree(
+    units: Sequence[Tuple[int, Optional[int], str, Optional[str], str]],
+    stats: Dict[int, Tuple[int, int]],
+    assignments: Dict[int, list],
+) -> UnitTree:
+    """`units` are (id, parent_id, name, code, unit_type); `stats` maps unit id -> (committees, members)."""
+    ordered = sorted(units, key=lambda unit: unit[2].lower())
+    positions = {unit[0]: position for position, unit in enumerate(ordered)}
+    size = len(ordered)
+    parents = np.full(size, -1, dtype=np.int64)
+    children: List[List[int]] = [[] for _ in range(size)]
+    roots: List[int] = []
+    for position, (_, parent_id, _, _, _) in enumerate(ordered):
+        if parent_id is None:
+            roots.append(position)
+            continue
+        # Units whose parent is missing are left out, like the recursive builder did
+        parent = positions.get(parent_id, -1)
+        if parent >= 0 and parent != position:
+            parents[position] = parent
+            children[parent].append(position)
+
+    # Depth of each node from an iterative walk; units on a cycle are unreachable and stay at -1
+    depth = np.full(size, -1, dtype=np.int64)
+    stack = [(root, 0) for root in roots]
+    while stack:
+        position, level = stack.pop()
+        depth[position] = level
+        stack.extend((child, level + 1) for child in children[position])
+
+    committees = np.zeros(size, dtype=np.int64)
+    members = np.zeros(size, dtype=np.int64)
+    for unit_id, (c, m) in stats.items():
+        position = positions.get(unit_id)
+        if position is not None:
+            committees[position] = c
+            members[position] = m
+    for level in range(int(depth.max(initial=0)), 0, -1):
+        at_level = np.nonzero(depth == level)[0]
+        np.add.at(committees, parents[at_level], committees[at_level])
+        np.add.at(members, parents[at_level], members[at_level])
+
+    return UnitTree(
+        ids=[unit[0] for unit in ordered],
+        names=[unit[2] for unit in ordered],
+        codes=[unit[3] for unit in ordered],
+        types=[unit[4] for unit in ordered],
+        children=children,
+        roots=roots,
+        total_committees=committees.tolist(),
+        total_members=members.tolist(),
+        assignments={positions[unit_id]: rows for unit_id, rows in assignments.items() if unit_id in positions},
+        positions=positions,
+    )
+
+
+def render(
+    tree: UnitTree, start: Iterable[int], max_depth: Optional[int] = None, prune_empty: bool = True
+) -> bytes:
+    """JSON array of the nodes at positions `start` and up to `max_depth` levels (None: all)."""
+    top: List[dict] = []
+    stack: List[Tuple[int, int, List[dict]]] = [
+        (position, 1, top) for position in reversed(list(start)) if tree.visible(position, prune_empty)
+    ]
+    while stack:
+        position, level, siblings = stack.pop()
+        visible_children = [child for child in tree.children[position] if tree.visible(child, prune_empty)]
+        node = {
+            "id": tree.ids[position],
+            "name": tree.names[position],
+            "code": tree.codes[position],
+            "unit_type": tree.types[position],
+            "assignments": tree.assignments.get(position, []),
+            "children": [],
+            "total_committees": tree.total_committees[position],
+            "total_members": tree.total_members[position],
+            "has_children": bool(visible_children),
+        }
+        siblings.append(node)
+        if max_depth is None or level < max_depth:
+            # Pushed in reverse so they pop (and are appended) in name order
+            stack.extend((child, level + 1, node["children"]) for child in reversed(visible_children))
+    return orjson.dumps(top)
@@ -0,0 +1,43 @@
+"""Atomic "insert or add" for counter-style tables.
+
+`increment` adds each row's delta to the existing row with the same primary
+key, or inserts the row when there is none, in a single statement:
+`INSERT ... ON DUPLICATE KEY UPDATE` on MySQL/MariaDB and
+`INSERT ... ON CONFLICT DO UPDATE` on SQLite and PostgreSQL. Unlike reading the
+row `FOR UPDATE` and inserting when it is missing, two transactions creating
+the same row at once never collide on the primary key; the second one simply
+adds to the first.
+"""
+from typing import Any, Dict, List
+
+from sqlmodel import Session
+
+MYSQL_DIALECTS = ("mysql", "mariadb")
+
+
+def increment(session: Session, model: Any, rows: List[Dict[str, Any]], column: str = "value") -> None:
+    """Upsert `rows` (dicts with every primary-key column plus `column` = delta) in one round trip."""
+    if not rows:
+        return
+    table = model.__table__
+    key_columns = [key.name for key in table.primary_key.columns]
+    # Same lock order in every transaction, so concurrent writers touching several rows can't deadlock
+    rows = sorted(rows, key=lambda row: tuple(row[name] for name in key_columns))
+    dialect = session.get_bind().dialect.name
+    if dialect in MYSQL_DIALECTS:
+        from sqlalchemy.dialects.mysql import insert
+
+        statement = insert(table).values(rows)
+        statement = statement.on_duplicate_key_update({column: table.c[column] + statement.inserted[column]})
+    else:
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + statement.excluded[column]},
+        )
+    session.execute(statement)
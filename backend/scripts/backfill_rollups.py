@@ -0,0 +1,24 @@
+"""
+Recalcula las series de tiempo (ActivityRollup, por día y por hora) desde el
+historial de comités, integrantes y asistencias. Útil tras cargas directas en la
+base de datos o para reparar desviaciones.
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlmodel import Session  # noqa: E402
+from app import rollups  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+
+
+if __name__ == "__main__":
+    init_db()
+    with Session(engine) as session:
+        read = rollups.backfill(session)
+    for metric in rollups.METRICS:
+        print(f"{metric:12} {read[metric]} registros")
+    print("✅ Series de tiempo recalculadas")
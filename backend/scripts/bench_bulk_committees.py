@@ -0,0 +1,94 @@
+"""
+Benchmark: carga de comités uno por uno (POST /committees) contra la carga masiva
+(POST /committees/bulk) sobre una base SQLite temporal.
+
+Uso:
+    python scripts/bench_bulk_committees.py [--committees 50] [--members 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# La base temporal debe configurarse antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="bench_bulk_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp_dir, "uploads")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+from app import models  # noqa: E402
+from app.auth import create_jwt  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _payload(index: int, members: int) -> dict:
+    return {
+        "name": f"Comité {index}",
+        "section_number": str(index % 50 + 1),
+        "type": "Seccionales",
+        "presidente": f"Presidente {index}",
+        "email": f"presidente{index}@example.com",
+        "clave_afiliacion": f"CLAVE{index:05d}",
+        "telefono": "4430000000",
+        "members": [
+            {
+                "full_name": f"Integrante {index}-{m}",
+                "phone": "4431111111",
+                "section_number": str(index % 50 + 1),
+                "invited_by": "benchmark",
+            }
+            for m in range(members)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--committees", type=int, default=50)
+    parser.add_argument("--members", type=int, default=10)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        with Session(engine) as session:
+            unit = models.AdministrativeUnit(name="Benchmark", unit_type="STATE")
+            user = models.User(email="bench@example.com", name="Benchmark")
+            session.add(unit)
+            session.add(user)
+            session.commit()
+            session.refresh(unit)
+            session.refresh(user)
+            # Rol 6 para poder capturar integrantes al crear el comité
+            session.add(models.UserAssignment(user_id=user.id, administrative_unit_id=unit.id, role=6))
+            session.commit()
+            headers = {"Authorization": f"Bearer {create_jwt(user)}"}
+
+        payloads = [_payload(i, args.members) for i in range(args.committees)]
+
+        start = time.perf_counter()
+        for payload in payloads:
+            response = client.post("/committees", json=payload, headers=headers)
+            response.raise_for_status()
+        single_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/committees/bulk", json={"committees": payloads}, headers=headers)
+        response.raise_for_status()
+        bulk_elapsed = time.perf_counter() - start
+
+    print(f"Comités: {args.committees}  Integrantes por comité: {args.members}")
+    print(f"Uno por uno : {single_elapsed * 1000:8.1f} ms")
+    print(f"Carga masiva: {bulk_elapsed * 1000:8.1f} ms")
+    if bulk_elapsed > 0:
+        print(f"Aceleración : {single_elapsed / bulk_elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark: serialización de respuestas con modelos de app/schemas.py en tamaños
+realistas (comités con integrantes y documentos para el dashboard, listado del
+usuario, árbol administrativo).
+
+Compara por carga:
+- FastAPI por defecto: model_dump -> validación contra response_model -> JSONResponse (json)
+- ORJSONResponse: el mismo camino, codificado con orjson (clase por defecto de la app)
+- model_response: pydantic-core escribe los modelos directo a bytes (app/responses.py)
+- bytes en cache: la respuesta ya serializada (solo se envuelve en un Response)
+
+Uso:
+    python scripts/bench_serialization.py [--committees 2000] [--members 10] [--documents 2] [--repeat 5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from app import schemas  # noqa: E402
+from app.responses import dump_json, json_response, model_response  # noqa: E402
+
+BASE_TIME = datetime(2025, 6, 1, 10, 0, 0)
+
+
+def _member(c: int, m: int) -> schemas.CommitteeMemberOut:
+    return schemas.CommitteeMemberOut(
+        id=c * 100 + m,
+        full_name=f"Integrante Número {m} del Comité {c}",
+        ine_key=f"GOMJ{c:06d}{m:02d}HMNRRS09",
+        phone="4431234567",
+        email=f"integrante{c}.{m}@example.com",
+        section_number=str(c % 2700 + 1),
+        invited_by="Coordinación Seccional",
+        created_at=BASE_TIME + timedelta(minutes=c + m),
+    )
+
+
+def _committee(c: int, members: int, documents: int) -> schemas.CommitteeDashboardOut:
+    return schemas.CommitteeDashboardOut(
+        id=c,
+        name=f"Comité Seccional de Defensa {c}",
+        section_number=str(c % 2700 + 1),
+        type="Seccionales",
+        owner_id=f"responsable{c % 300}@example.com",
+        owner_name=f"Responsable {c % 300}",
+        created_at=BASE_TIME + timedelta(hours=c),
+        presidente=f"Presidenta del Comité {c}",
+        email=f"presidencia{c}@example.com",
+        clave_afiliacion=f"AF{c:08d}",
+        telefono="4439876543",
+        administrative_unit=schemas.AdministrativeUnitRef(
+            id=c % 2700 + 200, name=f"Sección {c % 2700 + 1}", unit_type="SECTION", code=str(c % 2700 + 1)
+        ),
+        section=schemas.SectionRef(
+            id=c % 2700 + 1, municipio=53, nombre_municipio="MORELIA", distrito=10,
+            nombre_distrito="MORELIA NOROESTE", distrito_federal=8,
+        ),
+        members=[_member(c, m) for m in range(members)],
+        documents=[
+            schemas.DocumentWithUrl(
+                id=c * 10 + d,
+                filename=f"committee_{c}/acta_{d}.jpg",
+                original_name=f"acta_{d}.jpg",
+                content_type="image/jpeg",
+                size=245_000,
+                created_at=BASE_TIME + timedelta(hours=c, minutes=d),
+                url=f"/uploads/committee_{c}/acta_{d}.jpg",
+            )
+            for d in range(documents)
+        ],
+        total_members=members,
+    )
+
+
+def _tree(districts: int = 24, municipalities: int = 5, sections: int = 24) -> List[schemas.AdministrativeUnitNode]:
+    assignment = schemas.AssignmentUserSummary(
+        user_id=1, user_name="Coordinación", user_email="coordinacion@example.com", role=3, role_label="Coordinación Distrital"
+    )
+    return [
+        schemas.AdministrativeUnitNode(
+            id=1, name="Michoacán", unit_type="STATE", total_committees=9000, total_members=90000,
+            children=[
+                schemas.AdministrativeUnitNode(
+                    id=d, name=f"Distrito {d}", unit_type="DISTRICT", assignments=[assignment],
+                    total_committees=375, total_members=3750,
+                    children=[
+                        schemas.AdministrativeUnitNode(
+                            id=d * 100 + m, name=f"Municipio {m}", unit_type="MUNICIPALITY",
+                            total_committees=75, total_members=750,
+                            children=[
+                                schemas.AdministrativeUnitNode(
+                                    id=d * 10000 + m * 100 + s, name=f"Sección {s}", code=str(s),
+                                    unit_type="SECTION", total_committees=3, total_members=30,
+                                )
+                                for s in range(sections)
+                            ],
+                        )
+                        for m in range(municipalities)
+                    ],
+                )
+                for d in range(districts)
+            ],
+        )
+    ]
+
+
+def _fastapi(field, content, response_class) -> bytes:
+    value = asyncio.run(serialize_response(field=field, response_content=content))
+    return response_class(value).body
+
+
+def _time(fn, repeat: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--committees", type=int, default=2000)
+    parser.add_argument("--members", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    committees = [_committee(c, args.members, args.documents) for c in range(1, args.committees + 1)]
+    own = [
+        schemas.CommitteeOut(
+            id=c.id, name=c.name, section_number=c.section_number, type=c.type, presidente=c.presidente,
+            email=c.email, clave_afiliacion=c.clave_afiliacion, telefono=c.telefono, created_at=c.created_at,
+            owner_id=c.owner_id, members=c.members, has_document=True,
+        )
+        for c in committees[:200]
+    ]
+    workloads = [
+        (f"/dashboard/committees ({args.committees} comités)", List[schemas.CommitteeDashboardOut], committees),
+        ("/committees (200 del usuario)", List[schemas.CommitteeOut], own),
+        ("/dashboard/administrative-tree", List[schemas.AdministrativeUnitNode], _tree()),
+    ]
+
+    for label, type_, content in workloads:
+        field = create_response_field(name="response", type_=type_)
+        cached = dump_json(content)
+        print(f"\n{label}: {len(cached) / 1024:,.0f} KiB")
+        base = _time(lambda: _fastapi(field, content, JSONResponse), args.repeat)
+        results = [
+            ("FastAPI por defecto (json)", base),
+            ("ORJSONResponse", _time(lambda: _fastapi(field, content, ORJSONResponse), args.repeat)),
+            ("model_response", _time(lambda: model_response(content).body, args.repeat)),
+            ("bytes en cache", _time(lambda: json_response(cached).body, args.repeat)),
+        ]
+        for name, elapsed in results:
+            print(f"  {name:<28}{elapsed:9.2f} ms  ({base / elapsed:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark: consultas de jerarquía sobre AdministrativeUnit (~3,000 unidades, como
+Michoacán: estado -> distritos -> municipios -> secciones) en una base SQLite temporal.
+
+Compara, para "todos los descendientes de X" y "ruta a la raíz":
+- lista de adyacencia: una consulta por nivel / session.get por cada padre
+- CTE recursivo sobre parent_id
+- tabla de cierre (app/unit_closure.py): una consulta indexada
+
+También mide el costo de mantener la tabla al crear, mover y borrar unidades y
+verifica que el resultado coincida con una reconstrucción completa.
+
+Uso:
+    python scripts/bench_unit_hierarchy.py [--districts 24] [--municipalities 113] [--sections 2860] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# La base temporal debe configurarse antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="bench_units_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp_dir, "uploads")
+
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+from app import models, unit_closure  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+from app.unit_scope import unit_hierarchy  # noqa: E402
+
+Unit = models.AdministrativeUnit
+Closure = models.AdministrativeUnitClosure
+
+DESCENDANTS_CTE = text(
+    "WITH RECURSIVE sub(id) AS ("
+    " SELECT id FROM administrativeunit WHERE id = :unit_id"
+    " UNION ALL"
+    " SELECT u.id FROM administrativeunit u JOIN sub ON u.parent_id = sub.id"
+    ") SELECT id FROM sub"
+)
+
+
+def _build_tree(session: Session, districts: int, municipalities: int, sections: int) -> None:
+    state = Unit(name="Michoacán", code="16", unit_type="STATE")
+    unit_closure.add_unit(session, state)
+    district_units = []
+    for d in range(districts):
+        unit = Unit(name=f"Distrito {d + 1}", code=str(d + 1), unit_type="DISTRICT", parent_id=state.id)
+        unit_closure.add_unit(session, unit)
+        district_units.append(unit)
+    municipality_units = []
+    for m in range(municipalities):
+        parent = district_units[m % districts]
+        unit = Unit(name=f"Municipio {m + 1}", code=str(m + 1), unit_type="MUNICIPALITY", parent_id=parent.id)
+        unit_closure.add_unit(session, unit)
+        municipality_units.append(unit)
+    for s in range(sections):
+        parent = municipality_units[s % municipalities]
+        unit_closure.add_unit(
+            session, Unit(name=f"Sección {s + 1}", code=str(s + 1), unit_type="SECTION", parent_id=parent.id)
+        )
+    session.commit()
+
+
+def _descendants_by_level(session: Session, unit_id: int) -> list:
+    result, frontier = [unit_id], [unit_id]
+    while frontier:
+        frontier = list(session.exec(select(Unit.id).where(Unit.parent_id.in_(frontier))).all())
+        result.extend(frontier)
+    return result
+
+
+def _path_by_parent(session: Session, unit_id: int) -> list:
+    path = []
+    unit = session.get(Unit, unit_id)
+    while unit is not None:
+        path.append(unit.id)
+        unit = session.get(Unit, unit.parent_id) if unit.parent_id else None
+    return path[::-1]
+
+
+def _time(label: str, fn, samples, baseline=None) -> float:
+    start = time.perf_counter()
+    for unit_id in samples:
+        fn(unit_id)
+    elapsed = (time.perf_counter() - start) * 1000 / len(samples)
+    speedup = f"  ({baseline / elapsed:5.1f}x)" if baseline else ""
+    print(f"  {label:<28}{elapsed:8.3f} ms/consulta{speedup}")
+    return elapsed
+
+
+def _closure_rows(session: Session) -> set:
+    return set(session.exec(select(Closure.ancestor_id, Closure.descendant_id, Closure.depth)).all())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--districts", type=int, default=24)
+    parser.add_argument("--municipalities", type=int, default=113)
+    parser.add_argument("--sections", type=int, default=2860)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(39)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        _build_tree(session, args.districts, args.municipalities, args.sections)
+        build_ms = (time.perf_counter() - start) * 1000
+        total = session.exec(select(Unit.id)).all()
+        rows = len(_closure_rows(session))
+        print(f"Unidades: {len(total)}  Filas de cierre: {rows}")
+        print(f"Alta con add_unit: {build_ms:8.1f} ms ({build_ms / len(total):.3f} ms/unidad)")
+
+        start = time.perf_counter()
+        unit_closure.rebuild(session)
+        print(f"Reconstrucción completa: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        by_type = {}
+        for row in session.exec(select(Unit.id, Unit.unit_type)).all():
+            by_type.setdefault(row.unit_type, []).append(row.id)
+
+        for unit_type in ("STATE", "DISTRICT", "MUNICIPALITY"):
+            samples = [rng.choice(by_type[unit_type]) for _ in range(args.repeat)]
+            expected = sorted(_descendants_by_level(session, samples[0]))
+            assert sorted(unit_closure.descendant_ids(session, samples[0])) == expected
+            assert sorted(session.execute(DESCENDANTS_CTE, {"unit_id": samples[0]}).scalars()) == expected
+            print(f"\nDescendientes de {unit_type} (~{len(expected)} unidades):")
+            base = _time("adyacencia (por nivel)", lambda u: _descendants_by_level(session, u), samples)
+            _time("CTE recursivo", lambda u: session.execute(DESCENDANTS_CTE, {"unit_id": u}).scalars().all(), samples, base)
+            _time("tabla de cierre", lambda u: unit_closure.descendant_ids(session, u), samples, base)
+            unit_hierarchy.descendants(session, samples[0])
+            _time("intervalos en memoria", lambda u: unit_hierarchy.descendants(session, u), samples, base)
+
+        samples = [rng.choice(by_type["SECTION"]) for _ in range(args.repeat)]
+        assert [u.id for u in unit_closure.path_to_root(session, samples[0])] == _path_by_parent(session, samples[0])
+        print("\nRuta a la raíz desde SECTION:")
+
+        def by_parent(unit_id):
+            session.expire_all()  # sin el mapa de identidad, como en una petición nueva
+            return _path_by_parent(session, unit_id)
+
+        def by_closure(unit_id):
+            session.expire_all()
+            return unit_closure.path_to_root(session, unit_id)
+
+        base = _time("session.get por nivel", by_parent, samples)
+        _time("tabla de cierre", by_closure, samples, base)
+
+        # Mantenimiento: mover municipios entre distritos y borrar secciones
+        moves = [(rng.choice(by_type["MUNICIPALITY"]), rng.choice(by_type["DISTRICT"])) for _ in range(20)]
+        start = time.perf_counter()
+        for unit_id, district_id in moves:
+            unit_closure.move_unit(session, session.get(Unit, unit_id), district_id)
+        session.commit()
+        move_ms = (time.perf_counter() - start) * 1000 / len(moves)
+        leaves = rng.sample(by_type["SECTION"], 20)
+        start = time.perf_counter()
+        for unit_id in leaves:
+            unit_closure.delete_unit(session, session.get(Unit, unit_id))
+        session.commit()
+        delete_ms = (time.perf_counter() - start) * 1000 / len(leaves)
+        print(f"\nMover municipio (con sus secciones): {move_ms:6.2f} ms  Borrar sección: {delete_ms:6.2f} ms")
+
+        maintained = _closure_rows(session)
+        unit_closure.rebuild(session)
+        assert maintained == _closure_rows(session), "la tabla mantenida no coincide con la reconstrucción"
+        print("✅ La tabla mantenida coincide con la reconstrucción completa")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Genera el snapshot columnar (NumPy, mapeado en memoria) de comités e integrantes
+que usan las estadísticas del dashboard. El backend lo regenera solo tras cambios;
+este script permite programarlo (p. ej. cron cada pocos minutos) o medirlo.
+
+Uso:
+    python scripts/build_analytics_snapshot.py [--bench]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlmodel import Session  # noqa: E402
+from app.analytics_snapshot import analytics_snapshots  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+from app.routers import dashboard  # noqa: E402
+
+
+def _timed(label: str, fn, repeat: int = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"  {label:34} {(time.perf_counter() - start) / repeat * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bench", action="store_true", help="mide las agregaciones sobre el snapshot")
+    args = parser.parse_args()
+
+    init_db()
+    with Session(engine) as session:
+        start = time.perf_counter()
+        snapshot = analytics_snapshots.rebuild(session)
+        elapsed = time.perf_counter() - start
+        print(f"✓ Snapshot {snapshot.path} ({len(snapshot)} comités) en {elapsed * 1000:.0f} ms")
+
+        if args.bench:
+            print("Agregaciones (promedio de 5):")
+            _timed("committee-stats", lambda: dashboard._committee_stats(session))
+            _timed("administrative-tree", lambda: dashboard._build_unit_tree(session))
+            _timed("municipal-stats", lambda: dashboard._municipal_stats(session))
+
+
+if __name__ == "__main__":
+    main()
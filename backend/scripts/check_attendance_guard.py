@@ -0,0 +1,83 @@
+"""
+Verifica que AttendanceGuard consulta la base solo cuando la memoria no sabe.
+
+1. Una cuenta y un dispositivo que este worker no ha visto: dos consultas
+   indexadas, que encuentran la asistencia que otro worker ya registró.
+2. Tras `record`, la misma cuenta en el mismo dispositivo se resuelve en
+   memoria: cero consultas (query_budget(0)).
+3. Una cuenta conocida en un dispositivo nuevo consulta solo el dispositivo, y
+   una cuenta nueva en un dispositivo conocido solo la cuenta.
+
+Por defecto usa un archivo SQLite temporal; para MariaDB exporta DATABASE_URL
+apuntando a una base vacía.
+
+Uso:
+    python scripts/check_attendance_guard.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# La base temporal debe configurarse antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="check_guard_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/guard.db")
+
+from sqlmodel import Session, SQLModel  # noqa: E402
+from app import models  # noqa: E402
+from app.attendance_guard import AttendanceGuard  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.query_profiler import query_budget  # noqa: E402
+
+
+def main() -> int:
+    SQLModel.metadata.create_all(engine)
+    guard = AttendanceGuard(window_seconds=3600, device_max_accounts=2)
+    failures = 0
+
+    def expect(label: str, ok: bool) -> None:
+        nonlocal failures
+        print(f"{'OK   ' if ok else 'FALLA'} {label}")
+        if not ok:
+            failures += 1
+
+    with Session(engine) as session:
+        # Registrada por "otro worker": solo está en la base
+        earlier = models.Attendance(provider_user_id="u1", email="u1@example.com", device_id="d1")
+        session.add(earlier)
+        session.commit()
+        session.refresh(earlier)
+
+        with query_budget(2, label="fallo de memoria") as profile:
+            verdict = guard.check(session, "u1", "d1")
+        expect(f"fallo de memoria: {profile.queries} consultas, duplicado {verdict.duplicate_of}",
+               profile.queries == 2 and verdict.duplicate_of == earlier.id)
+
+        guard.record("u1", "d1", earlier.id)
+        with query_budget(0, label="acierto en memoria") as profile:
+            verdict = guard.check(session, "u1", "d1")
+        expect(f"acierto en memoria: {profile.queries} consultas, duplicado {verdict.duplicate_of}",
+               verdict.duplicate_of == earlier.id)
+
+        with query_budget(1, label="dispositivo nuevo") as profile:
+            guard.check(session, "u1", "d2")
+        expect(f"cuenta conocida, dispositivo nuevo: {profile.queries} consulta", profile.queries == 1)
+
+        with query_budget(1, label="cuenta nueva") as profile:
+            verdict = guard.check(session, "u2", "d1")
+        expect(f"cuenta nueva, dispositivo conocido: {profile.queries} consulta, {verdict.device_accounts} cuentas",
+               profile.queries == 1 and verdict.device_accounts == 2 and verdict.duplicate_of is None)
+
+    if failures:
+        print(f"{failures} fallas")
+        return 1
+    print("✅ Los aciertos en memoria no consultan la base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
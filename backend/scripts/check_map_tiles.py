@@ -0,0 +1,95 @@
+"""
+Verifica que los mosaicos del mapa de asistencia particionan los puntos.
+
+Carga puntos aleatorios (más algunos justo sobre bordes de mosaico) en un
+AttendanceMapIndex y, para cada zoom pedido, recorre todos los mosaicos XYZ que
+cubren los puntos: cada punto debe contarse en exactamente un mosaico, es decir,
+la suma de los mosaicos es igual al total y ningún par de mosaicos vecinos
+repite un cluster.
+
+Uso:
+    python scripts/check_map_tiles.py [--points 20000] [--zooms 0,3,7,12]
+"""
+import argparse
+import math
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.attendance_map import AttendanceMapIndex, tile_bounds  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--points", type=int, default=20000, help="puntos aleatorios a cargar")
+parser.add_argument("--zooms", default="0,3,7,12", help="zooms a revisar, separados por coma")
+parser.add_argument("--seed", type=int, default=21)
+args = parser.parse_args()
+
+
+def tile_of(zoom: int, lat: float, lon: float):
+    n = 1 << zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    sin_lat = math.sin(math.radians(lat))
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def main() -> int:
+    rng = random.Random(args.seed)
+    lats, lons = [], []
+    # Michoacán y alrededores, donde se concentra la asistencia real
+    for _ in range(args.points):
+        lats.append(rng.uniform(17.9, 20.4))
+        lons.append(rng.uniform(-103.8, -100.0))
+    zooms = [int(z) for z in args.zooms.split(",") if z.strip()]
+    # Puntos exactamente sobre las esquinas de mosaicos, el caso que duplicaba conteos
+    for zoom in zooms:
+        min_lat, min_lng, max_lat, max_lng = tile_bounds(zoom, *tile_of(zoom, 19.70, -101.19))
+        for lat in (min_lat, max_lat):
+            for lon in (min_lng, max_lng):
+                lats.append(lat)
+                lons.append(lon)
+
+    index = AttendanceMapIndex()
+    index.append(list(range(1, len(lats) + 1)), lats, lons)
+    total = len(lats)
+
+    failures = 0
+    for zoom in zooms:
+        tiles = {tile_of(zoom, lat, lon) for lat, lon in zip(lats, lons)}
+        n = 1 << zoom
+        # Incluye los vecinos de cada mosaico con puntos: si están vacíos, no deben devolver nada
+        neighbours = {
+            (x + dx, y + dy)
+            for x, y in tiles
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            if 0 <= x + dx < n and 0 <= y + dy < n
+        }
+        counted = 0
+        seen = {}
+        for x, y in sorted(neighbours):
+            for cluster in index.clusters(zoom, tile_bounds(zoom, x, y)):
+                counted += cluster.count
+                key = (round(cluster.latitude, 9), round(cluster.longitude, 9), cluster.count)
+                if key in seen:
+                    print(f"  zoom {zoom}: cluster repetido en {seen[key]} y {(x, y)}")
+                    failures += 1
+                seen[key] = (x, y)
+        status = "OK" if counted == total else "FALLA"
+        if counted != total:
+            failures += 1
+        print(f"zoom {zoom:>2}: {len(tiles)} mosaicos con puntos, {counted} de {total} puntos contados  {status}")
+
+    if failures:
+        print(f"{failures} fallas")
+        return 1
+    print("Los mosaicos adyacentes particionan los puntos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
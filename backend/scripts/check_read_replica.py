@@ -0,0 +1,118 @@
+"""
+Verifica el enrutamiento primaria/réplica con dos bases locales independientes.
+
+1. Carga los mismos datos en la primaria y en la "réplica" (como haría la
+   replicación) y agrega un comité solo en la primaria: la réplica queda atrasada.
+2. GET /dashboard/committees se lee de la réplica (no ve el comité nuevo),
+   mientras que /committees (router sin réplica) lo ve en la primaria.
+3. Tras una escritura local (data_versions.bump) las lecturas del dashboard
+   vuelven a la primaria durante DB_REPLICA_LAG_SECONDS y luego a la réplica.
+4. Imprime la ocupación de ambos pools (GET /admin/database/pools).
+
+Por defecto usa dos archivos SQLite temporales; para MariaDB exporta
+DATABASE_URL y DATABASE_REPLICA_URL apuntando a dos bases vacías.
+
+Uso:
+    python scripts/check_read_replica.py [--lag 1]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--lag", type=float, default=1.0, help="DB_REPLICA_LAG_SECONDS para la prueba")
+args = parser.parse_args()
+
+# Las bases temporales deben configurarse antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="check_replica_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/primary.db")
+os.environ.setdefault("DATABASE_REPLICA_URL", f"sqlite:///{_tmp_dir}/replica.db")
+os.environ["DB_REPLICA_LAG_SECONDS"] = str(args.lag)
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_tmp_dir, "uploads"))
+os.environ.setdefault("ANALYTICS_DIR", os.path.join(_tmp_dir, "analytics"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+from app import migrations, models, unit_closure  # noqa: E402
+from app.auth import create_jwt  # noqa: E402
+from app.routers.admin import ADMIN_EMAILS  # noqa: E402
+from app.cache import data_versions  # noqa: E402
+from app.database import engine, init_db, replica_engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _seed(target: Engine) -> str:
+    """Schema plus the rows both databases share; returns the admin's JWT."""
+    SQLModel.metadata.create_all(target)
+    migrations.migrate(target)
+    with Session(target) as session:
+        state = models.AdministrativeUnit(name="Michoacán", unit_type="STATE")
+        unit_closure.add_unit(session, state)
+        email = ADMIN_EMAILS[0]
+        user = models.User(email=email, name="Administración")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        session.add(models.UserAssignment(user_id=user.id, administrative_unit_id=state.id, role=1))
+        session.add(models.Committee(name="Comité replicado", section_number="1", type="Seccionales", owner_id=email))
+        session.commit()
+        return create_jwt(user)
+
+
+def _committee_names(client: TestClient, path: str, headers: dict) -> list:
+    response = client.get(path, headers=headers)
+    response.raise_for_status()
+    return sorted(row["name"] for row in response.json())
+
+
+def main():
+    if replica_engine is None:
+        sys.exit("DATABASE_REPLICA_URL no está configurada")
+    init_db()
+    token = _seed(engine)
+    _seed(replica_engine)
+    with Session(engine) as session:
+        # Only on the primary: the replica is now behind
+        session.add(
+            models.Committee(
+                name="Comité sin replicar", section_number="2", type="Seccionales", owner_id=ADMIN_EMAILS[0]
+            )
+        )
+        session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with TestClient(app) as client:
+        replica = _committee_names(client, "/dashboard/committees", headers)
+        primary = _committee_names(client, "/committees", headers)
+        print(f"GET /dashboard/committees (réplica): {replica}")
+        print(f"GET /committees (primaria):          {primary}")
+        assert replica == ["Comité replicado"] and len(primary) == 2
+
+        data_versions.bump("committees")  # as a write endpoint does after commit
+        after_write = _committee_names(client, "/dashboard/committees", headers)
+        print(f"Justo después de escribir (primaria): {after_write}")
+        assert after_write == primary
+
+        time.sleep(args.lag)
+        print(f"Pasados {args.lag:g} s (réplica otra vez): {_committee_names(client, '/dashboard/committees', headers)}")
+
+        print("\nPools:")
+        for pool in client.get("/admin/database/pools", headers=headers).json():
+            print(
+                f"  {pool['engine']:<8} checkouts={pool['checkouts']:<4} en uso={pool['checked_out']} "
+                f"pico={pool['peak_checked_out']} tamaño={pool['size']}+{pool['max_overflow']} "
+                f"utilización={pool['utilization']} pings={pool['pings']}"
+            )
+    print("✅ Lecturas del dashboard en la réplica; escrituras y lecturas recientes en la primaria")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,7 @@ if str(BACKEND_DIR) not in sys.path:
     sys.path.insert(0, str(BACKEND_DIR))
 
 from app.config import settings  # noqa: E402
-from app.database import init_db, get_session  # noqa: E402
-from app import models  # noqa: E402
+from app.database import init_db  # noqa: E402
 
 
 def _sanitize_db_url(url: str) -> str:
@@ -36,32 +35,11 @@ def main():
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     logging.info("Creando tablas si no existen...")
     logging.info("Base de datos: %s", _sanitize_db_url(settings.database_url))
-    init_db()
-    # Seed default types if table exists and is empty
-    try:
-        from sqlmodel import select
-        for _ in get_session():
-            # get_session is a generator; create a real session
-            pass
-        # Manually open a session
-        from app.database import engine
-        from sqlmodel import Session
-        with Session(engine) as session:
-            count = session.exec(select(models.CommitteeType)).first()
-            if count is None:
-                defaults = [
-                    "Maestros",
-                    "Transportistas",
-                    "Seccionales",
-                    "Municipales",
-                    "Deportistas",
-                ]
-                for name in defaults:
-                    session.add(models.CommitteeType(name=name, is_active=True))
-                session.commit()
-                logging.info("Tipos de comité iniciales insertados (%d)", len(defaults))
-    except Exception as e:
-        logging.warning("No se pudieron insertar tipos iniciales: %s", e)
+    applied = init_db(apply_migrations=True)
+    for name in applied:
+        logging.info("Migración aplicada: %s", name)
+    if not applied:
+        logging.info("Esquema al día, sin migraciones pendientes.")
     logging.info("Listo.")
 
 if __name__ == "__main__":
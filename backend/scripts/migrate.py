@@ -0,0 +1,45 @@
+"""
+Aplica las migraciones de esquema pendientes (app/migrations.py) y muestra la
+versión actual. Pensado para correr una vez antes de desplegar con AUTO_MIGRATE=0,
+de modo que los workers solo verifiquen la versión al arrancar.
+
+Uso:
+    python scripts/migrate.py [--status]
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import migrations  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--status", action="store_true", help="solo muestra las migraciones pendientes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    if args.status:
+        migrations.models.SchemaVersion.__table__.create(engine, checkfirst=True)
+        waiting = migrations.pending(engine)
+        print(f"Versión más reciente: {migrations.LATEST_VERSION}")
+        if not waiting:
+            print("✓ Esquema al día")
+        for version, name, _ in waiting:
+            print(f"○ Pendiente {version}: {name}")
+        return
+
+    applied = init_db(apply_migrations=True)
+    for name in applied:
+        print(f"✓ Aplicada: {name}")
+    print("✅ Esquema al día" if applied else "○ Nada que aplicar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Particiona la tabla `attendance` por mes (RANGE sobre TO_DAYS(created_at)) en MariaDB
+y agrega las particiones de los próximos meses. Se puede ejecutar periódicamente
+(p. ej. cron mensual): solo crea las particiones que falten.
+
+Las consultas por evento filtran event_id y el rango de fechas del evento, por lo
+que MariaDB lee únicamente las particiones de ese periodo.
+
+Requisitos de MariaDB para particionar:
+- Toda llave única debe incluir created_at: la llave primaria pasa a (id, created_at).
+- La tabla no puede tener llaves foráneas (attendance.event_id y
+  attendanceflag.attendance_id se declaran sin FOREIGN KEY).
+
+En SQLite no hay particiones; el índice (event_id, created_at) cumple esa función.
+
+Uso:
+    python scripts/partition_attendance.py [--months-ahead 3] [--dry-run]
+"""
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import text  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.migrations import is_mysql  # noqa: E402
+
+
+def _month_start(year: int, month: int) -> date:
+    while month > 12:
+        year, month = year + 1, month - 12
+    return date(year, month, 1)
+
+
+def _partition(start: date) -> str:
+    upper = _month_start(start.year, start.month + 1)
+    return f"PARTITION p{start:%Y%m} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))"
+
+
+def _existing_partitions(conn) -> list[str]:
+    rows = conn.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attendance' "
+            "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+        )
+    ).all()
+    return [row[0] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if not is_mysql(engine):
+        print(f"○ {engine.dialect.name}: sin particiones; se usa el índice (event_id, created_at).")
+        return
+
+    today = date.today()
+    statements: list[str] = []
+    with engine.connect() as conn:
+        existing = _existing_partitions(conn)
+        if not existing:
+            first = conn.execute(text("SELECT MIN(created_at) FROM attendance")).scalar()
+            first_month = _month_start(first.year, first.month) if first else _month_start(today.year, today.month)
+            months = []
+            current = first_month
+            last = _month_start(today.year, today.month + args.months_ahead)
+            while current <= last:
+                months.append(current)
+                current = _month_start(current.year, current.month + 1)
+            statements.append("ALTER TABLE attendance DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+            statements.append(
+                "ALTER TABLE attendance PARTITION BY RANGE (TO_DAYS(created_at)) (\n    "
+                + ",\n    ".join([_partition(m) for m in months] + ["PARTITION pmax VALUES LESS THAN MAXVALUE"])
+                + "\n)"
+            )
+        else:
+            missing = []
+            for offset in range(args.months_ahead + 1):
+                month = _month_start(today.year, today.month + offset)
+                if f"p{month:%Y%m}" not in existing:
+                    missing.append(month)
+            if missing:
+                statements.append(
+                    "ALTER TABLE attendance REORGANIZE PARTITION pmax INTO (\n    "
+                    + ",\n    ".join([_partition(m) for m in missing] + ["PARTITION pmax VALUES LESS THAN MAXVALUE"])
+                    + "\n)"
+                )
+
+        if not statements:
+            print("○ Particiones al día, nada que hacer.")
+            return
+        for statement in statements:
+            print(f"{statement};\n")
+            if not args.dry_run:
+                conn.execute(text(statement))
+                conn.commit()
+    if not args.dry_run:
+        print("✅ Particiones actualizadas")
+
+
+if __name__ == "__main__":
+    main()
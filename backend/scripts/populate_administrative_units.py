@@ -11,6 +11,7 @@ if str(BACKEND_DIR) not in sys.path:
 
 from sqlmodel import Session, select, func
 from app.database import engine
+from app import dashboard_counters, unit_closure
 from app.models import AdministrativeUnit, Seccion
 
 
@@ -23,6 +24,9 @@ def populate_administrative_units():
         print("="*60)
         print("POBLANDO UNIDADES ADMINISTRATIVAS DESDE SECCION")
         print("="*60)
+
+        # move_unit parte de una tabla de cierre correcta: enlaza primero unidades creadas a mano
+        unit_closure.ensure_closure(session)
         
         # 1. Crear el estado de Michoacán (raíz)
         state = session.exec(
@@ -39,7 +43,7 @@ def populate_administrative_units():
                 unit_type="STATE",
                 parent_id=None
             )
-            session.add(state)
+            unit_closure.add_unit(session, state)
             session.commit()
             session.refresh(state)
             print(f"\n✓ Creado: {state.name} (STATE) - ID: {state.id}")
@@ -83,10 +87,12 @@ def populate_administrative_units():
                     parent_id=state.id,
                     seccion_distrito_id=distrito_id
                 )
-                session.add(distrito_unit)
-                session.flush()
+                unit_closure.add_unit(session, distrito_unit)
                 distrito_count += 1
                 print(f"✓ Creado: {distrito_unit.name} (DISTRICT {distrito_id}) - ID: {distrito_unit.id}")
+            elif distrito_unit.parent_id != state.id:
+                unit_closure.move_unit(session, distrito_unit, state.id)
+                print(f"↷ Movido: {distrito_unit.name} (DISTRICT {distrito_id}) bajo {state.name} - ID: {distrito_unit.id}")
             else:
                 print(f"○ Ya existe: {distrito_unit.name} (DISTRICT {distrito_id}) - ID: {distrito_unit.id}")
             
@@ -124,12 +130,12 @@ def populate_administrative_units():
                     AdministrativeUnit.seccion_municipio_id == municipio_id
                 )
             ).first()
-            
+
+            # El padre del municipio es el distrito
+            parent_id = distrito_map.get(distrito_id).id if distrito_id in distrito_map else state.id
+            parent_name = distrito_map.get(distrito_id).name if distrito_id in distrito_map else "Estado"
+
             if not municipio_unit:
-                # El padre del municipio es el distrito
-                parent_id = distrito_map.get(distrito_id).id if distrito_id in distrito_map else state.id
-                parent_name = distrito_map.get(distrito_id).name if distrito_id in distrito_map else "Estado"
-                
                 municipio_unit = AdministrativeUnit(
                     name=nombre_municipio or f"Municipio {municipio_id}",
                     code=str(municipio_id),
@@ -138,10 +144,12 @@ def populate_administrative_units():
                     seccion_municipio_id=municipio_id,
                     seccion_distrito_id=distrito_id
                 )
-                session.add(municipio_unit)
-                session.flush()
+                unit_closure.add_unit(session, municipio_unit)
                 municipio_count += 1
                 print(f"✓ Creado: {municipio_unit.name} (MUNICIPALITY {municipio_id}) bajo {parent_name} - ID: {municipio_unit.id}")
+            elif municipio_unit.parent_id != parent_id:
+                unit_closure.move_unit(session, municipio_unit, parent_id)
+                print(f"↷ Movido: {municipio_unit.name} (MUNICIPALITY {municipio_id}) bajo {parent_name} - ID: {municipio_unit.id}")
             else:
                 print(f"○ Ya existe: {municipio_unit.name} (MUNICIPALITY {municipio_id}) - ID: {municipio_unit.id}")
             
@@ -161,6 +169,7 @@ def populate_administrative_units():
 
         created_sections = 0
         existing_sections = 0
+        moved_sections = 0
         for idx, seccion in enumerate(secciones, 1):
             section_unit = session.exec(
                 select(AdministrativeUnit).where(
@@ -168,10 +177,10 @@ def populate_administrative_units():
                     AdministrativeUnit.code == str(seccion.id)
                 )
             ).first()
-            
+
+            parent_id = municipio_map.get(seccion.municipio).id if seccion.municipio in municipio_map else state.id
+
             if not section_unit:
-                parent_id = municipio_map.get(seccion.municipio).id if seccion.municipio in municipio_map else state.id
-                
                 section_unit = AdministrativeUnit(
                     name=f"Sección {seccion.id}",
                     code=str(seccion.id),
@@ -180,7 +189,7 @@ def populate_administrative_units():
                     seccion_municipio_id=seccion.municipio,
                     seccion_distrito_id=seccion.distrito
                 )
-                session.add(section_unit)
+                unit_closure.add_unit(session, section_unit)
                 created_sections += 1
                 
                 # Commit cada 100 secciones para evitar problemas de memoria
@@ -189,10 +198,21 @@ def populate_administrative_units():
                     print(f"  → Procesadas {idx}/{len(secciones)} secciones ({created_sections} creadas)...")
             else:
                 existing_sections += 1
+                if section_unit.parent_id != parent_id:
+                    unit_closure.move_unit(session, section_unit, parent_id)
+                    moved_sections += 1
         
         session.commit()
         print(f"\n✓ Secciones creadas: {created_sections}")
         print(f"○ Secciones existentes: {existing_sections}")
+        print(f"↷ Secciones movidas de municipio: {moved_sections}")
+
+        # Comprobación final: reconstruye si algo escribió parent_id sin pasar por unit_closure
+        unit_closure.ensure_closure(session)
+
+        # El catálogo de secciones pudo cambiar: el dashboard usa su tamaño como total de secciones
+        total_secciones = dashboard_counters.refresh_total_secciones(session)
+        print(f"✓ Total de secciones en el dashboard: {total_secciones}")
 
         # Resumen final
         print("\n" + "="*60)
@@ -0,0 +1,110 @@
+"""
+Perfil de arranque: qué cuesta importar la app en un worker nuevo.
+
+Ejecuta `python -X importtime -c "import app.main"` en un proceso limpio y
+reporta los módulos con mayor tiempo acumulado, además del tiempo de arranque
+en frío y la memoria residente (RSS) del proceso tras importar la app.
+
+Las dependencias pesadas (fpdf, openpyxl, google-auth, msal, requests, Pillow)
+solo se usan en los endpoints de exportación, acta, login y OCR, y se importan
+dentro de esos handlers. Con --check el script termina con error si alguna se
+carga al importar app.main (útil antes de desplegar).
+
+Uso:
+    python scripts/profile_imports.py [--top 25] [--runs 5] [--check] [--raw importtime.txt]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("fpdf", "openpyxl", "google.oauth2", "google.auth", "msal", "requests", "PIL")
+
+# Se ejecuta en un proceso nuevo para medir un worker en frío
+COLD_START = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main  # noqa: F401
+elapsed = (time.perf_counter() - start) * 1000
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"ms": elapsed, "rss_kib": rss, "modules": len(sys.modules), "heavy": heavy}}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # Una base temporal evita que el import dependa de la base configurada
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='profile_imports_')}/app.db")
+    return env
+
+
+def _importtime(env: dict) -> Tuple[List[Tuple[int, int, str]], str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows, result.stderr
+
+
+def _cold_start(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START.format(heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=25, help="módulos a listar por tiempo acumulado")
+    parser.add_argument("--runs", type=int, default=5, help="arranques en frío a promediar")
+    parser.add_argument("--check", action="store_true", help="falla si una dependencia pesada se importa al arrancar")
+    parser.add_argument("--raw", help="guarda la salida completa de -X importtime en este archivo")
+    args = parser.parse_args()
+
+    env = _env()
+    _cold_start(env)  # compila los .pyc para que no cuenten en las mediciones
+    rows, raw = _importtime(env)
+    if args.raw:
+        Path(args.raw).write_text(raw, encoding="utf-8")
+
+    print(f"Top {args.top} por tiempo acumulado (-X importtime):")
+    print(f"  {'acumulado':>10} {'propio':>9}  módulo")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: row[1], reverse=True)[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms {self_us / 1000:7.1f}ms  {name}")
+
+    samples = [_cold_start(env) for _ in range(args.runs)]
+    times = [sample["ms"] for sample in samples]
+    last = samples[-1]
+    print(
+        f"\nArranque en frío (import app.main, {args.runs} corridas): "
+        f"mediana {statistics.median(times):.0f} ms, mín {min(times):.0f} ms"
+    )
+    print(f"RSS tras importar: {last['rss_kib'] / 1024:.1f} MiB  Módulos cargados: {last['modules']}")
+
+    if last["heavy"]:
+        print(f"Dependencias pesadas cargadas al arrancar: {', '.join(last['heavy'])}")
+        if args.check:
+            sys.exit(1)
+    else:
+        print("✅ Ninguna dependencia pesada se carga al arrancar")
+
+
+if __name__ == "__main__":
+    main()
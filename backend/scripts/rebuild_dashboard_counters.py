@@ -0,0 +1,39 @@
+"""
+Recalcula los contadores del dashboard (DashboardCounter / CoverageCount) desde
+las tablas base. Útil tras cargas directas en la base de datos o para reparar
+desviaciones.
+
+Con --secciones solo vuelve a contar el catálogo `seccion` (tras importarlo),
+sin tocar los demás contadores.
+
+Uso:
+    python scripts/rebuild_dashboard_counters.py [--secciones]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlmodel import Session  # noqa: E402
+from app import dashboard_counters  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--secciones", action="store_true", help="solo actualiza el total de secciones")
+    args = parser.parse_args()
+    init_db()
+    with Session(engine) as session:
+        if args.secciones:
+            # Crea los contadores si faltan; si existen, solo vuelve a contar las secciones
+            dashboard_counters.ensure_counters(session)
+            total = dashboard_counters.read_counters(session)[dashboard_counters.TOTAL_SECCIONES]
+            print(f"{dashboard_counters.TOTAL_SECCIONES:22} {total}")
+            sys.exit(0)
+        values = dashboard_counters.rebuild(session)
+    for name in dashboard_counters.COUNTER_NAMES:
+        print(f"{name:22} {values[name]}")